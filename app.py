@@ -3,20 +3,28 @@ import logging
 from flask import request
 from app import create_application
 
-# Create the Flask application
-app = create_application()
 
-# --- Logging setup ---
-# Đảm bảo Werkzeug log luôn hiện ra
-werkzeug_logger = logging.getLogger('werkzeug')
-werkzeug_logger.setLevel(logging.INFO)
+def build_app():
+    """Tạo Flask app (không tạo khi module bị import lại trong worker process)"""
+    app = create_application()
 
-# Middleware log request thủ công
-@app.before_request
-def log_request():
-    print(f"[REQUEST] {request.method} {request.path} from {request.remote_addr}")
+    # --- Logging setup ---
+    # Đảm bảo Werkzeug log luôn hiện ra
+    werkzeug_logger = logging.getLogger('werkzeug')
+    werkzeug_logger.setLevel(logging.INFO)
+
+    # Middleware log request thủ công
+    @app.before_request
+    def log_request():
+        print(f"[REQUEST] {request.method} {request.path} from {request.remote_addr}")
+
+    return app
 
 if __name__ == '__main__':
+    # Create the Flask application. Kept under the main guard: rule-parsing
+    # worker processes on spawn/forkserver platforms re-import this module
+    app = build_app()
+
     # Get configuration from environment variables
     debug_mode = os.environ.get('FLASK_DEBUG', 'True').lower() == 'true'  # Default to True for development
     host = os.environ.get('FLASK_HOST', '127.0.0.1')
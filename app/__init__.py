@@ -1,11 +1,11 @@
 import logging
 import logging.handlers
 import os
-import re
 from .config import create_app, ensure_rules_dir, ensure_custom_rules_dir
 from .routes import init_routes
 from .rules_manager import load_sigma_rules, get_rules
 from .deployment_manager import DeploymentManager
+from .highlight import highlight_html
 
 def setup_logging():
     """Setup logging configuration for the application."""
@@ -74,26 +74,10 @@ def create_application():
         @app.template_filter('highlight')
         def highlight_filter(text, query):
             """Highlight search terms in text"""
-            if not query or not text:
+            if not text:
                 return text
-            
-            # Simple tokenization - split on spaces and remove operators
-            terms = []
-            for term in query.split():
-                # Skip boolean operators and field queries
-                if term.upper() not in ['AND', 'OR', 'NOT'] and ':' not in term:
-                    # Remove quotes and parentheses
-                    clean_term = term.strip('"\'()')
-                    if len(clean_term) > 2:  # Only highlight terms longer than 2 chars
-                        terms.append(clean_term)
-            
-            # Highlight each term
-            highlighted_text = str(text)
-            for term in terms:
-                pattern = re.compile(re.escape(term), re.IGNORECASE)
-                highlighted_text = pattern.sub(f'<mark>{term}</mark>', highlighted_text)
-            
-            return highlighted_text
+            # Always escaped: the template marks the result safe
+            return highlight_html(text, query)
         
         # Initialize routes
         step_start = time.time()
@@ -1,6 +1,491 @@
 import re
+import time
 import yaml
 from datetime import datetime
+from .rule_record import rule_metadata
+from .lru_cache import LRUCache
+from .search_index import INDEXED_FIELDS, TOKEN_RE
+from .fuzzy import FUZZY_PREFIX, FUZZY_FIELD, max_edits, bounded_levenshtein
+from .regex_search import (REGEX_TOKEN_RE, REGEX_LITERAL_RE, REGEX_TIME_BUDGET, compile_pattern,
+                           literal_candidates, search as regex_search)
+from .date_index import DATE_FIELDS, RANGE_TOKEN_RE, RANGE_LITERAL_RE, parse_range, parse_date
+from .tag_index import TAG_FIELDS, normalize_tag, query_tag
+from .detection_index import (DETECTION_FIELD, STELLAR_FIELD, parse_detection_query, rule_detection_items,
+                              match_detection, stellar_field)
+from . import bitset
+
+# Maximum number of compiled query plans kept in memory
+PLAN_CACHE_SIZE = 256
+
+# Terms the tokenizer keeps whole: regex literals and bracketed date ranges
+PROTECTED_TERM_RE = re.compile(f'{REGEX_LITERAL_RE.pattern}|{RANGE_LITERAL_RE.pattern}')
+
+
+class QueryError(ValueError):
+    """A query that cannot be run (invalid regex or date, exceeded time budget...)"""
+
+
+def regex_budget_error():
+    return QueryError(f'Regex search exceeded the {REGEX_TIME_BUDGET:g}s budget; make it more specific')
+
+
+class SearchContext:
+    """Per-search state shared by plan nodes: the index and memoized candidates"""
+    
+    def __init__(self, parser, index=None):
+        self.parser = parser
+        self.index = parser.index if index is None else index
+        self.candidates = {}
+        # Set by the first regex term evaluated; shared by all of them
+        self.deadline = None
+    
+    def spend_regex_budget(self):
+        """
+        Seconds left of the regex time budget, started on first use.
+        Raises QueryError once it is spent.
+        """
+        now = time.monotonic()
+        if self.deadline is None:
+            self.deadline = now + REGEX_TIME_BUDGET
+        elif now > self.deadline:
+            raise regex_budget_error()
+        return self.deadline - now
+    
+    def term_candidates(self, term):
+        if term.token not in self.candidates:
+            self.candidates[term.token] = self.parser._term_candidates(term.token, self.index)
+        return self.candidates[term.token]
+
+
+class QueryTerm:
+    """Leaf of a compiled plan: a single term with a prebound field matcher"""
+    
+    def __init__(self, parser, token):
+        self.token = token
+        self.field, self.value = parser._parse_field_query(token)
+        self.value_lower = self.value.lower()
+        self.match = parser._bind_matcher(self.field, self.value)
+        # Indexed fields whose lowercased text can be checked directly
+        if not self.field:
+            self.text_fields = tuple(INDEXED_FIELDS)
+        elif self.field in INDEXED_FIELDS:
+            self.text_fields = (self.field,)
+        elif self.field not in parser.field_mappings:
+            self.text_fields = ('content',)
+        else:
+            self.text_fields = None
+    
+    def key(self):
+        return ('term', self.token)
+    
+    def implies(self, other):
+        """True when every rule matching this term also matches `other`"""
+        # Exact type: subclasses (fuzzy, regex, indexed) reuse value_lower
+        # with other semantics, so substring containment proves nothing
+        if type(other) is not QueryTerm:
+            return False
+        if self.field != other.field or self.field in ('date', 'modified'):
+            # Year searches on dates are not plain substring matches
+            return self.key() == other.key()
+        # Substring match: a value containing the other value is narrower
+        return other.value_lower in self.value_lower
+    
+    def estimate(self, ctx, universe):
+        candidates = ctx.term_candidates(self)
+        return bitset.count(universe) if candidates is None else len(candidates)
+    
+    def evaluate(self, ctx, universe):
+        """Bitset of the rules in `universe` matching this term"""
+        candidates = ctx.term_candidates(self)
+        if candidates is None:
+            rule_ids = bitset.to_ids(universe)
+        else:
+            rule_ids = bitset.select(universe, candidates)
+        index = ctx.index
+        if self.text_fields is None:
+            rules = index.rules
+            return bitset.from_ids(rule_id for rule_id in rule_ids if self.match(rules[rule_id]))
+        value_lower = self.value_lower
+        fields = self.text_fields
+        return bitset.from_ids(rule_id for rule_id in rule_ids
+                               if any(value_lower in index.text(rule_id, field) for field in fields))
+
+
+class FuzzyTerm(QueryTerm):
+    """
+    Typo-tolerant leaf: ~term, fuzzy:term or field:~term. A rule matches
+    when one of the words of the field is within a few edits of the term.
+    """
+    
+    def __init__(self, parser, token):
+        self.token = token
+        field, value = parser._parse_field_query(token)
+        if field == FUZZY_FIELD:
+            field = None
+        self.field = field
+        self.value = value.lstrip(FUZZY_PREFIX)
+        self.value_lower = self.value.lower()
+        self.max_edits = max_edits(self.value_lower)
+        if not field:
+            self.text_fields = tuple(INDEXED_FIELDS)
+            accessors = list(INDEXED_FIELDS.values())
+        elif field in INDEXED_FIELDS:
+            self.text_fields = (field,)
+            accessors = [INDEXED_FIELDS[field]]
+        elif field not in parser.field_mappings:
+            self.text_fields = ('content',)
+            accessors = [INDEXED_FIELDS['content']]
+        else:
+            self.text_fields = None
+            accessors = [parser.field_mappings[field]]
+        self._accessors = accessors
+    
+    def key(self):
+        return ('fuzzy', self.field, self.value_lower)
+    
+    def implies(self, other):
+        return self.key() == other.key()
+    
+    def match(self, rule):
+        """Per-rule check for rules the index does not know"""
+        value, limit = self.value_lower, self.max_edits
+        for accessor in self._accessors:
+            for token in TOKEN_RE.findall(str(accessor(rule) or '').lower()):
+                if abs(len(token) - len(value)) <= limit and bounded_levenshtein(value, token, limit) <= limit:
+                    return True
+        return False
+    
+    def _candidates(self, ctx):
+        if self.text_fields is None or ctx.index is None:
+            return None
+        if self.token not in ctx.candidates:
+            result = set()
+            for field in self.text_fields:
+                result |= ctx.index.fuzzy_candidates(field, self.value_lower) or set()
+            ctx.candidates[self.token] = result
+        return ctx.candidates[self.token]
+    
+    def estimate(self, ctx, universe):
+        candidates = self._candidates(ctx)
+        return bitset.count(universe) if candidates is None else len(candidates)
+    
+    def evaluate(self, ctx, universe):
+        candidates = self._candidates(ctx)
+        if candidates is not None:
+            # Candidates come from exact token postings; nothing to verify
+            return bitset.from_ids(bitset.select(universe, candidates))
+        rules = ctx.index.rules
+        return bitset.from_ids(rule_id for rule_id in bitset.to_ids(universe) if self.match(rules[rule_id]))
+
+
+class RegexTerm(QueryTerm):
+    """
+    Regular expression leaf: re:/pattern/ or field:re:/pattern/, matched
+    case-insensitively within the first MAX_SEARCH_LENGTH characters of the
+    field. Literals the pattern requires narrow the candidates through the
+    trigram index before it runs.
+    """
+    
+    def __init__(self, parser, token):
+        self.token = token
+        field, pattern = REGEX_TOKEN_RE.fullmatch(token).groups()
+        field = field.lower() if field else None
+        self.field = field
+        self.value = pattern
+        self.value_lower = pattern.lower()
+        try:
+            self.pattern, self.requirement = compile_pattern(pattern)
+        except ValueError as e:
+            raise QueryError(str(e))
+        if not field:
+            self.text_fields = tuple(INDEXED_FIELDS)
+            self._accessors = list(INDEXED_FIELDS.values())
+            self._candidate_fields = self.text_fields
+        elif field in INDEXED_FIELDS:
+            self.text_fields = (field,)
+            self._accessors = [INDEXED_FIELDS[field]]
+            self._candidate_fields = self.text_fields
+        elif field not in parser.field_mappings:
+            self.text_fields = ('content',)
+            self._accessors = [INDEXED_FIELDS['content']]
+            self._candidate_fields = self.text_fields
+        else:
+            self.text_fields = None
+            self._accessors = [parser.field_mappings[field]]
+            # Values of YAML line fields also appear in the raw content
+            self._candidate_fields = ('content',) if field in parser.CONTENT_DERIVED_FIELDS else (field,)
+    
+    def key(self):
+        return ('regex', self.field, self.value)
+    
+    def implies(self, other):
+        return self.key() == other.key()
+    
+    def match(self, rule):
+        """Per-rule check for rules the index does not know"""
+        # No search context here: each match gets the whole budget
+        try:
+            return any(regex_search(self.pattern, str(accessor(rule) or ''), REGEX_TIME_BUDGET)
+                       for accessor in self._accessors)
+        except TimeoutError:
+            raise regex_budget_error()
+    
+    def _candidates(self, ctx):
+        if ctx.index is None:
+            return None
+        if self.token not in ctx.candidates:
+            result = set()
+            for field in self._candidate_fields:
+                ids = literal_candidates(self.requirement,
+                                         lambda literal: ctx.index.candidates(field, literal))
+                if ids is None:
+                    result = None
+                    break
+                result |= ids
+            ctx.candidates[self.token] = result
+        return ctx.candidates[self.token]
+    
+    def estimate(self, ctx, universe):
+        candidates = self._candidates(ctx)
+        return bitset.count(universe) if candidates is None else len(candidates)
+    
+    def evaluate(self, ctx, universe):
+        candidates = self._candidates(ctx)
+        rule_ids = bitset.to_ids(universe) if candidates is None else bitset.select(universe, candidates)
+        index = ctx.index
+        pattern = self.pattern
+        matched = []
+        for rule_id in rule_ids:
+            # Each match may only run for what is left of the budget
+            timeout = ctx.spend_regex_budget()
+            try:
+                if self.text_fields is None:
+                    found = regex_search(pattern, str(self._accessors[0](index.rules[rule_id]) or ''), timeout)
+                else:
+                    found = any(regex_search(pattern, index.text(rule_id, field), timeout)
+                                for field in self.text_fields)
+            except TimeoutError:
+                raise regex_budget_error()
+            if found:
+                matched.append(rule_id)
+        return bitset.from_ids(matched)
+
+
+class IndexedTerm(QueryTerm):
+    """Leaf answered exactly by one bitset from the index (date range, tag, detection item)"""
+    
+    def index_mask(self, index):
+        """Bitset of every indexed rule matching this term"""
+        raise NotImplementedError
+    
+    def _mask(self, ctx):
+        if self.token not in ctx.candidates:
+            ctx.candidates[self.token] = self.index_mask(ctx.index)
+        return ctx.candidates[self.token]
+    
+    def estimate(self, ctx, universe):
+        return bitset.count(self._mask(ctx) & universe)
+    
+    def evaluate(self, ctx, universe):
+        return self._mask(ctx) & universe
+
+
+class DateRangeTerm(IndexedTerm):
+    """
+    Date range leaf: modified:>=2024-06-01, date:<2023,
+    date:[2023-01-01 TO 2023-12-31] (inclusive) or date:{2023 TO 2024} (exclusive).
+    Answered from the sorted date index by bisection.
+    """
+    
+    def __init__(self, parser, token):
+        self.token = token
+        try:
+            self.field, self.first, self.last = parse_range(token)
+        except ValueError as e:
+            raise QueryError(str(e))
+        self.value = token.split(':', 1)[1].strip()
+        self.value_lower = self.value.lower()
+        self.text_fields = None
+        self._accessor = parser.field_mappings[self.field]
+    
+    def key(self):
+        return ('range', self.field, self.first, self.last)
+    
+    def implies(self, other):
+        """A range implies any wider range on the same field"""
+        if not isinstance(other, DateRangeTerm) or other.field != self.field:
+            return False
+        return ((other.first is None or (self.first is not None and self.first >= other.first)) and
+                (other.last is None or (self.last is not None and self.last <= other.last)))
+    
+    def match(self, rule):
+        """Per-rule check for rules the index does not know"""
+        parsed = parse_date(self._accessor(rule))
+        if parsed is None:
+            return False
+        ordinal = parsed.toordinal()
+        return ((self.first is None or ordinal >= self.first) and
+                (self.last is None or ordinal <= self.last))
+    
+    def index_mask(self, index):
+        return index.date_range_mask(self.field, self.first, self.last)
+
+
+class TagTerm(IndexedTerm):
+    """
+    Hierarchical tag leaf: tag:attack.t1059, technique:T1059, tactic:defense_evasion,
+    tag:cve. Matches the tag itself and every tag below it (sub-techniques,
+    individual CVEs...), answered from the sorted tag index.
+    """
+    
+    def __init__(self, parser, token):
+        self.token = token
+        self.field, self.value = parser._parse_field_query(token)
+        self.value_lower = self.value.lower()
+        self.tag = query_tag(self.field, self.value)
+        self.text_fields = None
+    
+    def key(self):
+        return ('tag', self.tag)
+    
+    def implies(self, other):
+        """A tag implies its ancestors: attack.t1059.001 implies attack.t1059"""
+        if not isinstance(other, TagTerm):
+            return False
+        return self.tag == other.tag or self.tag.startswith(other.tag + '.')
+    
+    def match(self, rule):
+        """Per-rule check for rules the index does not know"""
+        prefix = self.tag + '.'
+        return any(tag == self.tag or tag.startswith(prefix)
+                   for tag in map(normalize_tag, rule.get('tags', []) or []))
+    
+    def index_mask(self, index):
+        return index.tag_mask(self.tag)
+
+
+class DetectionTerm(IndexedTerm):
+    """
+    Detection logic leaf: detection:CommandLine|contains=-enc matches rules
+    whose detection section has a CommandLine item using the contains
+    modifier with a value containing '-enc'; stellarfield:event_data.Image=...
+    does the same by converted Stellar field. Field, modifiers and value
+    are each optional.
+    """
+    
+    def __init__(self, parser, token):
+        self.token = token
+        self.field, self.value = parser._parse_field_query(token)
+        self.value_lower = self.value.lower()
+        self.stellar = self.field == STELLAR_FIELD
+        self.detection_field, self.modifiers, self.match_value = parse_detection_query(self.value)
+        self.text_fields = None
+    
+    def key(self):
+        return ('detection', self.stellar, self.detection_field, self.modifiers, self.match_value)
+    
+    def implies(self, other):
+        """Narrower when it adds a field, modifiers or a longer value to `other`"""
+        if not isinstance(other, DetectionTerm) or other.stellar != self.stellar:
+            return False
+        if other.detection_field and other.detection_field != self.detection_field:
+            return False
+        if not set(other.modifiers).issubset(self.modifiers):
+            return False
+        return other.match_value is None or (self.match_value is not None and
+                                             other.match_value in self.match_value)
+    
+    def match(self, rule):
+        """Per-rule check for rules the index does not know"""
+        return match_detection(rule_detection_items(rule), self.detection_field, self.modifiers,
+                               self.match_value, self.stellar)
+    
+    def index_mask(self, index):
+        return index.detection_mask(self.detection_field, self.modifiers, self.match_value, self.stellar)
+
+
+class AndNode:
+    """All children must match; the most selective child runs first"""
+    
+    def __init__(self, children):
+        self.children = children
+    
+    def key(self):
+        return ('and', tuple(child.key() for child in self.children))
+    
+    def estimate(self, ctx, universe):
+        return min(child.estimate(ctx, universe) for child in self.children)
+    
+    def match(self, rule):
+        return all(child.match(rule) for child in self.children)
+    
+    def evaluate(self, ctx, universe):
+        result = universe
+        for child in sorted(self.children, key=lambda child: child.estimate(ctx, universe)):
+            # Each child only looks at rules that survived the previous ones
+            result &= child.evaluate(ctx, result)
+            if not result:
+                break
+        return result
+
+
+class OrNode:
+    """Any child may match; the broadest child runs first"""
+    
+    def __init__(self, children):
+        self.children = children
+    
+    def key(self):
+        return ('or', tuple(child.key() for child in self.children))
+    
+    def estimate(self, ctx, universe):
+        return min(bitset.count(universe), sum(child.estimate(ctx, universe) for child in self.children))
+    
+    def match(self, rule):
+        return any(child.match(rule) for child in self.children)
+    
+    def evaluate(self, ctx, universe):
+        result = 0
+        remaining = universe
+        for child in sorted(self.children, key=lambda child: child.estimate(ctx, universe), reverse=True):
+            if not remaining:
+                break
+            # Rules already matched need not be checked again
+            found = child.evaluate(ctx, remaining)
+            result |= found
+            remaining &= ~found
+        return result
+
+
+class NotNode:
+    """Negation of a single child"""
+    
+    def __init__(self, child):
+        self.child = child
+    
+    def key(self):
+        return ('not', self.child.key())
+    
+    def estimate(self, ctx, universe):
+        return bitset.count(universe)
+    
+    def match(self, rule):
+        return not self.child.match(rule)
+    
+    def evaluate(self, ctx, universe):
+        return universe & ~self.child.evaluate(ctx, universe)
+
+
+def has_regex(node):
+    """True if a compiled plan contains a regex term"""
+    if isinstance(node, RegexTerm):
+        return True
+    if isinstance(node, NotNode):
+        return has_regex(node.child)
+    if isinstance(node, (AndNode, OrNode)):
+        return any(has_regex(child) for child in node.children)
+    return False
+
 
 class AdvancedSearchParser:
     """
@@ -9,12 +494,22 @@ class AdvancedSearchParser:
     - Boolean operators: AND, OR, NOT
     - Parentheses grouping: (date:2025 OR modified:2025)
     - Complex queries: Nextron Systems AND (date:2025 OR modified:2025)
+    - Fuzzy terms: ~mimkatz, title:~powershel
+    - Regex terms: re:/rundll32|regsvr32/, content:re:/mimi[kc]atz/
+    - Date ranges: modified:>=2024-06-01, date:[2023-01-01 TO 2023-12-31]
+    - ATT&CK tags: technique:T1059 (with sub-techniques), tactic:execution, tag:cve
+    - Detection logic: detection:CommandLine|contains=-enc, stellarfield:event_data.Image
     """
     
-    def __init__(self):
+    # Fields read from single YAML lines, so their values also appear in the raw content
+    CONTENT_DERIVED_FIELDS = {'date', 'modified', 'id', 'status', 'level'}
+    
+    def __init__(self, index=None, plan_cache_size=PLAN_CACHE_SIZE):
+        self.index = index
+        self.plan_cache = LRUCache(plan_cache_size)
         self.field_mappings = {
-            'title': lambda rule: rule.get('title', ''),
-            'description': lambda rule: rule.get('description', ''),
+            'title': lambda rule: str(rule.get('title', '') or ''),
+            'description': lambda rule: str(rule.get('description', '') or ''),
             'author': self._extract_author,
             'date': self._extract_date,
             'modified': self._extract_modified,
@@ -27,91 +522,57 @@ class AdvancedSearchParser:
             'service': lambda rule: rule.get('logsource', {}).get('service', ''),
             'content': lambda rule: rule.get('content', ''),
             'filename': lambda rule: rule.get('file_path', '').split('/')[-1],
-            'path': lambda rule: rule.get('file_path', '')
+            'path': lambda rule: rule.get('file_path', ''),
+            # Hierarchical tag fields; terms on them are answered by TagTerm
+            'tag': lambda rule: ' '.join(rule.get('tags', [])),
+            'technique': lambda rule: ' '.join(rule.get('tags', [])),
+            'tactic': lambda rule: ' '.join(rule.get('tags', [])),
+            # Detection items as Field|modifiers=value lines; terms on them are answered by DetectionTerm
+            'detection': lambda rule: '\n'.join(f"{name}{'|' + modifiers if modifiers else ''}={value}"
+                                                 for name, modifiers, value in rule_detection_items(rule)),
+            'stellarfield': lambda rule: '\n'.join(f"{stellar_field(name)}={value}"
+                                                    for name, _, value in rule_detection_items(rule)),
         }
     
+    def attach_index(self, index):
+        """Use a RuleIndex to narrow candidates instead of scanning every rule"""
+        self.index = index
+    
     def _extract_author(self, rule):
-        """Extract author from YAML content"""
-        try:
-            content = rule.get('content', '')
-            if 'author:' in content:
-                for line in content.split('\n'):
-                    if line.strip().startswith('author:'):
-                        author = line.split('author:', 1)[1].strip()
-                        # Remove quotes if present
-                        author = author.strip('"\'')
-                        return author
-        except:
-            pass
-        return ''
+        """Extract author from the rule record"""
+        return rule_metadata(rule, 'author')
     
     def _extract_date(self, rule):
-        """Extract date from YAML content"""
-        try:
-            content = rule.get('content', '')
-            if 'date:' in content:
-                for line in content.split('\n'):
-                    if line.strip().startswith('date:'):
-                        date = line.split('date:', 1)[1].strip()
-                        return date.strip('"\'')
-        except:
-            pass
-        return ''
+        """Extract date from the rule record"""
+        return rule_metadata(rule, 'date')
     
     def _extract_modified(self, rule):
-        """Extract modified date from YAML content"""
-        try:
-            content = rule.get('content', '')
-            if 'modified:' in content:
-                for line in content.split('\n'):
-                    if line.strip().startswith('modified:'):
-                        modified = line.split('modified:', 1)[1].strip()
-                        return modified.strip('"\'')
-        except:
-            pass
-        return ''
+        """Extract modified date from the rule record"""
+        return rule_metadata(rule, 'modified')
     
     def _extract_id(self, rule):
-        """Extract rule ID from YAML content"""
-        try:
-            content = rule.get('content', '')
-            if 'id:' in content:
-                for line in content.split('\n'):
-                    if line.strip().startswith('id:'):
-                        rule_id = line.split('id:', 1)[1].strip()
-                        return rule_id.strip('"\'')
-        except:
-            pass
-        return ''
+        """Extract rule ID from the rule record"""
+        return rule_metadata(rule, 'id')
     
     def _extract_status(self, rule):
-        """Extract status from YAML content"""
-        try:
-            content = rule.get('content', '')
-            if 'status:' in content:
-                for line in content.split('\n'):
-                    if line.strip().startswith('status:'):
-                        status = line.split('status:', 1)[1].strip()
-                        return status.strip('"\'')
-        except:
-            pass
-        return ''
+        """Extract status from the rule record"""
+        return rule_metadata(rule, 'status')
     
     def _extract_level(self, rule):
-        """Extract level from YAML content"""
-        try:
-            content = rule.get('content', '')
-            if 'level:' in content:
-                for line in content.split('\n'):
-                    if line.strip().startswith('level:'):
-                        level = line.split('level:', 1)[1].strip()
-                        return level.strip('"\'')
-        except:
-            pass
-        return ''
-    
-    def _tokenize(self, query):
+        """Extract level from the rule record"""
+        return rule_metadata(rule, 'level')
+    
+    def tokenize(self, query):
         """Tokenize the search query into components"""
+        # Regex and range terms may hold parentheses, quotes and spaces; keep them whole
+        protected = []
+        
+        def protect(match):
+            protected.append(match.group())
+            return f'\x00{len(protected) - 1}\x00'
+        
+        query = PROTECTED_TERM_RE.sub(protect, query)
+        
         # Handle parentheses by adding spaces around them
         query = re.sub(r'([()])', r' \1 ', query)
         
@@ -176,6 +637,9 @@ class AdvancedSearchParser:
                 combined_tokens[i + 1].upper() not in operators):
                 processed_tokens.append('AND')
         
+        if protected:
+            processed_tokens = [re.sub(r'\x00(\d+)\x00', lambda match: protected[int(match.group(1))], token)
+                                for token in processed_tokens]
         return processed_tokens
     
     def _parse_field_query(self, term):
@@ -221,8 +685,8 @@ class AdvancedSearchParser:
         
         # Search in common fields
         searchable_content = [
-            rule.get('title', ''),
-            rule.get('description', ''),
+            str(rule.get('title', '') or ''),
+            str(rule.get('description', '') or ''),
             ' '.join(rule.get('tags', [])),
             rule.get('content', ''),
             self._extract_author(rule),
@@ -231,9 +695,95 @@ class AdvancedSearchParser:
         
         return any(term_lower in content.lower() for content in searchable_content)
     
-    def _evaluate_expression(self, tokens, rules):
-        """Evaluate a boolean expression with parentheses support"""
-        # Convert infix to postfix notation (Shunting Yard algorithm)
+    def _bind_matcher(self, field, value):
+        """Return a rule -> bool matcher with the field accessor and lowercased value bound once"""
+        value_lower = value.lower()
+        
+        if not field:
+            return lambda rule: self._match_rule_general(rule, value)
+        
+        if field not in self.field_mappings:
+            # If field not recognized, search in content
+            return lambda rule: value_lower in rule.get('content', '').lower()
+        
+        accessor = self.field_mappings[field]
+        
+        # Special handling for date fields - more precise matching
+        if field in ['date', 'modified'] and len(value) == 4 and value.isdigit():
+            year_dash, year_slash, year_spaced = f"{value}-", f"{value}/", f" {value}"
+            
+            def match_year(rule):
+                field_content = accessor(rule).lower()
+                return (year_dash in field_content or
+                        year_slash in field_content or
+                        field_content.startswith(value) or
+                        year_spaced in field_content)
+            return match_year
+        
+        return lambda rule: value_lower in accessor(rule).lower()
+    
+    def _term_candidates(self, term, index):
+        """Ids of rules in `index` that may match a term, or None if the index cannot narrow it"""
+        if index is None:
+            return None
+        field, value = self._parse_field_query(term)
+        if not field:
+            return index.general_candidates(value)
+        if field in DATE_FIELDS:
+            # Years, months and days come from the date index
+            candidates = index.date_candidates(field, value)
+            if candidates is not None:
+                return candidates
+        if field not in self.field_mappings or field in self.CONTENT_DERIVED_FIELDS:
+            return index.candidates('content', value)
+        return index.candidates(field, value)
+    
+    def _is_fuzzy(self, token):
+        field, value = self._parse_field_query(token)
+        return field == FUZZY_FIELD or (value.startswith(FUZZY_PREFIX) and len(value) > 1)
+    
+    def _is_regex(self, token):
+        return REGEX_TOKEN_RE.fullmatch(token) is not None
+    
+    def _is_range(self, token):
+        return RANGE_TOKEN_RE.fullmatch(token) is not None
+    
+    def _is_tag(self, token):
+        field, _ = self._parse_field_query(token)
+        return field in TAG_FIELDS
+    
+    def _is_detection(self, token):
+        field, _ = self._parse_field_query(token)
+        return field in (DETECTION_FIELD, STELLAR_FIELD)
+    
+    def _is_special(self, token):
+        """True for operator terms (regex, fuzzy, range, tag, detection), not plain substring searches"""
+        return (self._is_regex(token) or self._is_range(token) or self._is_fuzzy(token) or
+                self._is_tag(token) or self._is_detection(token))
+    
+    def _make_term(self, token):
+        """Plan leaf for a query token"""
+        if self._is_regex(token):
+            return RegexTerm(self, token)
+        if self._is_range(token):
+            return DateRangeTerm(self, token)
+        if self._is_fuzzy(token):
+            return FuzzyTerm(self, token)
+        if self._is_tag(token):
+            return TagTerm(self, token)
+        if self._is_detection(token):
+            return DetectionTerm(self, token)
+        return QueryTerm(self, token)
+    
+    def _split_indexed(self, rules, index):
+        """Map each rule to its id in `index` (None for rules the index does not know)"""
+        if index is None:
+            return [None] * len(rules), set()
+        rule_ids = [index.rule_id(rule) for rule in rules]
+        return rule_ids, {rule_id for rule_id in rule_ids if rule_id is not None}
+    
+    def _to_postfix(self, tokens):
+        """Convert infix tokens to postfix notation (Shunting Yard algorithm)"""
         output_queue = []
         operator_stack = []
         
@@ -265,81 +815,159 @@ class AdvancedSearchParser:
         while operator_stack:
             output_queue.append(operator_stack.pop())
         
-        # Evaluate postfix expression
-        results = []
-        for rule in rules:
-            stack = []
-            
-            for token in output_queue:
-                if token.upper() in ['AND', 'OR', 'NOT']:
-                    if token.upper() == 'NOT':
-                        if stack:
-                            operand = stack.pop()
-                            stack.append(not operand)
-                    else:
-                        if len(stack) >= 2:
-                            right = stack.pop()
-                            left = stack.pop()
-                            if token.upper() == 'AND':
-                                stack.append(left and right)
-                            elif token.upper() == 'OR':
-                                stack.append(left or right)
-                else:
-                    # Evaluate term against rule
-                    field, value = self._parse_field_query(token)
-                    if field:
-                        match = self._match_rule_field(rule, field, value)
-                    else:
-                        match = self._match_rule_general(rule, value)
-                    stack.append(match)
-            
-            if stack and stack[0]:
-                results.append(rule)
-        
-        return results
+        return output_queue
     
-    def search(self, rules, query):
+    def _build_plan(self, output_queue):
         """
-        Main search function
-        
-        Examples:
-        - "Nextron Systems AND (date:2025 OR modified:2025)"
-        - "author:Nextron AND level:high"
-        - "mimikatz OR (powershell AND execution)"
-        - "product:windows AND NOT status:experimental"
+        Turn a postfix expression into a plan tree. Malformed input is handled
+        like the original stack evaluator: operators without enough operands
+        are skipped and the bottom of the stack is the result.
+        """
+        stack = []
+        for token in output_queue:
+            if token.upper() in ['AND', 'OR', 'NOT']:
+                if token.upper() == 'NOT':
+                    if stack:
+                        stack.append(NotNode(stack.pop()))
+                elif len(stack) >= 2:
+                    right = stack.pop()
+                    left = stack.pop()
+                    node_type = AndNode if token.upper() == 'AND' else OrNode
+                    # Flatten chains like a AND b AND c into a single node
+                    children = []
+                    for child in (left, right):
+                        if isinstance(child, node_type):
+                            children.extend(child.children)
+                        else:
+                            children.append(child)
+                    stack.append(node_type(children))
+            else:
+                stack.append(self._make_term(token))
+        # An empty OR never matches
+        return stack[0] if stack else OrNode([])
+    
+    def compile(self, query):
+        """
+        Compile a query into an executable plan, reusing cached plans.
+        Returns None when the query matches every rule.
         """
         if not query or not query.strip():
-            return rules
+            return None
         
         query = query.strip()
+        plan = self.plan_cache.get(query)
+        if plan is not None:
+            return plan
         
         # Tokenize the query
-        tokens = self._tokenize(query)
+        tokens = self.tokenize(query)
         
         if not tokens:
-            return rules
+            return None
         
         # If no boolean operators or parentheses, fall back to simple search
         has_operators = any(token.upper() in ['AND', 'OR', 'NOT'] for token in tokens)
         has_parentheses = any(token in ['(', ')'] for token in tokens)
+        # Operator terms (regex, fuzzy, range, tag, detection) are never part of a plain phrase search
+        has_special_terms = any(self._is_special(token) for token in tokens)
         
-        if not has_operators and not has_parentheses:
+        if not has_operators and not has_parentheses and not has_special_terms:
             # Simple search across all fields
-            term = query.strip()
-            field, value = self._parse_field_query(term)
-            
-            results = []
-            for rule in rules:
-                if field:
-                    if self._match_rule_field(rule, field, value):
-                        results.append(rule)
-                else:
-                    if self._match_rule_general(rule, value):
-                        results.append(rule)
-            return results
+            plan = QueryTerm(self, query)
+        else:
+            # Complex search with boolean logic
+            plan = self._build_plan(self._to_postfix(tokens))
+        
+        self.plan_cache.put(query, plan)
+        return plan
+    
+    def refines(self, query, previous):
+        """
+        True when every rule matching `query` also matches `previous`, judged
+        from the plans: each conjunct of the previous query must be implied by
+        a conjunct of the new one (an added AND term, or a term extended with
+        more characters). Results of `previous` can then be searched instead
+        of the whole ruleset.
+        """
+        previous_plan = self.compile(previous)
+        if previous_plan is None:
+            return True
+        plan = self.compile(query)
+        if plan is None:
+            return False
         
-        # Complex search with boolean logic
-        return self._evaluate_expression(tokens, rules)
+        def conjuncts(node):
+            return node.children if isinstance(node, AndNode) else [node]
+        
+        def implies(node, other):
+            if isinstance(node, QueryTerm):
+                return node.implies(other)
+            return node.key() == other.key()
+        
+        new_conjuncts = conjuncts(plan)
+        return all(any(implies(node, other) for node in new_conjuncts)
+                   for other in conjuncts(previous_plan))
+    
+    def execute(self, plan, rules):
+        """Run a compiled plan over a rule list, preserving its order"""
+        # Indexed rules: evaluate the whole plan once as bitsets over the corpus
+        # Read the attached index once: a reload may swap it mid-search
+        index = self.index
+        rule_ids, universe = self._split_indexed(rules, index)
+        ctx = SearchContext(self, index)
+        matched = set()
+        if universe:
+            matched = set(bitset.to_ids(plan.evaluate(ctx, bitset.from_ids(universe))))
+        
+        # Rules unknown to the index fall back to per-rule evaluation, under
+        # the same regex time budget
+        with_regex = has_regex(plan)
+        results = []
+        for rule, rule_id in zip(rules, rule_ids):
+            if rule_id is not None:
+                if rule_id in matched:
+                    results.append(rule)
+                continue
+            if with_regex:
+                ctx.spend_regex_budget()
+            if plan.match(rule):
+                results.append(rule)
+        return results
+    
+    def search_mask(self, query, universe, index=None):
+        """
+        Search the indexed rules selected by the `universe` bitset and return
+        the bitset of matches. Filters such as category or deployment state
+        are applied by masking `universe` before calling this. `index` is the
+        index `universe` was built over (default: the attached one).
+        """
+        plan = self.compile(query)
+        if plan is None:
+            return universe
+        index = self.index if index is None else index
+        if index is None or not universe:
+            return 0
+        return plan.evaluate(SearchContext(self, index), universe)
+    
+    def search(self, rules, query):
+        """
+        Main search function
+        
+        Examples:
+        - "Nextron Systems AND (date:2025 OR modified:2025)"
+        - "author:Nextron AND level:high"
+        - "mimikatz OR (powershell AND execution)"
+        - "product:windows AND NOT status:experimental"
+        - "content:re:/(rundll32|regsvr32)\\.exe/ AND level:high"
+        
+        Raises:
+            QueryError: If a regex or date range term is invalid, or a regex
+                exceeds its time budget
+        """
+        plan = self.compile(query)
+        if plan is None:
+            return rules
+        return self.execute(plan, rules)
 
 # Create global instance
 advanced_search = AdvancedSearchParser()
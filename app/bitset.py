@@ -0,0 +1,57 @@
+"""
+Bitset helpers over dense rule ids.
+A set of rules is a plain Python int where bit `i` is set when rule id `i`
+is in the set, so AND/OR/NOT over the whole corpus are single `&`, `|` and
+`& ~` operations on machine words.
+"""
+from typing import Iterable, List
+
+# Bit positions set in every byte value, for fast id extraction
+_BYTE_BITS = tuple(tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256))
+
+
+def from_ids(ids: Iterable[int]) -> int:
+    """Build a bitset from rule ids."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray((max(ids) >> 3) + 1)
+    for rule_id in ids:
+        buffer[rule_id >> 3] |= 1 << (rule_id & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def to_ids(mask: int) -> List[int]:
+    """Return the ids set in a bitset, in ascending order."""
+    if not mask:
+        return []
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+    ids = []
+    for byte_index, byte in enumerate(data):
+        if byte:
+            base = byte_index << 3
+            ids.extend(base + bit for bit in _BYTE_BITS[byte])
+    return ids
+
+
+def select(mask: int, ids: Iterable[int]) -> List[int]:
+    """Return the ids from `ids` that are set in `mask`, keeping their order."""
+    if not mask:
+        return []
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+    size = len(data)
+    return [rule_id for rule_id in ids
+            if (rule_id >> 3) < size and data[rule_id >> 3] >> (rule_id & 7) & 1]
+
+
+def count(mask: int) -> int:
+    """Number of ids in a bitset."""
+    return mask.bit_count()
+
+
+def set_bit(mask: int, rule_id: int) -> int:
+    return mask | (1 << rule_id)
+
+
+def clear_bit(mask: int, rule_id: int) -> int:
+    return mask & ~(1 << rule_id)
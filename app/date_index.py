@@ -0,0 +1,157 @@
+"""
+Sorted date index over rule creation and modification dates.
+Dates are parsed once when a rule is indexed and kept, per field, in a
+sorted (ordinal, rule id) list, so a date range is two bisections and the
+rules in between.
+"""
+import bisect
+import calendar
+import re
+from datetime import date
+from typing import Any, Dict, List, Set, Tuple
+
+from .rule_record import rule_metadata
+
+# Rule fields holding a date
+DATE_FIELDS = ('date', 'modified')
+
+# Dates as written in Sigma rules: 2024-06-01, 2024/06/01; partial forms for queries
+_DATE_RE = re.compile(r'(\d{4})(?:[-/](\d{1,2})(?:[-/](\d{1,2}))?)?')
+
+# Zero-padded year, month or day as typed in a text search (date:2024, modified:2024-06)
+DATE_PREFIX_RE = re.compile(r'\d{4}(?:([-/])\d{2}(?:\1\d{2})?)?')
+
+# Range terms: modified:>=2024-06-01, date:[2023-01-01 TO 2023-12-31], date:{* TO 2024}
+RANGE_TOKEN_RE = re.compile(
+    r'(date|modified):\s*(?:(>=|<=|>|<)\s*(\S+)|([\[{])\s*(\S+)\s+TO\s+(\S+)\s*([\]}]))',
+    re.IGNORECASE)
+
+# Bracketed range inside a raw query string, so the tokenizer keeps it whole
+RANGE_LITERAL_RE = re.compile(r'(?<![^\s(])[\w.]+:\s*[\[{][^\[\]{}]*[\]}](?=[\s)]|$)')
+
+# Open end of a range
+OPEN_BOUND = '*'
+
+
+def parse_date(text: str) -> date | None:
+    """Parse a full rule date (YYYY-MM-DD or YYYY/MM/DD); None if it is not one."""
+    match = _DATE_RE.fullmatch(str(text or '').strip())
+    if match is None or match.group(3) is None:
+        return None
+    try:
+        return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        return None
+
+
+def date_span(text: str) -> Tuple[int, int] | None:
+    """
+    First and last day (as ordinals) covered by a full or partial date:
+    2024 is the whole year, 2024-06 the whole month. None if `text` is not a date.
+    """
+    match = _DATE_RE.fullmatch(str(text or '').strip())
+    if match is None:
+        return None
+    year, month, day = (int(part) if part else None for part in match.groups())
+    try:
+        if month is None:
+            return date(year, 1, 1).toordinal(), date(year, 12, 31).toordinal()
+        if day is None:
+            last = calendar.monthrange(year, month)[1]
+            return date(year, month, 1).toordinal(), date(year, month, last).toordinal()
+        ordinal = date(year, month, day).toordinal()
+    except ValueError:
+        return None
+    return ordinal, ordinal
+
+
+def parse_range(token: str) -> Tuple[str, int | None, int | None]:
+    """
+    Parse a range term into (field, first ordinal, last ordinal), both
+    inclusive; None stands for an open end.
+
+    Raises:
+        ValueError: If the token is not a range term or a bound is not a date
+    """
+    match = RANGE_TOKEN_RE.fullmatch(token.strip())
+    if match is None:
+        raise ValueError(f'Invalid date range: {token}')
+    field, operator, value, opening, start, end, closing = match.groups()
+
+    def span(text):
+        if text == OPEN_BOUND:
+            return None
+        result = date_span(text)
+        if result is None:
+            raise ValueError(f'Invalid date in range: {text}')
+        return result
+
+    if operator:
+        bound = span(value)
+        if bound is None:
+            return field.lower(), None, None
+        first, last = bound
+        if operator == '>=':
+            return field.lower(), first, None
+        if operator == '>':
+            return field.lower(), last + 1, None
+        if operator == '<=':
+            return field.lower(), None, last
+        return field.lower(), None, first - 1
+
+    low, high = span(start), span(end)
+    first = None if low is None else (low[0] if opening == '[' else low[1] + 1)
+    last = None if high is None else (high[1] if closing == ']' else high[0] - 1)
+    return field.lower(), first, last
+
+
+class DateIndex:
+    """
+    Per date field, a sorted list of (date ordinal, rule id).
+
+    Rule ids are assigned by the owning RuleIndex; this class only keeps the
+    lists in sync through add/remove. Rules whose date is set but cannot be
+    parsed are tracked separately so text searches on them still work.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._entries: Dict[str, List[Tuple[int, int]]] = {field: [] for field in DATE_FIELDS}
+        self._unparsed: Dict[str, Set[int]] = {field: set() for field in DATE_FIELDS}
+
+    def _dates(self, rule: Dict[str, Any]):
+        for field in DATE_FIELDS:
+            text = rule_metadata(rule, field)
+            if text:
+                yield field, parse_date(text)
+
+    def add(self, rule_id: int, rule: Dict[str, Any]):
+        for field, parsed in self._dates(rule):
+            if parsed is None:
+                self._unparsed[field].add(rule_id)
+            else:
+                bisect.insort(self._entries[field], (parsed.toordinal(), rule_id))
+
+    def remove(self, rule_id: int, rule: Dict[str, Any]):
+        for field, parsed in self._dates(rule):
+            if parsed is None:
+                self._unparsed[field].discard(rule_id)
+                continue
+            entries = self._entries[field]
+            entry = (parsed.toordinal(), rule_id)
+            position = bisect.bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                del entries[position]
+
+    def range_ids(self, field: str, first: int | None, last: int | None) -> List[int]:
+        """Ids of the rules whose `field` date lies in [first, last] (ordinals, None = open)."""
+        entries = self._entries[field]
+        start = 0 if first is None else bisect.bisect_left(entries, (first,))
+        end = len(entries) if last is None else bisect.bisect_left(entries, (last + 1,))
+        return [rule_id for _, rule_id in entries[start:end]]
+
+    def unparsed_ids(self, field: str) -> Set[int]:
+        """Ids of the rules with a `field` value that is not a full date."""
+        return self._unparsed[field]
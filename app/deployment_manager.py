@@ -40,8 +40,32 @@ class DeploymentManager:
                     ON deployments(is_deployed)
                 """)
                 
+                # Một dòng đếm phiên bản, tăng trong cùng transaction với mỗi thay đổi
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS deployment_state (
+                        id INTEGER PRIMARY KEY CHECK (id = 1),
+                        version INTEGER NOT NULL
+                    )
+                """)
+                conn.execute("INSERT OR IGNORE INTO deployment_state (id, version) VALUES (1, 0)")
+                
                 conn.commit()
     
+    @property
+    def version(self):
+        """
+        Phiên bản trạng thái triển khai (dùng làm key cho cache).
+        Đọc từ database nên mọi process dùng chung database đều thấy cùng giá trị.
+        """
+        with self._lock:
+            with sqlite3.connect(self.db_path) as conn:
+                row = conn.execute("SELECT version FROM deployment_state WHERE id = 1").fetchone()
+                return row[0] if row else 0
+    
+    @staticmethod
+    def _bump_version(conn):
+        conn.execute("UPDATE deployment_state SET version = version + 1 WHERE id = 1")
+    
     def get_deployment_status(self, rule_file_path):
         """
         Lấy trạng thái triển khai của một rule
@@ -85,6 +109,7 @@ class DeploymentManager:
                     (rule_file_path, rule_title, is_deployed, deployed_at, deployment_notes, updated_at)
                     VALUES (?, ?, ?, ?, ?, ?)
                 """, (rule_file_path, rule_title, is_deployed, deployed_at, notes, datetime.now().isoformat()))
+                self._bump_version(conn)
                 
                 conn.commit()
     
@@ -158,5 +183,6 @@ class DeploymentManager:
                 else:
                     # Nếu không có rule nào, xóa tất cả
                     conn.execute("DELETE FROM deployments")
+                self._bump_version(conn)
                 
-                conn.commit() 
\ No newline at end of file
+                conn.commit()
\ No newline at end of file
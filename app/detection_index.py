@@ -0,0 +1,133 @@
+"""
+Index over the detection logic of the loaded rules.
+Every (field, modifiers, value) triple of a rule's detection section is
+filed under its lowercased Sigma field, and Stellar field names (from
+field_mappings.SIGMA_TO_STELLAR_FIELDS) point back to the Sigma fields they
+map from, so a field:value question only looks at that field's values
+instead of the raw YAML of every rule.
+"""
+import re
+from typing import Any, Dict, List, Set, Tuple
+
+import yaml
+
+from .field_mappings import SIGMA_TO_STELLAR_FIELDS
+from .lucene_converter import detection_items
+
+# Query fields answered from the detection index
+DETECTION_FIELD = 'detection'
+STELLAR_FIELD = 'stellarfield'
+
+# Query value: Field|modifier|modifier=value, each part optional
+_QUERY_RE = re.compile(r'([^|=]*)((?:\|[^|=]*)*)(?:=(.*))?', re.DOTALL)
+
+
+_STELLAR_BY_FIELD = {name.lower(): mapped for name, mapped in SIGMA_TO_STELLAR_FIELDS.items()}
+
+
+def stellar_field(sigma_field: str) -> str:
+    """Stellar field a Sigma field is converted to (the Sigma name when unmapped)."""
+    return _STELLAR_BY_FIELD.get(sigma_field.lower(), sigma_field)
+
+
+def parse_detection_query(value: str) -> Tuple[str, Tuple[str, ...], str | None]:
+    """
+    Split `CommandLine|contains=-enc` into ('commandline', ('contains',), '-enc').
+    The field may be empty (any field) and the value None (any value).
+    """
+    field, modifiers, match_value = _QUERY_RE.fullmatch(value.strip()).groups()
+    modifiers = tuple(op.strip().lower() for op in modifiers.split('|') if op.strip())
+    return field.strip().lower(), modifiers, None if match_value is None else match_value.lower()
+
+
+def rule_detection_items(rule: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+    """
+    Detection triples of a rule. Loaded rules carry them; rules built
+    elsewhere (e.g. posted by the browser) have them parsed from the content.
+    """
+    if 'detection_items' in rule:
+        return rule['detection_items'] or []
+    try:
+        data = yaml.safe_load(rule.get('content', '') or '')
+    except yaml.YAMLError:
+        return []
+    return detection_items(data.get('detection')) if isinstance(data, dict) else []
+
+
+def match_detection(items, field: str, modifiers: Tuple[str, ...], value: str | None,
+                    stellar: bool = False) -> bool:
+    """Per-rule form of DetectionIndex.ids over a rule's detection triples."""
+    wanted = set(modifiers)
+    for name, entry_modifiers, entry_value in items:
+        if field:
+            if stellar:
+                mapped = stellar_field(name).lower()
+                if field != mapped and field != mapped.rsplit('.', 1)[-1]:
+                    continue
+            elif name.lower() != field:
+                continue
+        if wanted and not wanted.issubset(entry_modifiers.split('|')):
+            continue
+        if value is not None and value not in entry_value.lower():
+            continue
+        return True
+    return False
+
+
+class DetectionIndex:
+    """
+    Lowercased Sigma field -> [(modifiers, lowercased value, rule id)], plus
+    lowercased Stellar field -> Sigma fields.
+
+    Rule ids are assigned by the owning RuleIndex; this class only keeps its
+    maps in sync through add/remove.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._entries: Dict[str, List[Tuple[Tuple[str, ...], str, int]]] = {}
+        self._stellar: Dict[str, Set[str]] = {}
+
+    def add(self, rule_id: int, rule: Dict[str, Any]):
+        for name, modifiers, value in rule_detection_items(rule):
+            field = name.lower()
+            entries = self._entries.get(field)
+            if entries is None:
+                entries = self._entries[field] = []
+                mapped = stellar_field(name).lower()
+                self._stellar.setdefault(mapped, set()).add(field)
+                # The last part of a dotted Stellar name works on its own too
+                self._stellar.setdefault(mapped.rsplit('.', 1)[-1], set()).add(field)
+            entries.append((tuple(modifiers.split('|')) if modifiers else (), value.lower(), rule_id))
+
+    def remove(self, rule_id: int, rule: Dict[str, Any]):
+        for field in {name.lower() for name, _, _ in rule_detection_items(rule)}:
+            entries = self._entries.get(field)
+            if entries:
+                entries[:] = [entry for entry in entries if entry[2] != rule_id]
+
+    def ids(self, field: str, modifiers: Tuple[str, ...] = (), value: str | None = None,
+            stellar: bool = False) -> Set[int]:
+        """
+        Ids of the rules with a detection item on `field` (any field when
+        empty; a Stellar field name when `stellar`) that uses every modifier
+        in `modifiers` and whose value contains `value` (case-insensitive).
+        """
+        if not field:
+            fields = list(self._entries)
+        elif stellar:
+            fields = self._stellar.get(field, ())
+        else:
+            fields = (field,) if field in self._entries else ()
+        wanted = set(modifiers)
+        result = set()
+        for name in fields:
+            for entry_modifiers, entry_value, rule_id in self._entries[name]:
+                if wanted and not wanted.issubset(entry_modifiers):
+                    continue
+                if value is not None and value not in entry_value:
+                    continue
+                result.add(rule_id)
+        return result
@@ -0,0 +1,104 @@
+"""
+Facet index over the loaded Sigma rules.
+Maps every facet value (logsource product/category/service, level, status,
+tag namespace, source directory) to a bitset of rule ids, so counts for any
+result set are a handful of bitset intersections.
+"""
+from typing import Any, Callable, Dict, Iterable, List
+
+from .rule_record import rule_metadata
+from . import bitset
+
+
+def _logsource(key: str) -> Callable[[Dict[str, Any]], List[str]]:
+    def values(rule):
+        logsource = rule.get('logsource')
+        if isinstance(logsource, dict) and logsource.get(key):
+            return [str(logsource[key])]
+        return []
+    return values
+
+
+def _tag_namespaces(rule: Dict[str, Any]) -> List[str]:
+    return [str(tag).split('.', 1)[0] for tag in rule.get('tags', []) or []]
+
+
+def _source(rule: Dict[str, Any]) -> List[str]:
+    file_path = rule.get('file_path', '') or ''
+    return [file_path.split('/', 1)[0]] if '/' in file_path else []
+
+
+# Facets kept in the index and how to read their values from a rule
+FACET_FIELDS: Dict[str, Callable[[Dict[str, Any]], Iterable[str]]] = {
+    'product': _logsource('product'),
+    'category': _logsource('category'),
+    'service': _logsource('service'),
+    'level': lambda rule: [rule_metadata(rule, 'level')],
+    'status': lambda rule: [rule_metadata(rule, 'status')],
+    'tag_namespace': _tag_namespaces,
+    'source': _source,
+}
+
+
+def _normalize(value: str) -> str:
+    return str(value).strip().lower()
+
+
+class FacetIndex:
+    """
+    Facet value -> bitset of rule ids.
+
+    Rule ids are assigned by the owning RuleIndex; this class only keeps the
+    masks in sync through add/remove.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._masks: Dict[str, Dict[str, int]] = {facet: {} for facet in FACET_FIELDS}
+
+    def _values(self, rule: Dict[str, Any]):
+        for facet, getter in FACET_FIELDS.items():
+            for value in {_normalize(value) for value in getter(rule)}:
+                if value:
+                    yield facet, value
+
+    def add(self, rule_id: int, rule: Dict[str, Any]):
+        for facet, value in self._values(rule):
+            masks = self._masks[facet]
+            masks[value] = bitset.set_bit(masks.get(value, 0), rule_id)
+
+    def remove(self, rule_id: int, rule: Dict[str, Any]):
+        for facet, value in self._values(rule):
+            masks = self._masks[facet]
+            mask = bitset.clear_bit(masks.get(value, 0), rule_id)
+            if mask:
+                masks[value] = mask
+            else:
+                masks.pop(value, None)
+
+    def values(self, facet: str) -> List[str]:
+        """Known values of a facet, sorted."""
+        return sorted(self._masks.get(facet, {}))
+
+    def mask(self, facet: str, value: str) -> int:
+        """Bitset of the rules having `value` for `facet`."""
+        return self._masks.get(facet, {}).get(_normalize(value), 0)
+
+    def counts(self, mask: int) -> Dict[str, Dict[str, int]]:
+        """
+        Per-facet value counts for the rules in `mask`.
+
+        Values without any rule in `mask` are left out; each facet is
+        ordered by descending count, then value.
+        """
+        result = {}
+        for facet, masks in self._masks.items():
+            counts = {}
+            for value, value_mask in masks.items():
+                count = bitset.count(mask & value_mask)
+                if count:
+                    counts[value] = count
+            result[facet] = dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+        return result
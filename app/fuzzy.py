@@ -0,0 +1,91 @@
+"""
+Typo-tolerant term matching.
+Vocabulary tokens are indexed by their padded bigrams; a fuzzy term only
+runs the (bounded) edit distance against tokens that share enough bigrams
+with it and have a compatible length, instead of every token of every rule.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+# Prefix marking a fuzzy term: ~mimkatz, title:~powershel
+FUZZY_PREFIX = '~'
+
+# Field name form of the operator: fuzzy:mimkatz
+FUZZY_FIELD = 'fuzzy'
+
+GRAM_SIZE = 2
+
+
+def max_edits(term: str) -> int:
+    """Edits allowed for a term: none for very short terms, more for longer ones."""
+    if len(term) <= 2:
+        return 0
+    if len(term) <= 5:
+        return 1
+    return 2
+
+
+def bounded_levenshtein(a: str, b: str, limit: int) -> int:
+    """
+    Levenshtein distance between `a` and `b`, or `limit + 1` as soon as it
+    is known to exceed `limit`. Only a band of width 2*limit+1 is computed.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) > len(b):
+        a, b = b, a
+    over = limit + 1
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        low = max(1, i - limit)
+        high = min(len(b), i + limit)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= limit else over
+        char = a[i - 1]
+        row_min = current[0]
+        for j in range(low, high + 1):
+            cost = 0 if char == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            current[j] = value if value <= limit else over
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return over
+        previous = current
+    return previous[len(b)] if previous[len(b)] <= limit else over
+
+
+def _grams(token: str) -> List[str]:
+    padded = f'^{token}$'
+    return [padded[i:i + GRAM_SIZE] for i in range(len(padded) - GRAM_SIZE + 1)]
+
+
+class FuzzyVocabulary:
+    """Bigram index over a set of tokens for edit-distance lookups."""
+
+    def __init__(self, tokens: Iterable[str]):
+        self._grams: Dict[str, List[str]] = defaultdict(list)
+        for token in tokens:
+            for gram in set(_grams(token)):
+                self._grams[gram].append(token)
+
+    def lookup(self, term: str, limit: int | None = None) -> List[str]:
+        """Tokens within `limit` edits of `term` (default: max_edits(term))."""
+        term = term.lower()
+        if limit is None:
+            limit = max_edits(term)
+        grams = set(_grams(term))
+        # q-gram lemma: each edit destroys at most GRAM_SIZE grams
+        needed = len(grams) - limit * GRAM_SIZE
+        if needed <= 0:
+            # Too short to filter by grams; only the length bound applies
+            candidates = {token for tokens in self._grams.values() for token in tokens}
+        else:
+            shared = defaultdict(int)
+            for gram in grams:
+                for token in self._grams.get(gram, ()):
+                    shared[token] += 1
+            candidates = [token for token, count in shared.items() if count >= needed]
+        return [token for token in candidates
+                if abs(len(token) - len(term)) <= limit
+                and bounded_levenshtein(term, token, limit) <= limit]
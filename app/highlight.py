@@ -0,0 +1,68 @@
+"""
+Search term highlighting.
+The highlight terms of a query are extracted once with the advanced search
+tokenizer and compiled into a single case-insensitive alternation, cached
+per query, so every rendered title is highlighted in one regex pass.
+"""
+import re
+from functools import lru_cache
+from typing import List, Pattern, Tuple
+
+from markupsafe import Markup, escape
+
+from .advanced_search import advanced_search
+
+# Terms this short are not highlighted (they match almost everywhere)
+MIN_HIGHLIGHT_LENGTH = 3
+
+HIGHLIGHT_CACHE_SIZE = 256
+
+_OPERATORS = {'AND', 'OR', 'NOT', '(', ')'}
+
+
+def highlight_terms(query: str) -> Tuple[str, ...]:
+    """
+    Free-text terms of a query worth highlighting: operators, parentheses,
+    field queries (field:value) and regex/fuzzy terms are skipped, as are
+    very short terms.
+    """
+    terms = []
+    for token in advanced_search.tokenize(query or ''):
+        if token.upper() in _OPERATORS or ':' in token or advanced_search._is_special(token):
+            continue
+        term = token.strip('"\'()')
+        if len(term) >= MIN_HIGHLIGHT_LENGTH and term.lower() not in (t.lower() for t in terms):
+            terms.append(term)
+    return tuple(terms)
+
+
+@lru_cache(maxsize=HIGHLIGHT_CACHE_SIZE)
+def highlight_pattern(query: str) -> Pattern | None:
+    """Single alternation regex for the highlight terms of a query (None if there are none)."""
+    terms = highlight_terms(query)
+    if not terms:
+        return None
+    # Longest first so a longer term wins over one of its prefixes
+    alternatives = sorted(terms, key=len, reverse=True)
+    return re.compile('|'.join(re.escape(term) for term in alternatives), re.IGNORECASE)
+
+
+def match_offsets(text: str, query: str) -> List[Tuple[int, int]]:
+    """(start, end) offsets of the highlight terms of `query` in `text`."""
+    pattern = highlight_pattern(query or '')
+    if pattern is None or not text:
+        return []
+    return [match.span() for match in pattern.finditer(str(text))]
+
+
+def highlight_html(text: str, query: str) -> Markup:
+    """HTML-escape `text` and wrap the highlight terms of `query` in <mark>."""
+    text = '' if text is None else str(text)
+    parts = []
+    last = 0
+    for start, end in match_offsets(text, query):
+        parts.append(escape(text[last:start]))
+        parts.append(Markup('<mark>%s</mark>') % text[start:end])
+        last = end
+    parts.append(escape(text[last:]))
+    return Markup('').join(parts)
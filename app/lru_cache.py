@@ -0,0 +1,73 @@
+"""
+Small thread-safe LRU cache used for compiled query plans and search results.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class LRUCache:
+    """
+    Bounded mapping that evicts the least recently used entry when full.
+
+    Besides the entry count, an optional `maxweight` bounds the summed weight
+    of all entries (e.g. the number of rule references held by cached
+    results).
+    """
+
+    def __init__(self, maxsize: int = 128, maxweight: int | None = None):
+        self.maxsize = maxsize
+        self.maxweight = maxweight
+        self._data = OrderedDict()
+        self._weights = {}
+        self._total_weight = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value and mark it as recently used."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, weight: int = 1):
+        """Store a value, evicting the oldest entries beyond maxsize/maxweight."""
+        with self._lock:
+            if self.maxweight is not None and weight > self.maxweight:
+                return
+            self._total_weight += weight - self._weights.get(key, 0)
+            self._weights[key] = weight
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize or (
+                    self.maxweight is not None and self._total_weight > self.maxweight):
+                old_key, _ = self._data.popitem(last=False)
+                self._total_weight -= self._weights.pop(old_key)
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._data.clear()
+            self._weights.clear()
+            self._total_weight = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Return size and hit/miss counters."""
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'weight': self._total_weight,
+            'maxweight': self.maxweight,
+            'hits': self.hits,
+            'misses': self.misses
+        }
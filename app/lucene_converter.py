@@ -48,6 +48,66 @@ def handle_single_value(field, operator, value):
     return None
 
 
+def iter_detection_items(detection):
+    """
+    Walk the selections of a detection section.
+
+    Yields (selection name, field expression, match values) for every
+    field of a map selection or of the maps inside a list selection.
+    The condition and timeframe keys are skipped.
+    """
+    if not isinstance(detection, dict):
+        return
+    for key, value in detection.items():
+        if key in ["condition", "timeframe"]:
+            continue
+        if isinstance(value, dict):
+            items = [value]
+        elif isinstance(value, list):
+            items = [item for item in value if isinstance(item, dict)]
+        else:
+            continue
+        for item in items:
+            for field_expr, match_values in item.items():
+                yield key, str(field_expr), match_values
+
+
+def detection_field_names(detection):
+    """Distinct field names (without modifiers) used by a detection section, in order."""
+    names = []
+    for _, field_expr, _ in iter_detection_items(detection):
+        name = field_expr.split('|', 1)[0].strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def detection_items(detection):
+    """
+    (field name, modifiers, value) triples of a detection section, e.g.
+    ('CommandLine', 'contains|all', '-enc'). Modifiers are lowercased and
+    joined with '|' ('' for a plain equality match); each match value gives
+    its own triple, null values an empty string. Aggregation expressions
+    (count(), near) are skipped.
+    """
+    triples = []
+    for _, field_expr, match_values in iter_detection_items(detection):
+        if '|' in field_expr and ('count()' in field_expr or 'near' in field_expr):
+            continue
+        name, _, modifiers = field_expr.partition('|')
+        name = name.strip()
+        if not name:
+            continue
+        modifiers = '|'.join(op.strip().lower() for op in modifiers.split('|') if op.strip())
+        values = match_values if isinstance(match_values, list) else [match_values]
+        for value in values:
+            if value is None:
+                triples.append((name, modifiers, ''))
+            elif isinstance(value, (str, int, float, bool)):
+                triples.append((name, modifiers, str(value)))
+    return triples
+
+
 def process_detection_section(detection):
     """Process the detection section and extract all field expressions with proper grouping."""
     try:
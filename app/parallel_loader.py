@@ -1,17 +1,37 @@
 """
 Parallel rule loading for faster startup.
-Uses multiprocessing to load rules from multiple directories simultaneously.
+YAML parsing is CPU-bound and holds the GIL, so rule files are parsed in a
+process pool, in chunked batches sized from the CPU and file counts, with
+PyYAML's libyaml-based loader when it is available.
 """
 import os
+import time
+import threading
 import yaml
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, NamedTuple, Tuple
+from .rule_record import RuleRecord, build_rule_record
 
 logger = logging.getLogger(__name__)
 
+# libyaml-based loader when PyYAML was built with it; builds the same objects as yaml.SafeLoader
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
 
-def load_rules_from_file(file_path: str, rules_dir: str) -> Dict[str, Any] | None:
+# Below this many files, parsing in-process beats starting worker processes
+MIN_FILES_PER_WORKER = 100
+
+# Batches per worker: more batches even out slow files, fewer save IPC round trips
+CHUNKS_PER_WORKER = 4
+
+
+def parse_yaml(raw_content: str) -> Any:
+    """Parse YAML text with the fastest available safe loader."""
+    return yaml.load(raw_content, Loader=YAML_LOADER)
+
+
+def load_rules_from_file(file_path: str, rules_dir: str) -> RuleRecord | None:
     """
     Load a single rule file.
     
@@ -20,7 +40,7 @@ def load_rules_from_file(file_path: str, rules_dir: str) -> Dict[str, Any] | Non
         rules_dir: Base rules directory for relative path calculation
         
     Returns:
-        Rule dictionary or None if invalid
+        Rule record or None if invalid
     """
     try:
         # Skip files larger than 1MB
@@ -31,7 +51,7 @@ def load_rules_from_file(file_path: str, rules_dir: str) -> Dict[str, Any] | Non
             raw_content = f.read()
             
         try:
-            data = yaml.safe_load(raw_content)
+            data = parse_yaml(raw_content)
         except yaml.YAMLError:
             return None
         
@@ -42,68 +62,147 @@ def load_rules_from_file(file_path: str, rules_dir: str) -> Dict[str, Any] | Non
         if not any(key in data for key in ['title', 'detection']):
             return None
         
-        return {
-            'title': data.get('title', ''),
-            'description': data.get('description', ''),
-            'tags': data.get('tags', []) if isinstance(data.get('tags'), list) else [],
-            'file_path': os.path.relpath(file_path, rules_dir).replace(os.sep, '/'),
-            'logsource': data.get('logsource', {}) if isinstance(data.get('logsource'), dict) else {},
-            'content': raw_content
-        }
+        return build_rule_record(data, raw_content, os.path.relpath(file_path, rules_dir).replace(os.sep, '/'))
     
     except (IOError, OSError):
         return None
+    except Exception as e:
+        # A malformed rule (e.g. date: 2023-13-45) must not abort the whole batch
+        logger.warning(f"Skipping rule {file_path}: {e}")
+        return None
 
 
-def collect_rule_files(search_dirs: List[str]) -> List[str]:
+class RuleFile(NamedTuple):
+    path: str
+    # None when the file sits in a directory that was not re-listed (see scan_rule_files)
+    size: int | None
+    mtime_ns: int | None
+
+
+# Directory listing cached between scans: (mtime_ns, rule file names, subdirectory names)
+DirListing = Tuple[int, Tuple[str, ...], Tuple[str, ...]]
+
+# Directories modified this recently are not cached: a change in the same
+# timestamp tick would leave their mtime unchanged
+RACY_MTIME_WINDOW_NS = 2_000_000_000
+
+
+def _is_rule_file(name: str) -> bool:
+    return not name.startswith('.') and (name.endswith('.yml') or name.endswith('.yaml'))
+
+
+def scan_rule_files(search_dirs: List[str], known_dirs: Dict[str, DirListing] | None = None,
+                    ) -> Tuple[List[RuleFile], Dict[str, DirListing]]:
     """
-    Collect all rule file paths from search directories.
+    Walk the search directories once with os.scandir, stat-ing rule files
+    through their DirEntry.
+    
+    A directory whose mtime equals its entry in `known_dirs` has had no file
+    added, removed or renamed since that listing was taken, so it is not
+    listed again and its files come back unstat-ed (size and mtime None).
+    Subdirectories are still visited, since their changes do not touch the
+    parent's mtime.
     
     Args:
         search_dirs: List of directories to search
+        known_dirs: Directory listings returned by a previous scan
         
     Returns:
-        List of absolute file paths
+        Rule files in discovery order, and the directory listings to pass
+        as known_dirs next time
     """
+    known_dirs = known_dirs or {}
     rule_files = []
-    seen_files = set()
+    listings = {}
+    seen_dirs = set()
+    racy_after = time.time_ns() - RACY_MTIME_WINDOW_NS
     
-    for search_dir in search_dirs:
-        if not os.path.exists(search_dir):
-            continue
+    def walk(dir_path, mtime_ns):
+        # Nested search directories (rules-emerging-threats, ...) are walked once
+        if dir_path in seen_dirs:
+            return
+        seen_dirs.add(dir_path)
         
-        for root, _, files in os.walk(search_dir):
-            for file in files:
-                if file.startswith('.') or not (file.endswith('.yml') or file.endswith('.yaml')):
-                    continue
-                
-                file_path = os.path.join(root, file)
-                
-                # Avoid duplicates
-                if file_path in seen_files:
+        known = known_dirs.get(dir_path)
+        if known and known[0] == mtime_ns:
+            _, file_names, subdir_names = known
+            listings[dir_path] = known
+            base = os.path.join(dir_path, '')
+            rule_files.extend(RuleFile(base + name, None, None) for name in file_names)
+            for name in subdir_names:
+                subdir_path = os.path.join(dir_path, name)
+                try:
+                    subdir_mtime = os.stat(subdir_path).st_mtime_ns
+                except OSError:
                     continue
-                seen_files.add(file_path)
-                
-                rule_files.append(file_path)
+                walk(subdir_path, subdir_mtime)
+            return
+        
+        file_names = []
+        subdirs = []
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append((entry.name, entry.stat().st_mtime_ns))
+                        elif entry.is_file() and _is_rule_file(entry.name):
+                            stat = entry.stat()
+                            file_names.append(entry.name)
+                            rule_files.append(RuleFile(entry.path, stat.st_size, stat.st_mtime_ns))
+                    except OSError:
+                        continue
+        except OSError:
+            return
+        
+        if mtime_ns < racy_after:
+            listings[dir_path] = (mtime_ns, tuple(file_names), tuple(name for name, _ in subdirs))
+        for name, subdir_mtime in subdirs:
+            walk(os.path.join(dir_path, name), subdir_mtime)
+    
+    for search_dir in search_dirs:
+        try:
+            walk(search_dir, os.stat(search_dir).st_mtime_ns)
+        except OSError:
+            continue
     
-    return rule_files
+    return rule_files, listings
 
 
-def load_rules_parallel(rules_dir: str, max_workers: int = 4) -> List[Dict[str, Any]]:
+def collect_rule_files(search_dirs: List[str]) -> List[str]:
     """
-    Load rules in parallel using thread pool.
+    Collect all rule file paths from search directories.
     
     Args:
-        rules_dir: Base rules directory
-        max_workers: Maximum number of parallel workers
+        search_dirs: List of directories to search
         
     Returns:
-        List of loaded rules
+        List of absolute file paths
     """
-    import time
-    start_time = time.time()
-    
-    # Determine search directories
+    rule_files, _ = scan_rule_files(search_dirs)
+    return [rule_file.path for rule_file in rule_files]
+
+
+def _load_batch(file_paths: List[str], rules_dir: str) -> List[RuleRecord | None]:
+    """Worker entry point: parse a batch of rule files."""
+    return [load_rules_from_file(file_path, rules_dir) for file_path in file_paths]
+
+
+def plan_batches(file_count: int, max_workers: int | None = None) -> Tuple[int, int]:
+    """
+    Number of worker processes and files per batch for `file_count` files.
+
+    Workers default to the CPU count and are capped so each one gets at
+    least MIN_FILES_PER_WORKER files; a single worker means parse in-process.
+    """
+    cpus = max_workers or os.cpu_count() or 1
+    workers = max(1, min(cpus, file_count // MIN_FILES_PER_WORKER))
+    chunk_size = max(1, -(-file_count // (workers * CHUNKS_PER_WORKER)))
+    return workers, chunk_size
+
+
+def rule_search_dirs(rules_dir: str) -> List[str]:
+    """The rules directory plus the additional SigmaHQ rule directories inside it."""
     search_dirs = [rules_dir]
     
     additional_rule_dirs = [
@@ -119,37 +218,75 @@ def load_rules_parallel(rules_dir: str, max_workers: int = 4) -> List[Dict[str,
         if os.path.exists(dir_path):
             search_dirs.append(dir_path)
     
+    return search_dirs
+
+
+def parse_rule_files(rule_files: List[str], rules_dir: str,
+                     max_workers: int | None = None) -> List[RuleRecord | None]:
+    """
+    Parse rule files, in a process pool when there are enough of them.
+    
+    Only the main thread starts a pool: forking a process that is serving
+    requests on other threads (e.g. a reload from /update) can copy held
+    locks into the workers, so other threads parse in-process.
+    
+    Args:
+        rule_files: Absolute paths of the rule files
+        rules_dir: Base rules directory for relative path calculation
+        max_workers: Maximum number of worker processes (default: CPU count)
+        
+    Returns:
+        One rule record (None if invalid) per file, in the order of rule_files
+    """
+    workers, chunk_size = plan_batches(len(rule_files), max_workers)
+    batches = [rule_files[i:i + chunk_size] for i in range(0, len(rule_files), chunk_size)]
+    
+    if workers > 1 and threading.current_thread() is not threading.main_thread():
+        workers = 1
+    
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # map() keeps batch order, so rules come back in file order
+                results = [rule for batch in executor.map(_load_batch, batches, [rules_dir] * len(batches))
+                           for rule in batch]
+            logger.info(f"Parsed {len(rule_files)} files in {workers} processes ({len(batches)} batches)")
+            return results
+        except (BrokenProcessPool, OSError) as e:
+            logger.warning(f"Process pool unavailable ({e}), parsing rules in-process")
+    return _load_batch(rule_files, rules_dir)
+
+
+def load_rules_parallel(rules_dir: str, max_workers: int | None = None) -> List[RuleRecord]:
+    """
+    Load rules in parallel using a process pool.
+    
+    Args:
+        rules_dir: Base rules directory
+        max_workers: Maximum number of worker processes (default: CPU count)
+        
+    Returns:
+        List of loaded rules, in file discovery order
+    """
+    start_time = time.time()
+    
+    # Determine search directories
+    search_dirs = rule_search_dirs(rules_dir)
+    
     # Collect all rule files
     logger.info(f"Scanning {len(search_dirs)} directories for rules...")
     rule_files = collect_rule_files(search_dirs)
     logger.info(f"Found {len(rule_files)} rule files")
     
-    # Load rules in parallel
-    rules = []
-    loaded_count = 0
-    failed_count = 0
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all tasks
-        future_to_file = {
-            executor.submit(load_rules_from_file, file_path, rules_dir): file_path
-            for file_path in rule_files
-        }
-        
-        # Collect results as they complete
-        for future in as_completed(future_to_file):
-            try:
-                rule = future.result()
-                if rule:
-                    rules.append(rule)
-                    loaded_count += 1
-                else:
-                    failed_count += 1
-            except Exception as e:
-                failed_count += 1
-                logger.debug(f"Failed to load rule: {e}")
+    results = parse_rule_files(rule_files, rules_dir, max_workers)
+    
+    rules = [rule for rule in results if rule]
+    loaded_count = len(rules)
+    failed_count = len(results) - loaded_count
     
     elapsed = time.time() - start_time
-    logger.info(f"Parallel loading completed: {loaded_count} loaded, {failed_count} skipped in {elapsed:.2f}s")
+    loader = 'libyaml' if YAML_LOADER is not yaml.SafeLoader else 'pure-Python'
+    logger.info(f"Parallel loading completed: {loaded_count} loaded, {failed_count} skipped in {elapsed:.2f}s "
+                f"({loader} YAML)")
     
     return rules
@@ -0,0 +1,106 @@
+"""
+Directory tree index over rule file paths.
+Maps every path component and every directory prefix to a bitset of rule
+ids, and keeps, for each component, the rules grouped by the subcategory
+that follows it, already sorted the way the index page lists them.
+"""
+import bisect
+from typing import Any, Dict, List, Tuple
+
+from .rule_processor import format_subcategory, rule_sort_key
+from . import bitset
+
+# Group title for rules without a path component after the selected one
+OTHER_GROUP = 'Other'
+
+
+def _parts(file_path: str) -> List[str]:
+    return file_path.lower().split('/')
+
+
+class PathIndex:
+    """
+    Path component/prefix -> bitset of rule ids, plus sorted per-group id lists.
+
+    Rule ids are assigned by the owning RuleIndex; this class only keeps its
+    maps in sync through add/remove.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._components: Dict[str, int] = {}
+        self._prefixes: Dict[str, int] = {}
+        # component -> group title -> sorted [(sort key, rule id)]
+        self._groups: Dict[str, Dict[str, List[Tuple[str, int]]]] = {}
+        # component -> materialized grouped_ids() result, dropped when the component changes
+        self._views: Dict[str, Dict[str, List[int]]] = {}
+
+    def _entries(self, file_path: str):
+        """(component, group title) for each distinct component of a path."""
+        parts = _parts(file_path)
+        seen = set()
+        for position, component in enumerate(parts):
+            if component in seen:
+                continue
+            seen.add(component)
+            # Same rule as rule_processor.extract_subcategory: first occurrence wins
+            group = format_subcategory(parts[position + 1]) if position + 1 < len(parts) else OTHER_GROUP
+            yield component, group
+
+    def add(self, rule_id: int, rule: Dict[str, Any]):
+        file_path = rule.get('file_path', '') or ''
+        parts = _parts(file_path)
+        for depth in range(1, len(parts)):
+            prefix = '/'.join(parts[:depth])
+            self._prefixes[prefix] = bitset.set_bit(self._prefixes.get(prefix, 0), rule_id)
+
+        entry = (rule_sort_key(rule), rule_id)
+        for component, group in self._entries(file_path):
+            self._components[component] = bitset.set_bit(self._components.get(component, 0), rule_id)
+            self._views.pop(component, None)
+            bisect.insort(self._groups.setdefault(component, {}).setdefault(group, []), entry)
+
+    def remove(self, rule_id: int, rule: Dict[str, Any]):
+        file_path = rule.get('file_path', '') or ''
+        parts = _parts(file_path)
+        for depth in range(1, len(parts)):
+            prefix = '/'.join(parts[:depth])
+            if prefix in self._prefixes:
+                self._prefixes[prefix] = bitset.clear_bit(self._prefixes[prefix], rule_id)
+
+        entry = (rule_sort_key(rule), rule_id)
+        for component, group in self._entries(file_path):
+            if component in self._components:
+                self._components[component] = bitset.clear_bit(self._components[component], rule_id)
+            self._views.pop(component, None)
+            entries = self._groups.get(component, {}).get(group)
+            if entries:
+                position = bisect.bisect_left(entries, entry)
+                if position < len(entries) and entries[position] == entry:
+                    del entries[position]
+                if not entries:
+                    del self._groups[component][group]
+
+    def component_mask(self, component: str) -> int:
+        """Bitset of the rules whose file path has `component` as one of its parts."""
+        return self._components.get(component.lower(), 0)
+
+    def prefix_mask(self, prefix: str) -> int:
+        """Bitset of the rules under a directory prefix such as 'windows/process_creation'."""
+        return self._prefixes.get(prefix.lower().strip('/'), 0)
+
+    def grouped_ids(self, component: str) -> Dict[str, List[int]]:
+        """
+        Rule ids under `component`, grouped by the path part that follows it.
+        Groups are sorted by title and rules within a group by title/path.
+        The result is shared; callers must not modify it.
+        """
+        component = component.lower()
+        view = self._views.get(component)
+        if view is None:
+            groups = self._groups.get(component, {})
+            view = {group: [rule_id for _, rule_id in groups[group]] for group in sorted(groups)}
+            self._views[component] = view
+        return view
@@ -0,0 +1,158 @@
+"""
+Relevance ranking for search results.
+Scores matched rules with BM25 over the indexed text fields, boosting
+matches in the title over tags, description and raw content, and keeps
+only the top-k hits with a heap instead of sorting every match.
+"""
+import heapq
+import math
+from typing import Any, Dict, List, Tuple
+
+from .advanced_search import advanced_search, AndNode, OrNode, NotNode, FuzzyTerm, RegexTerm
+from .search_index import INDEXED_FIELDS, TOKEN_RE
+
+# Per-field weight of a match (title > tags > description > content)
+FIELD_BOOSTS = {
+    'title': 4.0,
+    'tags': 3.0,
+    'description': 2.0,
+    'content': 1.0,
+}
+
+# Standard BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def scoring_terms(plan, parser=advanced_search) -> List[Tuple[str, Tuple[str, ...]]]:
+    """
+    Collect the positive (not negated) terms of a compiled plan together with
+    the fields they are scored against. Terms on fields without free text
+    (level, status, dates...) and fuzzy/regex terms filter results but do
+    not add to the score.
+    """
+    terms = []
+
+    def walk(node, negated):
+        if isinstance(node, NotNode):
+            walk(node.child, not negated)
+        elif isinstance(node, (AndNode, OrNode)):
+            for child in node.children:
+                walk(child, negated)
+        elif not negated and not isinstance(node, (FuzzyTerm, RegexTerm)):
+            if not node.field:
+                fields = tuple(FIELD_BOOSTS)
+            elif node.field in FIELD_BOOSTS:
+                fields = (node.field,)
+            elif node.field not in parser.field_mappings:
+                fields = ('content',)
+            else:
+                return
+            term = (node.value_lower, fields)
+            if term not in terms:
+                terms.append(term)
+
+    if plan is not None:
+        walk(plan, False)
+    return terms
+
+
+class _CorpusStats:
+    """Field texts, lengths and document frequencies for BM25."""
+
+    def __init__(self, rules, index):
+        self.index = index
+        self._df = {}
+        if index is not None and all(index.rule_id(rule) is not None for rule in rules):
+            # Statistics over the whole indexed corpus
+            self.total = max(len(index), 1)
+            self._plain = None
+        else:
+            # Rules unknown to the index (e.g. posted by the browser): use them as the corpus
+            self.index = None
+            self.total = max(len(rules), 1)
+            self._plain = {}
+            for rule in rules:
+                self._plain[id(rule)] = {
+                    field: INDEXED_FIELDS[field](rule).lower() for field in FIELD_BOOSTS
+                }
+            self._lengths = {
+                field: sum(len(TOKEN_RE.findall(texts[field])) for texts in self._plain.values()) / self.total
+                for field in FIELD_BOOSTS
+            }
+
+    def text(self, rule, field) -> str:
+        if self.index is not None:
+            return self.index.text(self.index.rule_id(rule), field)
+        return self._plain[id(rule)][field]
+
+    def length(self, rule, field) -> int:
+        if self.index is not None:
+            return self.index.field_length(self.index.rule_id(rule), field)
+        return len(TOKEN_RE.findall(self._plain[id(rule)][field]))
+
+    def average_length(self, field) -> float:
+        if self.index is not None:
+            return self.index.average_field_length(field) or 1.0
+        return self._lengths[field] or 1.0
+
+    def document_frequency(self, value, field) -> int:
+        key = (value, field)
+        if key not in self._df:
+            if self.index is not None:
+                index = self.index
+                candidates = index.candidates(field, value)
+                if candidates is None:
+                    candidates = (rule_id for rule_id, rule in enumerate(index.rules) if rule is not None)
+                self._df[key] = sum(1 for rule_id in candidates if value in index.text(rule_id, field))
+            else:
+                self._df[key] = sum(1 for texts in self._plain.values() if value in texts[field])
+        return self._df[key]
+
+    def idf(self, value, field) -> float:
+        df = self.document_frequency(value, field)
+        return math.log(1 + (self.total - df + 0.5) / (df + 0.5))
+
+
+def rank_rules(rules: List[Dict[str, Any]], query: str, limit: int | None = None,
+               parser=advanced_search, index=None) -> List[Tuple[float, Dict[str, Any]]]:
+    """
+    Score already-matched rules for a query and return (score, rule) pairs,
+    best first. With `limit`, only the top-k are selected (heap, not a full
+    sort). Ties keep the original order of `rules`. Corpus statistics come
+    from `index` (default: the parser's index).
+    """
+    terms = scoring_terms(parser.compile(query), parser)
+    if not terms:
+        scored = [(0.0, rule) for rule in rules]
+        return scored[:limit] if limit is not None else scored
+
+    stats = _CorpusStats(rules, parser.index if index is None else index)
+    weights = {(value, field): FIELD_BOOSTS[field] * stats.idf(value, field)
+               for value, fields in terms for field in fields}
+    average_lengths = {field: stats.average_length(field) for field in FIELD_BOOSTS}
+
+    def score(rule):
+        total = 0.0
+        for value, fields in terms:
+            for field in fields:
+                tf = stats.text(rule, field).count(value)
+                if not tf:
+                    continue
+                norm = 1 - BM25_B + BM25_B * stats.length(rule, field) / average_lengths[field]
+                total += weights[(value, field)] * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+        return total
+
+    scored = [(score(rule), position, rule) for position, rule in enumerate(rules)]
+    key = lambda item: (item[0], -item[1])
+    if limit is not None:
+        top = heapq.nlargest(limit, scored, key=key)
+    else:
+        top = sorted(scored, key=key, reverse=True)
+    return [(round(total, 4), rule) for total, _, rule in top]
+
+
+def search_rules_ranked(rules: List[Dict[str, Any]], query: str, limit: int | None = None,
+                        parser=advanced_search) -> List[Tuple[float, Dict[str, Any]]]:
+    """Search `rules` and return the top-k (score, rule) pairs by relevance."""
+    return rank_rules(parser.search(rules, query), query, limit, parser)
@@ -0,0 +1,254 @@
+"""
+Regular expression search terms.
+Patterns are compiled once and cached with the `regex` module, whose
+matches take a timeout. The literal fragments every match must contain are
+pulled out of the parsed pattern, so the trigram index can narrow the rules
+a pattern is run against instead of the whole corpus.
+"""
+import re
+from functools import lru_cache
+from typing import Callable, Pattern, Set, Tuple
+
+import regex
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+# A regex term as written in a query: optional field, then re:/pattern/.
+# The re: marker keeps slash-delimited values such as path:/process_creation/
+# plain substring searches.
+REGEX_TOKEN_RE = re.compile(r'(?:([\w.]+):)?re:/(.+)/', re.DOTALL)
+
+# Regex literal inside a raw query string, so the tokenizer keeps it whole
+REGEX_LITERAL_RE = re.compile(r'(?<![^\s(])(?:[\w.]+:)?re:/(?:\\.|[^/\\\n])+/(?=[\s)]|$)')
+
+MAX_PATTERN_LENGTH = 512
+REGEX_CACHE_SIZE = 256
+
+# Wall-clock seconds the regex terms of one query may spend matching rules.
+# Every match runs with the remaining budget as its timeout, so a single
+# backtracking match is stopped too.
+REGEX_TIME_BUDGET = 2.0
+
+# Shortest timeout a match is started with
+MIN_MATCH_TIMEOUT = 0.001
+
+# Characters of a field a pattern is searched in; longer text is cut off
+MAX_SEARCH_LENGTH = 64 * 1024
+
+# Literal fragments shorter than this do not narrow candidates
+MIN_LITERAL_LENGTH = 3
+
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+if hasattr(sre_constants, 'POSSESSIVE_REPEAT'):
+    _REPEATS.add(sre_constants.POSSESSIVE_REPEAT)
+
+
+def _requirement(items):
+    """
+    Literals a match of a parsed (sub)pattern must contain, as a tree:
+    a string, ('all', [...]), ('any', [...]) or None when nothing is required.
+    """
+    parts = []
+    run = []
+
+    def flush():
+        if run:
+            parts.append(''.join(run).lower())
+            run.clear()
+
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        flush()
+        if op is sre_constants.SUBPATTERN:
+            parts.append(_requirement(av[-1]))
+        elif op is sre_constants.BRANCH:
+            alternatives = [_requirement(branch) for branch in av[1]]
+            if all(alternative is not None for alternative in alternatives):
+                parts.append(('any', alternatives))
+        elif op in _REPEATS:
+            minimum, _, item = av
+            if minimum >= 1:
+                parts.append(_requirement(item))
+        elif op is getattr(sre_constants, 'ATOMIC_GROUP', None):
+            parts.append(_requirement(av))
+    flush()
+
+    parts = [part for part in parts if part is not None]
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else ('all', parts)
+
+
+def _first_literal(items):
+    """Lowercased first character a (sub)pattern must start with, or None if not a plain literal."""
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            return chr(av).lower()
+        if op is sre_constants.SUBPATTERN:
+            return _first_literal(av[-1])
+        return None
+    return None
+
+
+def _ambiguous_branch(alternatives) -> bool:
+    """True unless every alternative starts with its own literal character."""
+    firsts = [_first_literal(branch) for branch in alternatives]
+    return None in firsts or len(set(firsts)) != len(firsts)
+
+
+def _char_matcher(items) -> Callable[[str], bool] | None:
+    """
+    Predicate for the characters a (sub)pattern matching exactly one
+    character accepts, or None if it is not a single character class.
+    """
+    if len(items) != 1:
+        return None
+    op, av = items[0]
+    if op is sre_constants.SUBPATTERN:
+        return _char_matcher(av[-1])
+    if op is sre_constants.LITERAL:
+        return lambda ch, c=chr(av).lower(): ch.lower() == c
+    if op is sre_constants.NOT_LITERAL:
+        return lambda ch, c=chr(av).lower(): ch.lower() != c
+    if op is sre_constants.ANY:
+        return lambda ch: ch != '\n'
+    if op is sre_constants.IN:
+        negate = bool(av) and av[0][0] is sre_constants.NEGATE
+        tests = []
+        for item_op, item_av in av[1:] if negate else av:
+            if item_op is sre_constants.LITERAL:
+                tests.append(lambda ch, c=chr(item_av).lower(): ch.lower() == c)
+            elif item_op is sre_constants.RANGE:
+                low, high = item_av
+                tests.append(lambda ch, low=low, high=high: any(len(c) == 1 and low <= ord(c) <= high
+                                                                for c in (ch, ch.lower(), ch.upper())))
+            elif item_op is sre_constants.CATEGORY and item_av in _CATEGORIES:
+                tests.append(_CATEGORIES[item_av])
+            else:
+                # Unknown member: assume it may accept any character
+                return lambda ch: True
+        return lambda ch: negate != any(test(ch) for test in tests)
+    return None
+
+
+_CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: str.isdigit,
+    sre_constants.CATEGORY_NOT_DIGIT: lambda ch: not ch.isdigit(),
+    sre_constants.CATEGORY_SPACE: str.isspace,
+    sre_constants.CATEGORY_NOT_SPACE: lambda ch: not ch.isspace(),
+    sre_constants.CATEGORY_WORD: lambda ch: ch.isalnum() or ch == '_',
+    sre_constants.CATEGORY_NOT_WORD: lambda ch: not (ch.isalnum() or ch == '_'),
+}
+
+# Characters tried when checking whether two character classes overlap
+_SAMPLE_CHARS = [chr(code) for code in range(0x250)]
+
+
+def _overlap(first: Callable[[str], bool], second: Callable[[str], bool]) -> bool:
+    return any(first(ch) and second(ch) for ch in _SAMPLE_CHARS)
+
+
+def _nested_repeat(items, inside_repeat=False) -> bool:
+    """
+    True for patterns prone to catastrophic backtracking:
+    - an unbounded repeat inside any other repeat, e.g. (a+)+ or (.*a){10}
+    - alternatives that may match the same text inside a repeat, e.g. (a|aa)*
+    - adjacent unbounded repeats of overlapping characters, e.g. a*a*b
+    Optional items (?, {0,1}) do not count as repeats.
+    """
+    previous = None
+    for op, av in items:
+        current = None
+        if op in _REPEATS:
+            _, maximum, item = av
+            unbounded = maximum == sre_constants.MAXREPEAT
+            if unbounded:
+                if inside_repeat:
+                    return True
+                current = _char_matcher(item)
+                if previous is not None and current is not None and _overlap(previous, current):
+                    return True
+            if _nested_repeat(item, inside_repeat or maximum > 1):
+                return True
+        elif op is sre_constants.SUBPATTERN:
+            if _nested_repeat(av[-1], inside_repeat):
+                return True
+        elif op is sre_constants.BRANCH:
+            if inside_repeat and _ambiguous_branch(av[1]):
+                return True
+            if any(_nested_repeat(branch, inside_repeat) for branch in av[1]):
+                return True
+        elif op is getattr(sre_constants, 'ATOMIC_GROUP', None):
+            if _nested_repeat(av, inside_repeat):
+                return True
+        previous = current
+    return False
+
+
+def search(pattern: Pattern, text: str, timeout: float) -> bool:
+    """
+    True if `pattern` matches within the first MAX_SEARCH_LENGTH characters
+    of `text`.
+
+    Raises:
+        TimeoutError: If the match runs longer than `timeout` seconds
+    """
+    return pattern.search(text, 0, MAX_SEARCH_LENGTH, timeout=max(timeout, MIN_MATCH_TIMEOUT)) is not None
+
+
+@lru_cache(maxsize=REGEX_CACHE_SIZE)
+def compile_pattern(pattern: str) -> Tuple[Pattern, object]:
+    """
+    Compile a case-insensitive search pattern and extract its required literals.
+
+    Raises:
+        ValueError: If the pattern is too long, invalid, or prone to
+            catastrophic backtracking
+    """
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        raise ValueError(f'Regex is longer than {MAX_PATTERN_LENGTH} characters')
+    try:
+        parsed = sre_parse.parse(pattern, re.IGNORECASE)
+        compiled = regex.compile(pattern, regex.IGNORECASE)
+    except (re.error, regex.error) as e:
+        raise ValueError(f'Invalid regex /{pattern}/: {e}')
+    if _nested_repeat(list(parsed)):
+        raise ValueError(f'Regex /{pattern}/ is prone to catastrophic backtracking (nested or adjacent '
+                         'overlapping repeats, or repeated overlapping alternatives)')
+    return compiled, _requirement(list(parsed))
+
+
+def literal_candidates(requirement, lookup: Callable[[str], Set[int] | None]) -> Set[int] | None:
+    """
+    Resolve a requirement tree with `lookup` (literal -> rule ids that may
+    contain it). Returns None when the requirement cannot narrow anything.
+    """
+    if requirement is None:
+        return None
+    if isinstance(requirement, str):
+        if len(requirement) < MIN_LITERAL_LENGTH:
+            return None
+        return lookup(requirement)
+    kind, children = requirement
+    if kind == 'all':
+        result = None
+        for child in children:
+            ids = literal_candidates(child, lookup)
+            if ids is not None:
+                result = ids if result is None else result & ids
+                if not result:
+                    break
+        return result
+    result = set()
+    for child in children:
+        ids = literal_candidates(child, lookup)
+        if ids is None:
+            return None
+        result |= ids
+    return result
@@ -2,6 +2,8 @@ import os
 import yaml
 from flask import jsonify, request, Blueprint, current_app
 from ..config import ensure_custom_rules_dir, ensure_rules_dir
+from ..rules_manager import upsert_rule, remove_rule
+from ..rule_record import build_rule_record
 
 
 def create_custom_rules_blueprint(rules):
@@ -69,23 +71,9 @@ def create_custom_rules_blueprint(rules):
             # Incrementally update in-memory rules (avoid full rescan)
             rules_dir = ensure_rules_dir()
             rel_path = os.path.relpath(file_path, rules_dir).replace(os.sep, '/')
-            rule_entry = {
-                'title': parsed.get('title', '') if isinstance(parsed, dict) else '',
-                'description': parsed.get('description', '') if isinstance(parsed, dict) else '',
-                'tags': parsed.get('tags', []) if isinstance(parsed, dict) and isinstance(parsed.get('tags'), list) else [],
-                'file_path': rel_path,
-                'logsource': parsed.get('logsource', {}) if isinstance(parsed, dict) and isinstance(parsed.get('logsource'), dict) else {},
-                'content': content
-            }
-
-            replaced = False
-            for i, existing in enumerate(rules):
-                if existing.get('file_path') == rel_path:
-                    rules[i] = rule_entry
-                    replaced = True
-                    break
-            if not replaced:
-                rules.append(rule_entry)
+            rule_entry = build_rule_record(parsed if isinstance(parsed, dict) else {}, content, rel_path)
+
+            upsert_rule(rule_entry)
 
             return jsonify({'success': True, 'message': 'Rule saved successfully', 'file_path': rel_path, 'title': rule_entry['title']})
         except Exception as e:
@@ -106,9 +94,7 @@ def create_custom_rules_blueprint(rules):
             rules_dir = ensure_rules_dir()
             rel_path = os.path.relpath(file_path, rules_dir).replace(os.sep, '/')
             # Remove any entries matching this file path
-            remaining = [r for r in rules if r.get('file_path') != rel_path]
-            rules.clear()
-            rules.extend(remaining)
+            remove_rule(rel_path)
 
             return jsonify({'success': True, 'message': 'Rule deleted successfully'})
         except Exception as e:
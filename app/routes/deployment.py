@@ -1,4 +1,5 @@
 from flask import Blueprint, request, jsonify, current_app
+from ..advanced_search import QueryError
 
 def create_deployment_blueprint():
     """Tạo blueprint cho các API liên quan đến deployment"""
@@ -107,31 +108,45 @@ def create_deployment_blueprint():
     def get_filter_stats():
         """Lấy thống kê cho filter - số lượng deployed/undeployed trong current result set"""
         try:
-            from ..rules_manager import get_rules
-            from ..rule_loader import search_rules
-            
-            data = request.get_json()
-            current_rules = data.get('current_rules', [])
-            
-            if not current_rules:
-                # Nếu không có rules hiện tại, lấy tất cả rules
-                current_rules = [rule['file_path'] for rule in get_rules()]
+            from ..search_service import search_loaded_rules, facet_counts, parse_facet_filters
+            from ..rules_manager import get_search_index
             
+            data = request.get_json(silent=True) or {}
+            current_rules = data.get('current_rules') or []
             deployment_manager = current_app.deployment_manager
-            deployed_rules = set(deployment_manager.get_deployed_rules())
             
-            deployed_count = len([rule for rule in current_rules if rule in deployed_rules])
-            undeployed_count = len(current_rules) - deployed_count
+            if current_rules:
+                # Danh sách file_path do client gửi lên
+                mask = get_search_index().mask_for_paths(current_rules)
+            else:
+                # Tính theo query/filter hiện tại (mặc định: tất cả rules) trên index
+                _, _, _, _, mask = search_loaded_rules(
+                    (data.get('query') or '').strip(),
+                    (data.get('category') or '').strip(),
+                    (data.get('subcategory') or '').strip(),
+                    (data.get('deployment_status') or '').strip(),
+                    deployment_manager,
+                    facet_filters=parse_facet_filters(data))
+            
+            facets = facet_counts(mask, deployment_manager)
+            deployed_count = facets['deployment']['deployed']
+            undeployed_count = facets['deployment']['undeployed']
             
             return jsonify({
                 'success': True,
                 'stats': {
-                    'total': len(current_rules),
+                    'total': deployed_count + undeployed_count,
                     'deployed': deployed_count,
                     'undeployed': undeployed_count
-                }
+                },
+                'facets': facets
             })
             
+        except QueryError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         except Exception as e:
             return jsonify({
                 'success': False,
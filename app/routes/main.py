@@ -1,7 +1,8 @@
-from flask import render_template, request, Blueprint, current_app, send_file, make_response, Response
+from flask import render_template, request, Blueprint, current_app, send_file, make_response, Response, url_for
 from ..rule_loader import search_rules
-from ..advanced_search import search_rules_advanced
-from ..rule_processor import group_and_sort_rules
+from ..advanced_search import QueryError
+from ..search_service import (search_loaded_rules, paginate_groups, rule_summary, parse_int_arg,
+                              DEFAULT_RANKED_LIMIT, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
 import os
 
 
@@ -33,36 +34,12 @@ def create_main_blueprint(rules):
 
     @bp.route('/', methods=['GET', 'POST'])
     def index():
-        results = []
-        query = ''
         category = request.args.get('category', '').strip()
         subcategory = request.args.get('subcategory', '').strip()
         deployment_status = request.args.get('deployment_status', '').strip()
-        grouped_rules = None
-        filter_description = []
-
-        # Start with all rules
-        results = rules.copy()
-
-        # Filter by deployment status
-        if deployment_status in ['deployed', 'undeployed']:
-            deployment_manager = current_app.deployment_manager
-            deployed_rules = set(deployment_manager.get_deployed_rules())
-            
-            if deployment_status == 'deployed':
-                results = [r for r in results if r['file_path'] in deployed_rules]
-                filter_description.append('Deployed')
-            elif deployment_status == 'undeployed':
-                results = [r for r in results if r['file_path'] not in deployed_rules]
-                filter_description.append('Undeployed')
-
-        # Filter by category and subcategory
-        if category:
-            results = [r for r in results if category.lower() in r['file_path'].lower().split('/')]
-            filter_description.append(category.capitalize())
-            if subcategory:
-                results = [r for r in results if subcategory.lower() in r['file_path'].lower().split('/')]
-                filter_description.append(subcategory.replace('_', ' ').capitalize())
+        sort = request.args.get('sort', '').strip()
+        page = request.args.get('page', type=int)
+        per_page = request.args.get('per_page', type=int)
 
         # Apply search query if it exists
         if request.method == 'POST':
@@ -70,8 +47,48 @@ def create_main_blueprint(rules):
         else:
             query = request.args.get('query', '').strip()
 
-        if query:
-            results = search_rules_advanced(results, query)  # Advanced search within filtered results
+        if sort != 'relevance':
+            sort = ''
+
+        search_error = None
+        status = 200
+        try:
+            limit = parse_int_arg(request.args, 'limit', DEFAULT_RANKED_LIMIT, 1) if sort else None
+            results, _, grouped_rules, filter_description, _ = search_loaded_rules(
+                query, category, subcategory, deployment_status, current_app.deployment_manager,
+                sort, limit, group=True)
+        except QueryError as e:
+            # Invalid query (bad regex, time budget exceeded): show the error instead of results
+            search_error = str(e)
+            results, grouped_rules, filter_description = [], None, []
+        except ValueError as e:
+            # Ranked limit that is not an integer >= 1, rejected as /api/search does
+            search_error, status = str(e), 400
+            results, grouped_rules, filter_description = [], None, []
+
+        # Paginated mode: render one page of the grouped results
+        pagination = None
+        total_results = len(results)
+        if page is not None and grouped_rules:
+            per_page = min(max(per_page or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+            page_count = (total_results + per_page - 1) // per_page
+            page = min(max(page, 1), page_count)
+            start = (page - 1) * per_page
+            results, grouped_rules = paginate_groups(grouped_rules, start, start + per_page)
+            pagination = {
+                'page': page,
+                'per_page': per_page,
+                'pages': page_count,
+                'first': start + 1,
+                'last': start + len(results),
+            }
+            # Links keep the current query and filters
+            args = request.args.to_dict()
+            args.update(query=query, per_page=per_page)
+            if page > 1:
+                pagination['prev_url'] = url_for('main.index', **dict(args, page=page - 1))
+            if page < page_count:
+                pagination['next_url'] = url_for('main.index', **dict(args, page=page + 1))
 
         # Create descriptive text for the filtered/searched results
         result_description = ''
@@ -80,18 +97,19 @@ def create_main_blueprint(rules):
         if query:
             result_description = f" for \"{query}\"" + result_description
 
-        if results:
-            # Pass the category to group_and_sort_rules when filtering
-            grouped_rules = group_and_sort_rules(results, category if category else None)
-
         return render_template('index.html', 
                             results=results, 
+                            rule_summaries=[rule_summary(rule) for rule in results],
                             query=query, 
                             grouped_rules=grouped_rules,
                             selected_category=category,
                             selected_subcategory=subcategory,
                             selected_deployment_status=deployment_status,
-                            result_description=result_description)
+                            selected_sort=sort,
+                            total_results=total_results,
+                            pagination=pagination,
+                            result_description=result_description,
+                            search_error=search_error), status
 
     return bp
 
@@ -1,11 +1,191 @@
 from flask import Blueprint, request, jsonify, current_app
-from ..advanced_search import search_rules_advanced
+from ..advanced_search import search_rules_advanced, QueryError
+from ..rule_record import RULE_METADATA_FIELDS
+from ..ranking import search_rules_ranked
+from ..rules_manager import get_ruleset_version
+from ..highlight import highlight_terms, match_offsets
+from ..search_service import (search_loaded_rules, rule_summary, encode_cursor, decode_cursor,
+                              facet_counts, tag_counts, component_mask, parse_facet_filters, parse_int_arg,
+                              suggest, SUGGESTION_FIELDS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
 import logging
 
 def create_search_blueprint():
     """Tạo blueprint cho các API search"""
     bp = Blueprint('search', __name__)
 
+    @bp.route('/api/search', methods=['GET'])
+    def search_loaded():
+        """Search trên toàn bộ rules đã load, trả về từng trang kết quả rút gọn"""
+        try:
+            query = request.args.get('query', '').strip()
+            category = request.args.get('category', '').strip()
+            subcategory = request.args.get('subcategory', '').strip()
+            deployment_status = request.args.get('deployment_status', '').strip()
+            sort = request.args.get('sort', '').strip()
+            cursor = request.args.get('cursor', '').strip()
+            facet_filters = parse_facet_filters(request.args)
+            path_prefix = request.args.get('path', '').strip()
+            session = request.args.get('session', '').strip()[:64]
+            with_facets = request.args.get('facets', '').lower() in ('1', 'true', 'yes')
+
+            try:
+                offset = parse_int_arg(request.args, 'offset', 0, 0)
+                limit = parse_int_arg(request.args, 'limit', DEFAULT_PAGE_SIZE, 1)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
+            limit = min(limit, MAX_PAGE_SIZE)
+            if sort != 'relevance':
+                sort = ''
+
+            deployment_manager = current_app.deployment_manager
+            versions = (get_ruleset_version(), deployment_manager.version)
+            if cursor:
+                try:
+                    offset, cursor_versions = decode_cursor(cursor)
+                except ValueError as e:
+                    return jsonify({
+                        'success': False,
+                        'error': str(e)
+                    }), 400
+                if cursor_versions != versions:
+                    # Rules or deployments changed since the first page was served
+                    return jsonify({
+                        'success': False,
+                        'error': 'Cursor is stale, restart the search'
+                    }), 409
+
+            results, scores, _, _, mask = search_loaded_rules(
+                query, category, subcategory, deployment_status, deployment_manager, sort,
+                facet_filters=facet_filters, path_prefix=path_prefix, session=session)
+
+            page = []
+            for position in range(offset, min(offset + limit, len(results))):
+                summary = rule_summary(results[position])
+                if scores is not None:
+                    summary['score'] = scores[position]
+                page.append(summary)
+
+            next_offset = offset + len(page)
+            response = {
+                'success': True,
+                'query': query,
+                'total': len(results),
+                'offset': offset,
+                'limit': limit,
+                'results': page,
+                'next_cursor': encode_cursor(next_offset, versions) if next_offset < len(results) else None
+            }
+            if with_facets:
+                response['facets'] = facet_counts(mask, deployment_manager)
+            return jsonify(response)
+
+        except QueryError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        except Exception as e:
+            logging.error(f"Error in search API: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': f'Search error: {str(e)}'
+            }), 500
+
+    @bp.route('/api/suggest', methods=['GET'])
+    def suggest_terms():
+        """Gợi ý tự động hoàn thành cho ô tìm kiếm (title, tag, author, logsource, field)"""
+        try:
+            prefix = request.args.get('q', request.args.get('prefix', ''))
+            limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+            kinds = tuple(sorted(kind for kind in request.args.get('kinds', '').split(',')
+                                 if kind in SUGGESTION_FIELDS))
+            
+            return jsonify({
+                'success': True,
+                'prefix': prefix,
+                'suggestions': suggest(prefix, limit, kinds)
+            })
+            
+        except Exception as e:
+            logging.error(f"Error in suggest API: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': f'Suggest error: {str(e)}'
+            }), 500
+
+    @bp.route('/api/tags/counts', methods=['GET'])
+    def attack_tag_counts():
+        """Số rule theo tactic, technique (kèm sub-technique) và tag cve/detection/car"""
+        try:
+            query = request.args.get('query', '').strip()
+            category = request.args.get('category', '').strip()
+            subcategory = request.args.get('subcategory', '').strip()
+            
+            mask = None
+            if query or category or subcategory:
+                # Count over the results of the current query/filters
+                _, _, _, _, mask = search_loaded_rules(query, category, subcategory,
+                                                       deployment_manager=current_app.deployment_manager)
+                if subcategory and not category:
+                    # The search only applies subcategory under a category (as the index page
+                    # does); counts narrow to it on its own too
+                    mask &= component_mask(subcategory)
+            
+            return jsonify({
+                'success': True,
+                'query': query,
+                'counts': tag_counts(mask)
+            })
+            
+        except QueryError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        except Exception as e:
+            logging.error(f"Error in tag counts API: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': f'Tag counts error: {str(e)}'
+            }), 500
+
+    @bp.route('/api/search/highlight', methods=['POST'])
+    def highlight_offsets():
+        """Trả về vị trí (start, end) của các từ khóa cần highlight trong từng đoạn text"""
+        try:
+            data = request.get_json(silent=True)
+            
+            if not data or 'query' not in data:
+                return jsonify({
+                    'success': False,
+                    'error': 'Missing query parameter'
+                }), 400
+            
+            query = data['query']
+            texts = data.get('texts', [])
+            if not isinstance(texts, list):
+                return jsonify({
+                    'success': False,
+                    'error': 'texts must be a list of strings'
+                }), 400
+            
+            return jsonify({
+                'success': True,
+                'query': query,
+                'terms': list(highlight_terms(query)),
+                'offsets': [[list(span) for span in match_offsets(text, query)] for text in texts]
+            })
+            
+        except Exception as e:
+            logging.error(f"Error in highlight API: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': f'Highlight error: {str(e)}'
+            }), 500
+
     @bp.route('/api/search/custom-rules', methods=['POST'])
     def search_custom_rules():
         """Advanced search cho custom rules"""
@@ -20,6 +200,14 @@ def create_search_blueprint():
             
             query = data['query'].strip()
             rules = data.get('rules', [])
+            ranked = bool(data.get('rank', False))
+            try:
+                limit = parse_int_arg(data, 'limit', None, 1)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
             
             if not query:
                 return jsonify({
@@ -39,22 +227,23 @@ def create_search_blueprint():
                     'file_path': rule.get('filename', ''),
                     'content': rule.get('content', ''),  # Full YAML content if available
                     'logsource': rule.get('logsource', {}),
-                    # Add other fields that might be in custom rules
-                    'author': rule.get('author', ''),
-                    'date': rule.get('date', ''),
-                    'modified': rule.get('modified', ''),
-                    'status': rule.get('status', ''),
-                    'level': rule.get('level', ''),
-                    'id': rule.get('id', '')
                 }
+                # Copy metadata only when the client sent it; otherwise the
+                # search reads it from the YAML content
+                for key in RULE_METADATA_FIELDS:
+                    if rule.get(key):
+                        converted_rule[key] = rule[key]
                 converted_rules.append(converted_rule)
             
-            # Use advanced search
-            filtered_results = search_rules_advanced(converted_rules, query)
+            # Use advanced search, optionally ranked by relevance (top-k)
+            if ranked:
+                scored_results = search_rules_ranked(converted_rules, query, limit)
+            else:
+                scored_results = [(None, rule) for rule in search_rules_advanced(converted_rules, query)]
             
             # Convert back to custom rules format
             final_results = []
-            for result in filtered_results:
+            for score, result in scored_results:
                 # Find original rule by filename/title match
                 original_rule = None
                 for original in rules:
@@ -64,10 +253,10 @@ def create_search_blueprint():
                         break
                 
                 if original_rule:
-                    final_results.append(original_rule)
+                    final_result = dict(original_rule)
                 else:
                     # Fallback: create from converted data
-                    final_results.append({
+                    final_result = {
                         'filename': result.get('file_path', ''),
                         'title': result.get('title', ''),
                         'description': result.get('description', ''),
@@ -79,16 +268,25 @@ def create_search_blueprint():
                         'status': result.get('status', ''),
                         'level': result.get('level', ''),
                         'id': result.get('id', '')
-                    })
+                    }
+                if score is not None:
+                    final_result['score'] = score
+                final_results.append(final_result)
             
             return jsonify({
                 'success': True,
                 'results': final_results,
                 'query': query,
                 'total_found': len(final_results),
-                'search_type': 'advanced'
+                'search_type': 'ranked' if ranked else 'advanced'
             })
             
+        except QueryError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e),
+                'search_type': 'failed'
+            }), 400
         except Exception as e:
             logging.error(f"Error in custom rules search: {str(e)}")
             return jsonify({
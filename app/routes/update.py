@@ -1,7 +1,7 @@
 from flask import redirect, url_for, flash, Blueprint
-from ..rule_loader import load_rules
 from ..update_rules import update_sigma_database
 from ..config import ensure_rules_dir
+from ..rules_manager import load_sigma_rules
 
 
 def create_update_blueprint(rules):
@@ -12,9 +12,7 @@ def create_update_blueprint(rules):
         try:
             rules_dir = ensure_rules_dir()
             update_sigma_database(rules_dir)
-            new_rules = load_rules(rules_dir)
-            rules.clear()
-            rules.extend(new_rules)
+            load_sigma_rules()
             flash('Sigma rules updated successfully!', 'success')
         except Exception as e:
             flash(f'Update failed: {e}', 'danger')
@@ -1,124 +1,258 @@
 """
 Rule caching system for faster application startup.
-Caches parsed rules to disk to avoid re-parsing on every startup.
+Keeps a manifest of every rule file, keyed by path relative to the rules
+directory, with its size, mtime and content hash next to the parsed rule.
+On startup only added and changed files are parsed; unchanged files reuse
+their cached rule and deleted files drop out. Directory listings are cached
+too, so directories whose mtime did not move are neither listed nor have
+their files stat-ed again.
+
+Parsed rules live in a memory-mapped columnar snapshot (app.rule_snapshot)
+next to the manifest, so a cache hit maps one file instead of unpickling
+every rule body.
 """
+import gc
 import os
+import time
 import pickle
 import hashlib
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Tuple
+
+from .parallel_loader import DirListing, parse_rule_files, rule_search_dirs, scan_rule_files
+from .rule_record import RuleRecord
+from .rule_snapshot import RuleSnapshot, SnapshotError, source_snapshot, write_snapshot
 
 logger = logging.getLogger(__name__)
 
 CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.cache')
 CACHE_FILE = os.path.join(CACHE_DIR, 'rules_cache.pkl')
+# Whole-tree hash written by the previous cache format; removed on save/clear
 CACHE_HASH_FILE = os.path.join(CACHE_DIR, 'rules_hash.txt')
 
+# Snapshot files are written under a new name each time and the manifest
+# names the current one: a snapshot may still be mapped by another process
+SNAPSHOT_PREFIX = 'rules_snapshot.'
+SNAPSHOT_SUFFIX = '.bin'
+
+# Bump whenever the cached rule record layout changes so old caches are rebuilt
+CACHE_FORMAT_VERSION = 8
+
+# Skip unchanged directories by their mtime (opt-in). A file rewritten in
+# place does not move its directory's mtime, so this misses such edits until
+# the directory changes (or the cache is cleared). Off by default: every
+# rule file's size and mtime are then read from the scandir pass.
+TRUST_DIRECTORY_MTIME = os.environ.get('SIGMA_CACHE_TRUST_DIR_MTIME', 'False').lower() == 'true'
+
+# Top-level directories edited by hand, where every file is always stat-ed
+IN_PLACE_EDIT_DIRS = ('customs',)
+
+# Manifest entry: (size, mtime_ns, content hash, parsed rule or None if invalid)
+ManifestEntry = Tuple[int, int, str, RuleRecord | None]
+
+
+def file_digest(file_path: str) -> str | None:
+    """MD5 of a file's bytes, or None if it cannot be read."""
+    try:
+        with open(file_path, 'rb') as f:
+            return hashlib.md5(f.read()).hexdigest()
+    except OSError:
+        return None
+
 
-def get_directory_hash(rules_dir: str) -> str:
+def _snapshot_files() -> List[str]:
+    try:
+        return [name for name in os.listdir(CACHE_DIR)
+                if name.startswith(SNAPSHOT_PREFIX) and name.endswith(SNAPSHOT_SUFFIX)]
+    except OSError:
+        return []
+
+
+def _remove_snapshots(keep: str | None = None):
+    """Delete snapshot files other than `keep`; ones still mapped on Windows are left for next time."""
+    for name in _snapshot_files():
+        if name != keep:
+            try:
+                os.remove(os.path.join(CACHE_DIR, name))
+            except OSError:
+                pass
+
+
+def load_manifest() -> Tuple[Dict[str, ManifestEntry], Dict[str, DirListing]]:
     """
-    Calculate hash of rules directory to detect changes.
-    Uses modification times and file count for speed.
+    Load the cached manifest and map its rule snapshot.
+    
+    Returns:
+        Relative path -> manifest entry and directory -> listing, both empty
+        if the cache is missing, unreadable or written by another record
+        layout. Cached rules are lazy views into the snapshot.
     """
     try:
-        hash_data = []
+        if not os.path.exists(CACHE_FILE):
+            logger.info("No cache found")
+            return {}, {}
         
-        # Walk through all rule directories
-        for root, dirs, files in os.walk(rules_dir):
-            # Skip hidden directories and cache
-            dirs[:] = [d for d in dirs if not d.startswith('.')]
-            
-            for file in files:
-                if file.endswith(('.yml', '.yaml')):
-                    file_path = os.path.join(root, file)
-                    try:
-                        stat = os.stat(file_path)
-                        # Use file path, size, and mtime for hash
-                        hash_data.append(f"{file_path}:{stat.st_size}:{stat.st_mtime}")
-                    except OSError:
-                        continue
+        # The manifest is one large graph of containers; the cyclic GC would
+        # rescan it over and over while it is unpickled
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(CACHE_FILE, 'rb') as f:
+                cached = pickle.load(f)
+        finally:
+            if gc_enabled:
+                gc.enable()
         
-        # Create hash from all file info
-        hash_string = '|'.join(sorted(hash_data))
-        return hashlib.md5(hash_string.encode()).hexdigest()
-    
+        if not isinstance(cached, dict) or cached.get('version') != CACHE_FORMAT_VERSION:
+            logger.info("Cache invalidated (rule record layout changed)")
+            return {}, {}
+        
+        snapshot_rules = RuleSnapshot(os.path.join(CACHE_DIR, cached['snapshot'])).rules()
+        files = {path: (size, mtime_ns, digest, snapshot_rules[slot] if slot >= 0 else None)
+                 for path, (size, mtime_ns, digest, slot) in cached['files'].items()}
+        return files, cached['dirs']
+        
+    except (SnapshotError, OSError) as e:
+        logger.info(f"Cache invalidated (rule snapshot unusable: {e})")
+        return {}, {}
     except Exception as e:
-        logger.warning(f"Failed to calculate directory hash: {e}")
-        return ""
+        logger.warning(f"Failed to load cache: {e}")
+        return {}, {}
 
 
-def save_cache(rules: List[Dict[str, Any]], rules_dir: str) -> bool:
+def save_manifest(manifest: Dict[str, ManifestEntry], dirs: Dict[str, DirListing]) -> RuleSnapshot | None:
     """
-    Save parsed rules to cache file.
+    Save the rules to a new snapshot and the manifest to the cache file.
     
     Args:
-        rules: List of parsed rule dictionaries
-        rules_dir: Path to rules directory
+        manifest: Relative path -> manifest entry
+        dirs: Directory -> listing from the scan that built the manifest
         
     Returns:
-        True if cache saved successfully
+        The new snapshot, its rules in manifest order, or None if the cache
+        could not be saved
     """
     try:
         # Ensure cache directory exists
         os.makedirs(CACHE_DIR, exist_ok=True)
         
-        # Calculate directory hash
-        dir_hash = get_directory_hash(rules_dir)
+        rules = [entry[3] for entry in manifest.values() if entry[3]]
+        snapshot = source_snapshot(rules)
+        if snapshot is not None:
+            # Same rules as the mapped snapshot (only stats or listings changed)
+            snapshot_path = snapshot.path
+        else:
+            snapshot_path = os.path.join(CACHE_DIR, f"{SNAPSHOT_PREFIX}{os.getpid()}.{time.time_ns()}{SNAPSHOT_SUFFIX}")
+            write_snapshot(snapshot_path, rules)
+        snapshot_name = os.path.basename(snapshot_path)
         
-        # Save rules to pickle file
-        with open(CACHE_FILE, 'wb') as f:
-            pickle.dump(rules, f, protocol=pickle.HIGHEST_PROTOCOL)
+        files = {}
+        slot = 0
+        for path, (size, mtime_ns, digest, rule) in manifest.items():
+            files[path] = (size, mtime_ns, digest, slot if rule else -1)
+            slot += 1 if rule else 0
         
-        # Save hash
-        with open(CACHE_HASH_FILE, 'w') as f:
-            f.write(dir_hash)
+        # Write to a temporary file first so a crash never leaves a truncated cache
+        temp_file = f"{CACHE_FILE}.{os.getpid()}.tmp"
+        with open(temp_file, 'wb') as f:
+            pickle.dump({'version': CACHE_FORMAT_VERSION, 'files': files, 'dirs': dirs,
+                         'snapshot': snapshot_name}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, CACHE_FILE)
         
-        logger.info(f"Cached {len(rules)} rules to disk")
-        return True
+        if os.path.exists(CACHE_HASH_FILE):
+            os.remove(CACHE_HASH_FILE)
+        _remove_snapshots(keep=snapshot_name)
+        
+        logger.info(f"Cached {len(manifest)} rule files to disk")
+        return snapshot if snapshot is not None else RuleSnapshot(snapshot_path)
         
     except Exception as e:
         logger.error(f"Failed to save cache: {e}")
-        return False
+        return None
 
 
-def load_cache(rules_dir: str) -> List[Dict[str, Any]] | None:
+def load_rules_incremental(rules_dir: str, max_workers: int | None = None) -> List[RuleRecord]:
     """
-    Load rules from cache if valid.
+    Load rules, parsing only the files that changed since the cache was saved.
+    
+    Files in a directory whose mtime did not change are reused without a
+    stat, and a file whose size and mtime match its manifest entry is reused
+    as is. Otherwise its content hash decides: an identical file (e.g.
+    re-copied by an update) keeps its cached rule, a different one is parsed
+    again.
     
     Args:
-        rules_dir: Path to rules directory
+        rules_dir: Base rules directory
+        max_workers: Maximum number of worker processes for parsing
         
     Returns:
-        List of cached rules or None if cache invalid/missing
+        List of loaded rules, in file discovery order
     """
-    try:
-        # Check if cache files exist
-        if not os.path.exists(CACHE_FILE) or not os.path.exists(CACHE_HASH_FILE):
-            logger.info("No cache found")
-            return None
-        
-        # Read stored hash
-        with open(CACHE_HASH_FILE, 'r') as f:
-            stored_hash = f.read().strip()
-        
-        # Calculate current hash
-        current_hash = get_directory_hash(rules_dir)
-        
-        # Check if hash matches
-        if stored_hash != current_hash:
-            logger.info("Cache invalidated (rules directory changed)")
-            return None
+    start_time = time.time()
+    cached, cached_dirs = load_manifest()
+    manifest: Dict[str, ManifestEntry] = {}
+    to_parse: List[Tuple[str, str, int, int, str]] = []
+    refreshed = 0
+    
+    known_dirs = {}
+    if TRUST_DIRECTORY_MTIME:
+        logger.info("Trusting directory mtimes: files edited in place outside "
+                    f"{', '.join(IN_PLACE_EDIT_DIRS)} are not reloaded until their directory changes")
+        edited_dirs = tuple(os.path.join(rules_dir, name) for name in IN_PLACE_EDIT_DIRS)
+        known_dirs = {path: listing for path, listing in cached_dirs.items()
+                      if not any(path == d or path.startswith(d + os.sep) for d in edited_dirs)}
+    rule_files, dirs = scan_rule_files(rule_search_dirs(rules_dir), known_dirs)
+    
+    # Scanned paths all start with rules_dir, so slicing replaces os.path.relpath
+    prefix = os.path.join(rules_dir, '')
+    for file_path, size, mtime_ns in rule_files:
+        if file_path.startswith(prefix):
+            relative_path = file_path[len(prefix):].replace(os.sep, '/')
+        else:
+            relative_path = os.path.relpath(file_path, rules_dir).replace(os.sep, '/')
+        entry = cached.get(relative_path)
+        if size is None:
+            # Listed from an unchanged directory: trust the cached entry
+            if entry:
+                manifest[relative_path] = entry
+                continue
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
         
-        # Load cached rules
-        with open(CACHE_FILE, 'rb') as f:
-            rules = pickle.load(f)
+        if entry and entry[0] == size and entry[1] == mtime_ns:
+            manifest[relative_path] = entry
+            continue
         
-        logger.info(f"Loaded {len(rules)} rules from cache")
-        return rules
+        digest = file_digest(file_path)
+        if digest is None:
+            continue
+        if entry and entry[2] == digest:
+            manifest[relative_path] = (size, mtime_ns, digest, entry[3])
+            refreshed += 1
+            continue
         
-    except Exception as e:
-        logger.warning(f"Failed to load cache: {e}")
-        return None
+        # Placeholder keeps the file's position in discovery order
+        manifest[relative_path] = None
+        to_parse.append((relative_path, file_path, size, mtime_ns, digest))
+    
+    if to_parse:
+        parsed = parse_rule_files([item[1] for item in to_parse], rules_dir, max_workers)
+        for (relative_path, _, size, mtime_ns, digest), rule in zip(to_parse, parsed):
+            manifest[relative_path] = (size, mtime_ns, digest, rule)
+    
+    removed = sum(1 for relative_path in cached if relative_path not in manifest)
+    rules = [entry[3] for entry in manifest.values() if entry[3]]
+    if to_parse or refreshed or removed or dirs != cached_dirs:
+        snapshot = save_manifest(manifest, dirs)
+        if snapshot is not None:
+            # Serve from the new snapshot so freshly parsed records can be freed
+            rules = snapshot.rules()
+    logger.info(f"Incremental load: {len(manifest) - len(to_parse)} cached, {len(to_parse)} parsed, "
+                f"{removed} removed -> {len(rules)} rules in {time.time() - start_time:.2f}s")
+    return rules
 
 
 def clear_cache() -> bool:
@@ -133,6 +267,7 @@ def clear_cache() -> bool:
             os.remove(CACHE_FILE)
         if os.path.exists(CACHE_HASH_FILE):
             os.remove(CACHE_HASH_FILE)
+        _remove_snapshots()
         logger.info("Cache cleared")
         return True
     except Exception as e:
@@ -1,6 +1,8 @@
 import os
 import yaml
 import re
+from .rule_record import build_rule_record
+from .parallel_loader import parse_yaml
 
 def load_rules(rules_dir):
     """
@@ -54,7 +56,7 @@ def load_rules(rules_dir):
                     with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
                         raw_content = f.read()
                         try:
-                            data = yaml.safe_load(raw_content)
+                            data = parse_yaml(raw_content)
                         except yaml.YAMLError:
                             continue
                             
@@ -65,14 +67,7 @@ def load_rules(rules_dir):
                         if not any(key in data for key in ['title', 'detection']):
                             continue
                             
-                        rules.append({
-                            'title': data.get('title', ''),
-                            'description': data.get('description', ''),
-                            'tags': data.get('tags', []) if isinstance(data.get('tags'), list) else [],
-                            'file_path': os.path.relpath(file_path, rules_dir).replace(os.sep, '/'),
-                            'logsource': data.get('logsource', {}) if isinstance(data.get('logsource'), dict) else {},
-                            'content': raw_content
-                        })
+                        rules.append(build_rule_record(data, raw_content, os.path.relpath(file_path, rules_dir).replace(os.sep, '/')))
                 except (IOError, OSError) as e:
                     continue
     return rules
@@ -1,5 +1,9 @@
 import re
 
+# Special categories that should be grouped by logsource
+LOGSOURCE_GROUPED_CATEGORIES = ['customs', 'rules-emerging-threats', 'rules-threat-hunting', 
+                                'rules-compliance', 'rules-dfir']
+
 def format_subcategory(subcategory):
     """Format subcategory name to be more readable."""
     return ' '.join(word.capitalize() for word in subcategory.replace('_', ' ').split())
@@ -15,100 +19,67 @@ def extract_subcategory(file_path, category):
         pass
     return 'Other'
 
-def group_and_sort_rules(rules, category=None):
+def with_positions(grouped, rules):
+    """
+    Pair every grouped rule with its position in `rules`, so templates can
+    derive stable ids without searching the list for each rule.
+    """
+    positions = {id(rule): position for position, rule in enumerate(rules)}
+    return {group: [(positions[id(rule)], rule) for rule in rules_in_group]
+            for group, rules_in_group in grouped.items()}
+
+def group_and_sort_rules(rules, category=None, positions=False):
     """
     Group rules by subcategory when a category is selected, otherwise by product/category.
     Args:
         rules: List of rule dictionaries
         category: Optional category filter being applied
+        positions: Return (position in `rules`, rule) pairs instead of bare rules
     """
-    # Special categories that should be grouped by logsource
-    special_categories = ['customs', 'rules-emerging-threats', 'rules-threat-hunting', 
-                         'rules-compliance', 'rules-dfir']
-    
-    if category and category.lower() in special_categories:
-        # Special handling for these categories - group by logsource product
-        grouped = {}
-        for rule in rules:
-            group_key = 'Unknown'
-            if 'logsource' in rule and isinstance(rule['logsource'], dict):
-                prod = rule['logsource'].get('product', '').strip()
-                if prod:
-                    group_key = prod.capitalize()
-                else:
-                    cat = rule['logsource'].get('category', '').strip()
-                    if cat:
-                        group_key = cat.capitalize()
-            
-            if group_key not in grouped:
-                grouped[group_key] = []
-            grouped[group_key].append(rule)
-        
-        # Sort groups and rules within each group
-        sorted_groups = {}
-        for group_key in sorted(grouped.keys()):
-            sorted_groups[group_key] = sorted(
-                grouped[group_key],
-                key=lambda r: (r.get('title') or r.get('file_path', '')).lower()
-            )
-        return sorted_groups
-    
-    elif category:
+    grouped = _group_and_sort_rules(rules, category)
+    return with_positions(grouped, rules) if positions else grouped
+
+def logsource_group(rule):
+    """Group title of a rule: its logsource product, else its category, else 'Unknown'."""
+    logsource = rule.get('logsource')
+    if isinstance(logsource, dict):
+        prod = (logsource.get('product') or '').strip()
+        if prod:
+            return prod.capitalize()
+        cat = (logsource.get('category') or '').strip()
+        if cat:
+            return cat.capitalize()
+    return 'Unknown'
+
+def rule_sort_key(rule):
+    """Order of rules within a group: by title, or file path when untitled."""
+    return str(rule.get('title') or rule.get('file_path', '')).lower()
+
+def groups_by_subcategory(category):
+    """Whether rules of a selected category are grouped by subcategory (else by logsource)."""
+    return category.lower() not in LOGSOURCE_GROUPED_CATEGORIES
+
+def _group_and_sort_rules(rules, category=None):
+    if category and groups_by_subcategory(category):
         # When a non-customs category is selected, group by subcategory
-        grouped = {}
-        for rule in rules:
-            subcategory = extract_subcategory(rule['file_path'], category)
-            if subcategory not in grouped:
-                grouped[subcategory] = []
-            grouped[subcategory].append(rule)
-        
-        # Sort subcategories alphabetically
-        sorted_groups = {}
-        for subcategory in sorted(grouped.keys()):
-            # Sort rules within each subcategory by title or filepath
-            sorted_groups[subcategory] = sorted(
-                grouped[subcategory],
-                key=lambda r: (r.get('title') or r.get('file_path', '')).lower()
-            )
-        return sorted_groups
+        group_of = lambda rule: extract_subcategory(rule['file_path'], category)
+    else:
+        group_of = logsource_group
     
-    # If no category filter, use original grouping logic
-    product_set = set()
+    grouped = {}
     for rule in rules:
-        group_key = 'Unknown'
-        if 'logsource' in rule and isinstance(rule['logsource'], dict):
-            prod = rule['logsource'].get('product', '').strip()
-            if prod:
-                group_key = prod.capitalize()
-            else:
-                cat = rule['logsource'].get('category', '').strip()
-                if cat:
-                    group_key = cat.capitalize()
-        product_set.add(group_key)
-        
-    priority_products = ['Windows', 'Linux', 'Antivirus']
-    product_list = [p for p in priority_products if p in product_set]
-    others = sorted([p for p in product_set if p not in priority_products and p != 'Unknown'])
+        grouped.setdefault(group_of(rule), []).append(rule)
     
-    if 'Unknown' in product_set:
-        product_list += others + ['Unknown']
+    if category:
+        # Groups sorted alphabetically
+        group_order = sorted(grouped)
     else:
-        product_list += others
-        
-    grouped = {p: [] for p in product_list}
-    for rule in rules:
-        group_key = 'Unknown'
-        if 'logsource' in rule and isinstance(rule['logsource'], dict):
-            prod = rule['logsource'].get('product', '').strip()
-            if prod:
-                group_key = prod.capitalize()
-            else:
-                cat = rule['logsource'].get('category', '').strip()
-                if cat:
-                    group_key = cat.capitalize()
-        grouped[group_key].append(rule)
-        
-    for p in grouped:
-        grouped[p].sort(key=lambda r: (r.get('title') or r.get('file_path', '')).lower())
+        # Priority products first, then the rest alphabetically, 'Unknown' last
+        priority_products = ['Windows', 'Linux', 'Antivirus']
+        group_order = [p for p in priority_products if p in grouped]
+        group_order += sorted(p for p in grouped if p not in priority_products and p != 'Unknown')
+        if 'Unknown' in grouped:
+            group_order.append('Unknown')
     
-    return grouped
+    # Sort rules within each group by title or filepath
+    return {group: sorted(grouped[group], key=rule_sort_key) for group in group_order}
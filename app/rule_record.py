@@ -0,0 +1,212 @@
+"""
+Rule record shared by all rule loaders.
+Metadata such as author, dates and level is taken from the parsed YAML once
+at load time, so searches read plain fields instead of re-scanning the raw
+YAML content for every query.
+
+Records keep their fields in slots rather than a per-rule dict. Strings that
+repeat across thousands of rules (tags, logsource values, levels, detection
+field names, ...) are interned, and identical tag tuples and logsource dicts
+are shared between rules, so they are stored once per process.
+"""
+import sys
+from collections.abc import Mapping
+from datetime import date
+from typing import List, Dict, Any, Iterator, Tuple
+from .lucene_converter import detection_field_names, detection_items
+
+# Metadata keys carried by every loaded rule in addition to the base fields
+RULE_METADATA_FIELDS = ('author', 'date', 'modified', 'id', 'status', 'level',
+                        'references', 'falsepositives')
+
+# Fields of a rule record, in the order they are iterated
+RECORD_FIELDS = ('title', 'description', 'tags', 'file_path', 'logsource', 'content',
+                 'author', 'date', 'modified', 'id', 'status', 'level', 'references',
+                 'falsepositives', 'detection_fields', 'detection_items')
+_RECORD_FIELD_SET = frozenset(RECORD_FIELDS)
+
+# Canonical copies of shared tuples and logsource dicts. Their vocabulary is
+# small (a few thousand tag sets across SigmaHQ), so they live for the process.
+_shared_tuples: Dict[Tuple[Any, ...], Tuple[Any, ...]] = {}
+_shared_logsources: Dict[Tuple[Tuple[Any, Any], ...], Dict[str, Any]] = {}
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
+
+def _shared_tuple(values) -> Tuple[Any, ...]:
+    """Tuple of interned values, shared with every equal tuple built before."""
+    values = tuple(_intern(value) for value in values)
+    return _shared_tuples.setdefault(values, values)
+
+
+def _shared_logsource(logsource: Dict[str, Any]) -> Dict[str, Any]:
+    """Logsource dict shared with every equal one built before. Do not mutate."""
+    try:
+        key = tuple((_intern(name), _intern(value)) for name, value in logsource.items())
+        return _shared_logsources.setdefault(key, dict(key))
+    except TypeError:
+        # Unhashable values (e.g. a list): keep a private copy
+        return dict(logsource)
+
+
+def _compact_detection_items(items) -> Tuple[Tuple[str, str, str], ...]:
+    # Field names and modifier chains repeat across rules; values mostly do not
+    return tuple((_intern(name), _intern(modifiers), value) for name, modifiers, value in items)
+
+
+# How each field is stored; fields not listed are kept as given
+_COMPACTORS = {
+    'tags': _shared_tuple,
+    'logsource': _shared_logsource,
+    'status': _intern,
+    'level': _intern,
+    'author': _intern,
+    'references': tuple,
+    'falsepositives': _shared_tuple,
+    'detection_fields': _shared_tuple,
+    'detection_items': _compact_detection_items,
+}
+
+
+class RuleRecord(Mapping):
+    """
+    One loaded rule, read like a dict (rule['title'], rule.get('tags'),
+    'level' in rule) or through attributes (rule.title in templates).
+    List fields are tuples. Records are not modified after they are built;
+    replace the rule instead (see rules_manager.upsert_rule).
+    """
+
+    __slots__ = RECORD_FIELDS
+
+    title: str
+    description: str
+    tags: Tuple[str, ...]
+    file_path: str
+    logsource: Dict[str, Any]
+    content: str
+    author: str
+    date: str
+    modified: str
+    id: str
+    status: str
+    level: str
+    references: Tuple[str, ...]
+    falsepositives: Tuple[str, ...]
+    detection_fields: Tuple[str, ...]
+    detection_items: Tuple[Tuple[str, str, str], ...]
+
+    def __init__(self, **fields: Any):
+        for name in RECORD_FIELDS:
+            value = fields[name]
+            compact = _COMPACTORS.get(name)
+            setattr(self, name, compact(value) if compact and value is not None else value)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _RECORD_FIELD_SET:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in _RECORD_FIELD_SET else default
+
+    def __contains__(self, key: object) -> bool:
+        return key in _RECORD_FIELD_SET
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(RECORD_FIELDS)
+
+    def __len__(self) -> int:
+        return len(RECORD_FIELDS)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Rebuilt through __init__, so records sent back by worker processes are interned again
+        return _record_from_values, (tuple(getattr(self, name) for name in RECORD_FIELDS),)
+
+    def __repr__(self) -> str:
+        return f"RuleRecord(file_path={self.file_path!r}, title={self.title!r})"
+
+
+def _record_from_values(values: Tuple[Any, ...]) -> RuleRecord:
+    return RuleRecord(**dict(zip(RECORD_FIELDS, values)))
+
+
+def _as_text(value: Any) -> str:
+    """Normalize a scalar YAML value to the string form it has in the file."""
+    if value is None:
+        return ''
+    if isinstance(value, date):
+        # PyYAML turns unquoted ISO dates into date objects
+        return value.isoformat()
+    if isinstance(value, list):
+        return ', '.join(_as_text(item) for item in value)
+    return str(value).strip()
+
+
+def _as_str(value: Any) -> str:
+    """Strings as written; other YAML scalars (title: 12345) in their file form."""
+    return value if isinstance(value, str) else _as_text(value)
+
+
+def _as_list(value: Any) -> List[str]:
+    """Normalize a YAML list (or a lone scalar) to a list of strings."""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [_as_text(item) for item in value if item is not None]
+    return [_as_text(value)]
+
+
+def build_rule_record(data: Dict[str, Any], raw_content: str, file_path: str) -> RuleRecord:
+    """
+    Build a rule record from parsed YAML.
+
+    Args:
+        data: Parsed YAML dictionary
+        raw_content: Raw YAML text of the rule
+        file_path: Path relative to the rules directory, with forward slashes
+
+    Returns:
+        Rule record
+    """
+    return RuleRecord(**{
+        'title': _as_str(data.get('title')),
+        'description': _as_str(data.get('description')),
+        'tags': data.get('tags', []) if isinstance(data.get('tags'), list) else [],
+        'file_path': file_path,
+        'logsource': data.get('logsource', {}) if isinstance(data.get('logsource'), dict) else {},
+        'content': raw_content,
+        'author': _as_text(data.get('author')),
+        'date': _as_text(data.get('date')),
+        'modified': _as_text(data.get('modified')),
+        'id': _as_text(data.get('id')),
+        'status': _as_text(data.get('status')),
+        'level': _as_text(data.get('level')),
+        'references': _as_list(data.get('references')),
+        'falsepositives': _as_list(data.get('falsepositives')),
+        'detection_fields': detection_field_names(data.get('detection')),
+        'detection_items': detection_items(data.get('detection')),
+    })
+
+
+def rule_metadata(rule: Dict[str, Any], key: str) -> str:
+    """
+    Read a metadata field from a rule.
+
+    Loaded rules carry the field directly. Rules built elsewhere (e.g. posted
+    by the browser) may only have raw content, in which case the first
+    matching YAML line is used.
+    """
+    if key in rule:
+        return _as_text(rule[key])
+    try:
+        content = rule.get('content', '') or ''
+        prefix = f'{key}:'
+        if prefix in content:
+            for line in content.split('\n'):
+                if line.strip().startswith(prefix):
+                    return line.split(prefix, 1)[1].strip().strip('"\'')
+    except Exception:
+        pass
+    return ''
@@ -0,0 +1,304 @@
+"""
+Memory-mapped columnar snapshot of a rule list.
+Rules are written column by column: one deduplicated UTF-8 string table,
+string-id columns for the scalar fields (title, file_path, level, ...),
+offset arrays into one shared id array for the list fields (tags,
+logsource, detection items, ...) and a blob region holding the raw YAML
+bodies. Opening a snapshot maps the file and decodes nothing; a rule's
+fields are decoded on first access and its body is sliced out of the map
+each time it is read, so processes opening the same snapshot share its
+pages through the OS page cache. The search index keeps no copy of the
+bodies either (see LAZY_TEXT_FIELDS in search_index); what each process
+holds privately is its index.
+"""
+import mmap
+import os
+import pickle
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Tuple
+
+from .rule_record import RECORD_FIELDS, RuleRecord
+
+MAGIC = b'SIGMASNP'
+FORMAT_VERSION = 1
+
+# Fields stored as one string id per rule
+SCALAR_FIELDS = ('title', 'description', 'file_path', 'author', 'date', 'modified',
+                 'id', 'status', 'level')
+
+# Fields stored as a run of string ids per rule. logsource is flattened to
+# key, value, key, value... and detection_items to name, modifiers, value...
+LIST_FIELDS = ('tags', 'references', 'falsepositives', 'detection_fields', 'logsource',
+               'detection_items')
+
+# Rule kinds: columnar, or a record that does not fit the columns (e.g. a
+# non-string title), stored whole as a pickle in the blob region
+COLUMNAR, PICKLED = 0, 1
+
+# Sections, in file order, and the array type of each (None: raw bytes)
+SECTIONS = (
+    ('string_offsets', 'Q'),
+    ('string_data', None),
+    ('kinds', 'B'),
+    ('scalars', 'I'),
+    ('list_offsets', 'I'),
+    ('list_items', 'I'),
+    ('blob_offsets', 'Q'),
+    ('blob', None),
+)
+
+# magic, format version, byte order (0 little, 1 big), rule count, then (offset, length) per section
+_HEADER = struct.Struct('<8sIII' + 'QQ' * len(SECTIONS))
+_ALIGNMENT = 8
+
+
+class SnapshotError(Exception):
+    """Raised for a missing, truncated or incompatible snapshot file."""
+
+
+def _is_text_list(value: Any) -> bool:
+    return isinstance(value, (list, tuple)) and all(isinstance(item, str) for item in value)
+
+
+def _fits_columns(rule: Dict[str, Any]) -> bool:
+    """True if a rule round-trips through the columns unchanged."""
+    if tuple(rule) != RECORD_FIELDS or not isinstance(rule['content'], str):
+        return False
+    if not all(isinstance(rule[field], str) for field in SCALAR_FIELDS):
+        return False
+    if not all(_is_text_list(rule[field]) for field in ('tags', 'references', 'falsepositives',
+                                                        'detection_fields')):
+        return False
+    logsource = rule['logsource']
+    if not isinstance(logsource, dict) or not all(
+            isinstance(key, str) and isinstance(value, str) for key, value in logsource.items()):
+        return False
+    return isinstance(rule['detection_items'], (list, tuple)) and all(
+        isinstance(item, tuple) and len(item) == 3 and all(isinstance(part, str) for part in item)
+        for item in rule['detection_items'])
+
+
+def _list_values(rule: Dict[str, Any], field: str) -> List[str]:
+    if field == 'logsource':
+        return [part for pair in rule['logsource'].items() for part in pair]
+    if field == 'detection_items':
+        return [part for item in rule['detection_items'] for part in item]
+    return rule[field]
+
+
+def write_snapshot(path: str, rules: List[Dict[str, Any]]):
+    """
+    Write rules to a snapshot file. The file is written under a temporary
+    name and renamed into place, so readers never see a partial snapshot.
+    """
+    string_ids: Dict[str, int] = {}
+    string_offsets = array('Q', [0])
+    string_data = bytearray()
+
+    def string_id(text: str) -> int:
+        sid = string_ids.get(text)
+        if sid is None:
+            sid = string_ids[text] = len(string_ids)
+            string_data.extend(text.encode('utf-8', 'surrogatepass'))
+            string_offsets.append(len(string_data))
+        return sid
+
+    kinds = array('B')
+    scalars = array('I')
+    list_offsets = array('I', [0])
+    list_items = array('I')
+    blob_offsets = array('Q', [0])
+    blob = bytearray()
+
+    for rule in rules:
+        if _fits_columns(rule):
+            kinds.append(COLUMNAR)
+            scalars.extend(string_id(rule[field]) for field in SCALAR_FIELDS)
+            for field in LIST_FIELDS:
+                list_items.extend(string_id(value) for value in _list_values(rule, field))
+                list_offsets.append(len(list_items))
+            blob.extend(rule['content'].encode('utf-8', 'surrogatepass'))
+        else:
+            kinds.append(PICKLED)
+            scalars.extend([0] * len(SCALAR_FIELDS))
+            list_offsets.extend([len(list_items)] * len(LIST_FIELDS))
+            blob.extend(pickle.dumps(dict(rule), protocol=pickle.HIGHEST_PROTOCOL))
+        blob_offsets.append(len(blob))
+
+    payloads = {
+        'string_offsets': string_offsets, 'string_data': string_data, 'kinds': kinds,
+        'scalars': scalars, 'list_offsets': list_offsets, 'list_items': list_items,
+        'blob_offsets': blob_offsets, 'blob': blob,
+    }
+    table = []
+    position = _HEADER.size
+    for name, _ in SECTIONS:
+        position += -position % _ALIGNMENT
+        length = len(memoryview(payloads[name]).cast('B'))
+        table.append((position, length))
+        position += length
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0 if sys.byteorder == 'little' else 1, len(rules),
+                             *(value for entry in table for value in entry)))
+        for (name, _), (offset, _) in zip(SECTIONS, table):
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(memoryview(payloads[name]).cast('B'))
+    os.replace(temp_path, path)
+
+
+class RuleSnapshot:
+    """
+    A snapshot file opened read-only with mmap.
+
+    Sections are exposed as memoryviews over the map, so opening costs the
+    same for ten rules as for ten thousand.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SnapshotError(f'Empty snapshot file: {path}')
+        if len(self._map) < _HEADER.size:
+            raise SnapshotError(f'Truncated snapshot file: {path}')
+        magic, version, byte_order, count, *table = _HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise SnapshotError(f'Not a version {FORMAT_VERSION} rule snapshot: {path}')
+        if byte_order != (0 if sys.byteorder == 'little' else 1):
+            raise SnapshotError(f'Snapshot written on a machine with another byte order: {path}')
+
+        view = memoryview(self._map)
+        sections = {}
+        for index, (name, typecode) in enumerate(SECTIONS):
+            offset, length = table[2 * index], table[2 * index + 1]
+            if offset + length > len(self._map):
+                raise SnapshotError(f'Truncated snapshot file: {path}')
+            section = view[offset:offset + length]
+            sections[name] = section.cast(typecode) if typecode else section
+        self._count = count
+        self._string_offsets = sections['string_offsets']
+        self._string_data = sections['string_data']
+        self._kinds = sections['kinds']
+        self._scalars = sections['scalars']
+        self._list_offsets = sections['list_offsets']
+        self._list_items = sections['list_items']
+        self._blob_offsets = sections['blob_offsets']
+        self._blob = sections['blob']
+
+    def __len__(self) -> int:
+        return self._count
+
+    def string(self, string_id: int) -> str:
+        start, end = self._string_offsets[string_id], self._string_offsets[string_id + 1]
+        return str(self._string_data[start:end], 'utf-8', 'surrogatepass')
+
+    def _blob_bytes(self, index: int) -> memoryview:
+        return self._blob[self._blob_offsets[index]:self._blob_offsets[index + 1]]
+
+    def _list(self, index: int, position: int) -> List[str]:
+        slot = index * len(LIST_FIELDS) + position
+        ids = self._list_items[self._list_offsets[slot]:self._list_offsets[slot + 1]]
+        return [self.string(string_id) for string_id in ids]
+
+    def fields(self, index: int) -> Mapping:
+        """
+        Rule `index` as a record. A columnar rule's record has no content
+        (None); read it with content().
+        """
+        if self._kinds[index] == PICKLED:
+            fields = pickle.loads(self._blob_bytes(index))
+            return RuleRecord(**fields) if tuple(fields) == RECORD_FIELDS else fields
+        base = index * len(SCALAR_FIELDS)
+        fields = {field: self.string(self._scalars[base + position])
+                  for position, field in enumerate(SCALAR_FIELDS)}
+        for position, field in enumerate(LIST_FIELDS):
+            values = self._list(index, position)
+            if field == 'logsource':
+                fields[field] = dict(zip(values[::2], values[1::2]))
+            elif field == 'detection_items':
+                fields[field] = zip(values[::3], values[1::3], values[2::3])
+            else:
+                fields[field] = values
+        # Body stays in the map
+        fields['content'] = None
+        return RuleRecord(**fields)
+
+    def content(self, index: int) -> str:
+        """Raw YAML body of columnar rule `index`, read from the map."""
+        return str(self._blob_bytes(index), 'utf-8', 'surrogatepass')
+
+    def is_columnar(self, index: int) -> bool:
+        return self._kinds[index] == COLUMNAR
+
+    def rules(self) -> List['SnapshotRule']:
+        """One lazy rule view per stored rule, in stored order."""
+        return [SnapshotRule(self, index) for index in range(self._count)]
+
+
+class SnapshotRule(Mapping):
+    """
+    Read-only dict-style view of one rule in a RuleSnapshot.
+
+    Fields are decoded on first access and kept; the content is decoded from
+    the map on every read and never kept, so unread bodies cost no memory.
+    """
+
+    __slots__ = ('_snapshot', '_index', '_fields')
+
+    def __init__(self, snapshot: RuleSnapshot, index: int):
+        self._snapshot = snapshot
+        self._index = index
+        self._fields = None
+
+    def _decoded(self) -> Mapping:
+        if self._fields is None:
+            self._fields = self._snapshot.fields(self._index)
+        return self._fields
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'content' and self._snapshot.is_columnar(self._index):
+            return self._snapshot.content(self._index)
+        return self._decoded()[key]
+
+    def __contains__(self, key: object) -> bool:
+        if self._snapshot.is_columnar(self._index):
+            return key in RECORD_FIELDS
+        return key in self._decoded()
+
+    def __iter__(self) -> Iterator[str]:
+        if self._snapshot.is_columnar(self._index):
+            return iter(RECORD_FIELDS)
+        return iter(self._decoded())
+
+    def __len__(self) -> int:
+        if self._snapshot.is_columnar(self._index):
+            return len(RECORD_FIELDS)
+        return len(self._decoded())
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Pickle (e.g. across processes) as the plain record
+        return dict, (dict(self),)
+
+    def __repr__(self) -> str:
+        return f"SnapshotRule({self._snapshot.path!r}, {self._index})"
+
+
+
+def source_snapshot(rules: List[Any]) -> RuleSnapshot | None:
+    """The snapshot `rules` are views of, if they are exactly its rules in stored order."""
+    if not rules or not isinstance(rules[0], SnapshotRule):
+        return None
+    snapshot = rules[0]._snapshot
+    if len(snapshot) != len(rules):
+        return None
+    for index, rule in enumerate(rules):
+        if not isinstance(rule, SnapshotRule) or rule._snapshot is not snapshot or rule._index != index:
+            return None
+    return snapshot
@@ -1,17 +1,37 @@
 import logging
 import os
+import threading
 import yaml
+from typing import Any, Dict, List, NamedTuple
 from .config import ensure_rules_dir, ensure_custom_rules_dir
 from .rule_loader import load_rules
-from .rule_cache import load_cache, save_cache
-from .parallel_loader import load_rules_parallel
+from .rule_cache import load_rules_incremental
+from .search_index import RuleIndex
+from .advanced_search import advanced_search
 
-# Global rules list
-rules = []
+
+class Ruleset(NamedTuple):
+    """The loaded rules, the search index over them and their version, swapped as one"""
+    rules: List[Dict[str, Any]]
+    index: RuleIndex
+    # Bumped on every change to the rules list; part of derived cache keys
+    version: int
+
+
+# Current ruleset. Reloads build a new list and index off to the side and
+# replace this in one assignment, so readers never see a half-built index
+_ruleset = Ruleset([], RuleIndex(), 0)
+advanced_search.attach_index(_ruleset.index)
+
+# Serializes changes to the ruleset
+_write_lock = threading.Lock()
 
 # Flag to track if we should use optimized loading
 USE_OPTIMIZED_LOADING = os.environ.get('SIGMA_OPTIMIZED_LOADING', 'True').lower() == 'true'
 
+# Worker processes for parsing rule files (unset or 0: one per CPU)
+LOADER_WORKERS = int(os.environ.get('SIGMA_LOADER_WORKERS', '0') or 0) or None
+
 def load_sigma_rules():
     """Load Sigma rules from the rules directory, including custom rules and emerging threats."""
     import time
@@ -26,20 +46,10 @@ def load_sigma_rules():
         
         # Try optimized loading if enabled
         if USE_OPTIMIZED_LOADING:
-            # Try to load from cache first
+            # Reuse cached rules for unchanged files, parse only the changed ones
             load_start = time.time()
-            loaded_rules = load_cache(rules_dir_abs)
-            
-            if loaded_rules:
-                logging.info(f"  -> Loaded {len(loaded_rules)} rules from cache in {time.time() - load_start:.2f}s")
-            else:
-                # Cache miss - use parallel loading
-                load_start = time.time()
-                loaded_rules = load_rules_parallel(rules_dir_abs, max_workers=4)
-                logging.info(f"  -> Parallel loaded {len(loaded_rules)} rules in {time.time() - load_start:.2f}s")
-                
-                # Save to cache for next time
-                save_cache(loaded_rules, rules_dir_abs)
+            loaded_rules = load_rules_incremental(rules_dir_abs, max_workers=LOADER_WORKERS)
+            logging.info(f"  -> Loaded {len(loaded_rules)} rules through the rule cache in {time.time() - load_start:.2f}s")
         
         # Fallback to traditional loading if optimized loading disabled or failed
         if not loaded_rules:
@@ -47,8 +57,7 @@ def load_sigma_rules():
             loaded_rules = load_rules(rules_dir_abs)
             logging.info(f"  -> Traditional loaded {len(loaded_rules)} rules in {time.time() - load_start:.2f}s")
         
-        rules.clear()
-        rules.extend(loaded_rules)
+        set_rules(loaded_rules)
         
         # Count rules by source directory
         custom_count = len([r for r in loaded_rules if r['file_path'].startswith('customs/')])
@@ -91,11 +100,70 @@ def load_sigma_rules():
             log_message += f" ({', '.join(log_parts)})"
         
         logging.info(log_message)
-        return rules
+        return get_rules()
     except Exception as e:
         logging.error(f"Failed to load rules: {str(e)}")
         return []
 
+def get_ruleset():
+    """Get the current rules list, search index and version as one consistent snapshot."""
+    return _ruleset
+
 def get_rules():
     """Get the current rules list."""
-    return rules 
\ No newline at end of file
+    return _ruleset.rules
+
+def get_search_index():
+    """Get the search index built over the current rules list."""
+    return _ruleset.index
+
+def get_ruleset_version():
+    """Get the version counter of the current rules list."""
+    return _ruleset.version
+
+def _bump_ruleset_version():
+    global _ruleset
+    _ruleset = _ruleset._replace(version=_ruleset.version + 1)
+
+def set_rules(new_rules):
+    """
+    Replace the rules list. The new list and its search index are built
+    aside while requests keep reading the old ones, then swapped in together.
+    """
+    global _ruleset
+    rules = list(new_rules)
+    index = RuleIndex()
+    index.rebuild(rules)
+    with _write_lock:
+        _ruleset = Ruleset(rules, index, _ruleset.version + 1)
+        advanced_search.attach_index(index)
+    return rules
+
+def upsert_rule(rule_entry):
+    """Add a rule or replace the one with the same file_path, keeping the index in sync."""
+    with _write_lock:
+        rules, search_index = _ruleset.rules, _ruleset.index
+        for i, existing in enumerate(rules):
+            if existing.get('file_path') == rule_entry.get('file_path'):
+                search_index.remove(existing)
+                rules[i] = rule_entry
+                break
+        else:
+            rules.append(rule_entry)
+        search_index.add(rule_entry)
+        _bump_ruleset_version()
+    return rule_entry
+
+def remove_rule(file_path):
+    """Remove every rule with the given file_path from the rules list and the index."""
+    with _write_lock:
+        rules, search_index = _ruleset.rules, _ruleset.index
+        removed = [r for r in rules if r.get('file_path') == file_path]
+        if not removed:
+            return 0
+        for rule in removed:
+            search_index.remove(rule)
+        # One slice assignment: readers never see an emptied list
+        rules[:] = [r for r in rules if r.get('file_path') != file_path]
+        _bump_ruleset_version()
+    return len(removed) 
\ No newline at end of file
@@ -0,0 +1,393 @@
+"""
+Inverted index over the loaded Sigma rules.
+Keeps token -> posting-list and trigram -> posting-list maps per searchable
+field so that search terms can be narrowed to a handful of candidate rules
+instead of scanning and lowercasing the whole corpus on every request.
+"""
+import re
+import bisect
+from array import array
+import threading
+import logging
+from typing import Dict, List, Any, Iterable, Set, Tuple
+from .rule_record import rule_metadata
+from .facet_index import FacetIndex
+from .path_index import PathIndex
+from .suggest_index import SuggestIndex
+from .date_index import DateIndex, DATE_PREFIX_RE, date_span
+from .tag_index import TagIndex
+from .detection_index import DetectionIndex
+from .fuzzy import FuzzyVocabulary
+from . import bitset
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Substring terms at least this long are answered from the trigram index
+TRIGRAM_SIZE = 3
+
+
+def _trigrams(text: str) -> Set[str]:
+    """Distinct overlapping trigrams of a (lowercased) string."""
+    return {text[i:i + TRIGRAM_SIZE] for i in range(len(text) - TRIGRAM_SIZE + 1)}
+
+
+# Fields kept in the index and how to read them from a rule
+INDEXED_FIELDS = {
+    # Valid YAML may hold a number or date here (title: 12345)
+    'title': lambda rule: str(rule.get('title', '') or ''),
+    'description': lambda rule: str(rule.get('description', '') or ''),
+    'tags': lambda rule: ' '.join(str(tag) for tag in rule.get('tags', [])),
+    'content': lambda rule: rule.get('content', '') or '',
+    'author': lambda rule: rule_metadata(rule, 'author'),
+    'path': lambda rule: rule.get('file_path', '') or '',
+}
+
+# Fields whose lowercased text is not kept per rule: rule bodies are by far
+# the largest field, and a private copy per process would undo sharing them
+# through the snapshot map. Their text is re-read from the rule on demand.
+LAZY_TEXT_FIELDS = frozenset({'content'})
+
+# Search fields whose text is contained in one of the indexed fields
+FIELD_ALIASES = {
+    'filename': 'path',
+}
+
+
+class RuleIndex:
+    """
+    Token index over a rule list.
+
+    Every rule gets a dense integer id when it is added. Ids are never reused
+    while the index lives; removed rules leave a tombstone that is dropped on
+    the next rebuild. Sets of rules are exchanged as bitsets over these ids
+    (see app.bitset).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        """Drop every rule and posting list."""
+        with self._lock:
+            self.rules: List[Dict[str, Any] | None] = []
+            self._ids: Dict[int, int] = {}
+            self._texts: Dict[str, List[str]] = {field: [] for field in INDEXED_FIELDS
+                                                 if field not in LAZY_TEXT_FIELDS}
+            self._postings: Dict[str, Dict[str, List[int]]] = {field: {} for field in INDEXED_FIELDS}
+            self._trigrams: Dict[str, Dict[str, array]] = {field: {} for field in INDEXED_FIELDS}
+            self._sorted_vocab: Dict[str, List[str] | None] = {field: None for field in INDEXED_FIELDS}
+            self._fuzzy_vocab: Dict[str, FuzzyVocabulary | None] = {field: None for field in INDEXED_FIELDS}
+            self._lengths: Dict[str, List[int]] = {field: [] for field in INDEXED_FIELDS}
+            self._total_lengths: Dict[str, int] = {field: 0 for field in INDEXED_FIELDS}
+            self._path_ids: Dict[str, int] = {}
+            self.paths = PathIndex()
+            self.facets = FacetIndex()
+            self.suggestions = SuggestIndex()
+            self.dates = DateIndex()
+            self.tags = TagIndex()
+            self.detections = DetectionIndex()
+            self.live_mask = 0
+
+    def rebuild(self, rules: Iterable[Dict[str, Any]]):
+        """Rebuild the index from scratch for the given rules."""
+        import time
+        start_time = time.time()
+        with self._lock:
+            self.clear()
+            for rule in rules:
+                self.add(rule)
+        logger.info(f"Search index built for {len(self.rules)} rules in {time.time() - start_time:.2f}s")
+
+    def add(self, rule: Dict[str, Any]) -> int:
+        """Index a rule and return its id."""
+        with self._lock:
+            existing = self._ids.get(id(rule))
+            if existing is not None:
+                return existing
+
+            rule_id = len(self.rules)
+            self.rules.append(rule)
+            self._ids[id(rule)] = rule_id
+            self.live_mask = bitset.set_bit(self.live_mask, rule_id)
+
+            file_path = rule.get('file_path', '') or ''
+            self._path_ids[file_path] = rule_id
+            self.paths.add(rule_id, rule)
+            self.facets.add(rule_id, rule)
+            self.suggestions.add(rule)
+            self.dates.add(rule_id, rule)
+            self.tags.add(rule_id, rule)
+            self.detections.add(rule_id, rule)
+
+            for field, getter in INDEXED_FIELDS.items():
+                text = getter(rule).lower()
+                if field not in LAZY_TEXT_FIELDS:
+                    self._texts[field].append(text)
+                tokens = TOKEN_RE.findall(text)
+                self._lengths[field].append(len(tokens))
+                self._total_lengths[field] += len(tokens)
+                postings = self._postings[field]
+                for token in set(tokens):
+                    posting = postings.get(token)
+                    if posting is None:
+                        postings[token] = [rule_id]
+                        self._sorted_vocab[field] = None
+                        self._fuzzy_vocab[field] = None
+                    else:
+                        posting.append(rule_id)
+                trigrams = self._trigrams[field]
+                for trigram in _trigrams(text):
+                    posting = trigrams.get(trigram)
+                    if posting is None:
+                        # Compact int arrays: trigram postings dominate index memory
+                        trigrams[trigram] = array('i', (rule_id,))
+                    else:
+                        posting.append(rule_id)
+            return rule_id
+
+    def remove(self, rule: Dict[str, Any]) -> bool:
+        """Tombstone a rule so it no longer shows up in lookups."""
+        with self._lock:
+            rule_id = self._ids.pop(id(rule), None)
+            if rule_id is None:
+                return False
+            self.rules[rule_id] = None
+            for field in INDEXED_FIELDS:
+                if field not in LAZY_TEXT_FIELDS:
+                    self._texts[field][rule_id] = ''
+                self._total_lengths[field] -= self._lengths[field][rule_id]
+                self._lengths[field][rule_id] = 0
+            self.live_mask = bitset.clear_bit(self.live_mask, rule_id)
+
+            file_path = rule.get('file_path', '') or ''
+            if self._path_ids.get(file_path) == rule_id:
+                del self._path_ids[file_path]
+            self.paths.remove(rule_id, rule)
+            self.facets.remove(rule_id, rule)
+            self.suggestions.remove(rule)
+            self.dates.remove(rule_id, rule)
+            self.tags.remove(rule_id, rule)
+            self.detections.remove(rule_id, rule)
+            return True
+
+    def __len__(self):
+        return len(self._ids)
+
+    def rule_id(self, rule: Dict[str, Any]) -> int | None:
+        """Return the id of a rule object, or None if it is not indexed."""
+        rule_id = self._ids.get(id(rule))
+        if rule_id is None or self.rules[rule_id] is not rule:
+            return None
+        return rule_id
+
+    def mask_for_rules(self, rules: Iterable[Dict[str, Any]]) -> int:
+        """Bitset of the indexed rules in `rules`."""
+        return bitset.from_ids(rule_id for rule_id in map(self.rule_id, rules) if rule_id is not None)
+
+    def mask_for_paths(self, file_paths: Iterable[str]) -> int:
+        """Bitset of the rules loaded from the given relative file paths."""
+        path_ids = self._path_ids
+        return bitset.from_ids(path_ids[path] for path in file_paths if path in path_ids)
+
+    def component_mask(self, component: str) -> int:
+        """Bitset of the rules whose file path has `component` as one of its parts."""
+        return self.paths.component_mask(component)
+
+    def date_range_mask(self, field: str, first: int | None, last: int | None) -> int:
+        """Bitset of the rules whose `field` date (see app.date_index) lies in [first, last]."""
+        with self._lock:
+            return bitset.from_ids(self.dates.range_ids(field, first, last))
+
+    def date_candidates(self, field: str, value: str) -> Set[int] | None:
+        """
+        Ids of rules whose `field` date may match a text search for `value`
+        (a year, month or day): dates in that span plus dates that could not
+        be parsed. None when `value` is not a date.
+        """
+        if not DATE_PREFIX_RE.fullmatch(value):
+            return None
+        span = date_span(value)
+        if span is None:
+            return None
+        with self._lock:
+            return set(self.dates.range_ids(field, *span)) | self.dates.unparsed_ids(field)
+
+    def tag_mask(self, tag: str) -> int:
+        """Bitset of the rules tagged `tag` or one of its descendants (see app.tag_index)."""
+        with self._lock:
+            return bitset.from_ids(self.tags.ids(tag))
+
+    def detection_mask(self, field: str, modifiers: Tuple[str, ...], value: str | None,
+                       stellar: bool = False) -> int:
+        """Bitset of the rules with a matching detection item (see app.detection_index)."""
+        with self._lock:
+            return bitset.from_ids(self.detections.ids(field, modifiers, value, stellar))
+
+    def suggest(self, prefix: str, limit: int = 10, kinds: Iterable[str] | None = None) -> List[Dict[str, Any]]:
+        """Autocomplete suggestions for a prefix (see SuggestIndex.suggest)."""
+        with self._lock:
+            return self.suggestions.suggest(prefix, limit, kinds)
+
+    def tag_counts(self, mask: int | None = None) -> Dict[str, Any]:
+        """Per tactic/technique/cve/detection/car rule counts, over `mask` when given."""
+        with self._lock:
+            if mask is None:
+                return self.tags.counts()
+            return self.tags.counts_for(self.rules[rule_id] for rule_id in bitset.to_ids(mask & self.live_mask))
+
+    def facet_counts(self, mask: int, deployed_mask: int | None = None) -> Dict[str, Dict[str, int]]:
+        """
+        Per-facet counts for the rules in `mask`. With `deployed_mask`, a
+        'deployment' facet splits them into deployed and undeployed.
+        """
+        with self._lock:
+            mask &= self.live_mask
+            counts = self.facets.counts(mask)
+        if deployed_mask is not None:
+            deployed = bitset.count(mask & deployed_mask)
+            counts['deployment'] = {'deployed': deployed, 'undeployed': bitset.count(mask) - deployed}
+        return counts
+
+    def filter_rules(self, rules: Iterable[Dict[str, Any]], mask: int) -> List[Dict[str, Any]]:
+        """Keep the rules whose id is set in `mask`, preserving the order of `rules`."""
+        if not mask:
+            return []
+        data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+        size = len(data)
+        results = []
+        for rule in rules:
+            rule_id = self.rule_id(rule)
+            if rule_id is not None and (rule_id >> 3) < size and data[rule_id >> 3] >> (rule_id & 7) & 1:
+                results.append(rule)
+        return results
+
+    def text(self, rule_id: int, field: str) -> str:
+        """Return the lowercased text of an indexed field ('' for a removed rule)."""
+        if field in LAZY_TEXT_FIELDS:
+            rule = self.rules[rule_id]
+            return INDEXED_FIELDS[field](rule).lower() if rule is not None else ''
+        return self._texts[field][rule_id]
+
+    def field_length(self, rule_id: int, field: str) -> int:
+        """Number of tokens in an indexed field."""
+        return self._lengths[field][rule_id]
+
+    def average_field_length(self, field: str) -> float:
+        """Average token count of a field over the live rules."""
+        return self._total_lengths[field] / max(len(self), 1)
+
+    def _vocabulary(self, field: str) -> List[str]:
+        vocab = self._sorted_vocab[field]
+        if vocab is None:
+            vocab = sorted(self._postings[field])
+            self._sorted_vocab[field] = vocab
+        return vocab
+
+    def _matching_tokens(self, field: str, piece: str, bounded_left: bool, bounded_right: bool) -> Iterable[str]:
+        """Vocabulary tokens that may hold `piece` given how it sits in the search value."""
+        postings = self._postings[field]
+        if bounded_left and bounded_right:
+            return [piece] if piece in postings else []
+        if bounded_left:
+            vocab = self._vocabulary(field)
+            start = bisect.bisect_left(vocab, piece)
+            end = bisect.bisect_left(vocab, piece + '\uffff')
+            return vocab[start:end]
+        if bounded_right:
+            return [token for token in postings if token.endswith(piece)]
+        return [token for token in postings if piece in token]
+
+    def _trigram_candidates(self, field: str, value: str) -> Set[int]:
+        """Rules whose field holds every trigram of `value`."""
+        trigrams = self._trigrams[field]
+        postings = []
+        for trigram in _trigrams(value):
+            posting = trigrams.get(trigram)
+            if not posting:
+                return set()
+            postings.append(posting)
+        # Intersect from the rarest trigram up so the working set stays small
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result.intersection_update(posting)
+            if not result:
+                break
+        return result
+
+    def _token_candidates(self, field: str, value: str) -> Set[int] | None:
+        """Rules holding vocabulary tokens compatible with the word pieces of `value`."""
+        pieces = list(TOKEN_RE.finditer(value))
+        if not pieces:
+            return None
+
+        postings = self._postings[field]
+        result = None
+        for match in pieces:
+            piece = match.group()
+            bounded_left = match.start() > 0
+            bounded_right = match.end() < len(value)
+            ids = set()
+            for token in self._matching_tokens(field, piece, bounded_left, bounded_right):
+                ids.update(postings[token])
+            result = ids if result is None else result & ids
+            if not result:
+                return set()
+        return result
+
+    def candidates(self, field: str, value: str) -> Set[int] | None:
+        """
+        Return ids of rules whose `field` text may contain `value` as a substring.
+
+        Values of three or more characters are answered from the trigram
+        index, shorter ones from the token vocabulary. The result is a superset
+        of the real matches; callers still verify each candidate. Returns None
+        when the value cannot be narrowed with the index (short value without
+        word characters, or field not indexed).
+        """
+        field = FIELD_ALIASES.get(field, field)
+        if field not in self._postings:
+            return None
+
+        value = value.lower()
+        with self._lock:
+            if len(value) >= TRIGRAM_SIZE:
+                result = self._trigram_candidates(field, value)
+            else:
+                result = self._token_candidates(field, value)
+                if result is None:
+                    return None
+            return {rule_id for rule_id in result if self.rules[rule_id] is not None}
+
+    def fuzzy_candidates(self, field: str, term: str) -> Set[int] | None:
+        """
+        Ids of rules whose `field` holds a token within a few edits of `term`
+        (see app.fuzzy). Exact: callers need not verify. None when the field
+        is not indexed.
+        """
+        field = FIELD_ALIASES.get(field, field)
+        if field not in self._postings:
+            return None
+        with self._lock:
+            vocabulary = self._fuzzy_vocab[field]
+            if vocabulary is None:
+                vocabulary = FuzzyVocabulary(self._postings[field])
+                self._fuzzy_vocab[field] = vocabulary
+            postings = self._postings[field]
+            result = set()
+            for token in vocabulary.lookup(term):
+                result.update(postings[token])
+            return {rule_id for rule_id in result if self.rules[rule_id] is not None}
+
+    def general_candidates(self, term: str) -> Set[int] | None:
+        """Union of candidates over every indexed field (general search)."""
+        result = set()
+        for field in INDEXED_FIELDS:
+            ids = self.candidates(field, term)
+            if ids is None:
+                return None
+            result |= ids
+        return result
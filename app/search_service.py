@@ -0,0 +1,356 @@
+"""
+Search over the loaded ruleset shared by the index page and the JSON API.
+Filters (deployment state, category, subcategory) and the query are applied
+as bitsets over the search index; results are cached per query, filters and
+ruleset/deployment versions.
+"""
+import base64
+import binascii
+from typing import Any, Dict, List, Tuple
+
+from .advanced_search import advanced_search
+from .lru_cache import LRUCache
+from .ranking import rank_rules
+from .rule_processor import group_and_sort_rules, groups_by_subcategory
+from . import bitset
+from .facet_index import FACET_FIELDS
+from .rules_manager import get_ruleset, get_search_index
+from .suggest_index import SUGGESTION_FIELDS, suggestion_query
+
+# Bounds for the result cache
+RESULT_CACHE_SIZE = 64
+RESULT_CACHE_MAX_RULE_REFS = 200000
+
+# Number of hits shown when results are ranked by relevance
+DEFAULT_RANKED_LIMIT = 100
+
+# Incremental search: sessions tracked and recent answers kept per session
+REFINEMENT_SESSIONS = 256
+REFINEMENT_HISTORY = 8
+
+# Autocomplete answers kept in memory
+SUGGEST_CACHE_SIZE = 1024
+
+# Page size bounds for paginated results
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Cached (results, scores, grouped_rules, filter_description, mask) per filter/query combination
+_result_cache = LRUCache(RESULT_CACHE_SIZE, maxweight=RESULT_CACHE_MAX_RULE_REFS)
+_cache_versions = {}
+
+# session id -> recent [(query, filters, result mask)], newest last
+_refinement_sessions = LRUCache(REFINEMENT_SESSIONS)
+
+# Autocomplete answers per (prefix, limit, kinds, ruleset version)
+_suggest_cache = LRUCache(SUGGEST_CACHE_SIZE)
+
+
+def _check_versions(ruleset_version, deployment_version):
+    # Drop everything once the rules or deployment state change
+    if _cache_versions.get('versions') != (ruleset_version, deployment_version):
+        _result_cache.clear()
+        _cache_versions['versions'] = (ruleset_version, deployment_version)
+        _cache_versions.pop('deployed_mask', None)
+
+
+def deployed_mask(deployment_manager, ruleset=None) -> int:
+    """
+    Bitset of the deployed rules over the index of `ruleset` (default: the
+    current one), cached until the rules or deployments change.
+    """
+    ruleset = ruleset or get_ruleset()
+    _check_versions(ruleset.version, deployment_manager.version)
+    mask = _cache_versions.get('deployed_mask')
+    if mask is None:
+        mask = ruleset.index.mask_for_paths(deployment_manager.get_deployed_rules())
+        _cache_versions['deployed_mask'] = mask
+    return mask
+
+
+def _compute_results(ruleset, query, category, subcategory, deployment_status, deployment_manager,
+                     sort, limit, group, facet_filters, path_prefix, base_mask=None):
+    filter_description = []
+    scores = None
+    grouped_rules = None
+
+    # Start with all rules; filters are applied as bitsets over the index
+    search_index = ruleset.index
+    mask = search_index.live_mask
+
+    # Filter by deployment status
+    if deployment_status in ['deployed', 'undeployed']:
+        deployed = deployed_mask(deployment_manager, ruleset)
+
+        if deployment_status == 'deployed':
+            mask &= deployed
+            filter_description.append('Deployed')
+        elif deployment_status == 'undeployed':
+            mask &= ~deployed
+            filter_description.append('Undeployed')
+
+    # Filter by category and subcategory
+    if category:
+        mask &= search_index.component_mask(category)
+        filter_description.append(category.capitalize())
+        if subcategory:
+            mask &= search_index.component_mask(subcategory)
+            filter_description.append(subcategory.replace('_', ' ').capitalize())
+
+    # Filter by directory prefix (e.g. windows/process_creation)
+    if path_prefix:
+        mask &= search_index.paths.prefix_mask(path_prefix)
+        filter_description.append(path_prefix.strip('/'))
+
+    # Filter by facet values (level, product, ...)
+    for facet, value in facet_filters:
+        mask &= search_index.facets.mask(facet, value)
+
+    if base_mask is not None:
+        # Refinement of an earlier query: only its results can still match
+        mask &= base_mask
+
+    if query:
+        mask = advanced_search.search_mask(query, mask, search_index)  # Advanced search within filtered results
+
+    if group and not (query and sort == 'relevance') and category and groups_by_subcategory(category):
+        # Grouped by subcategory: read the materialized orderings of the path index
+        results, grouped_rules = _grouped_by_path(search_index, category, mask)
+        return results, scores, grouped_rules or None, filter_description, mask
+
+    results = search_index.filter_rules(ruleset.rules, mask)
+
+    if query and sort == 'relevance':
+        # Ranked mode: best hits first, optionally only the top-k, in a single group
+        ranked = rank_rules(results, query, limit, index=search_index)
+        scores = [score for score, _ in ranked]
+        results = [rule for _, rule in ranked]
+        if group and results:
+            grouped_rules = {'Most Relevant': list(enumerate(results))}
+    elif group and results:
+        # Pass the category to group_and_sort_rules when filtering
+        grouped_rules = group_and_sort_rules(results, category if category else None, positions=True)
+
+    return results, scores, grouped_rules, filter_description, mask
+
+
+def _grouped_by_path(search_index, category, mask):
+    """Results in display order and grouped (position, rule) pairs from the path index."""
+    results = []
+    grouped_rules = {}
+    # Without further filters the groups are used as they are
+    unfiltered = mask == search_index.component_mask(category)
+    for group, ids in search_index.paths.grouped_ids(category).items():
+        if not unfiltered:
+            ids = bitset.select(mask, ids)
+        if ids:
+            grouped_rules[group] = [(len(results) + offset, search_index.rules[rule_id])
+                                    for offset, rule_id in enumerate(ids)]
+            results.extend(rule for _, rule in grouped_rules[group])
+    return results, grouped_rules
+
+
+def search_loaded_rules(query: str = '', category: str = '', subcategory: str = '',
+                        deployment_status: str = '', deployment_manager=None,
+                        sort: str = '', limit: int | None = None, group: bool = False,
+                        facet_filters: Tuple[Tuple[str, str], ...] = (), path_prefix: str = '',
+                        session: str = ''):
+    """
+    Search the loaded ruleset.
+
+    Args:
+        query: Advanced search query (empty matches every rule)
+        category, subcategory: Rule path components to filter on
+        deployment_status: 'deployed', 'undeployed' or empty
+        deployment_manager: Needed when filtering on deployment status
+        sort: 'relevance' to rank hits by BM25 score
+        limit: Keep only the top-k hits when ranking
+        group: Also group the hits the way the index page shows them
+        facet_filters: (facet, value) pairs every hit must have
+        path_prefix: Directory every hit must live under
+        session: Client session id; when the query refines one recently
+            answered for that session (same filters), only the earlier
+            results are searched
+
+    Returns:
+        (results, scores, grouped_rules, filter_description, mask); scores is
+        None unless ranked, grouped_rules is None unless grouped and non-empty
+        and holds (position in results, rule) pairs, mask is the bitset of all
+        hits (before any top-k cut)
+    """
+    # One snapshot of the rules and index for the whole search; a reload may swap them meanwhile
+    ruleset = get_ruleset()
+    ruleset_version = ruleset.version
+    deployment_version = deployment_manager.version if deployment_manager is not None else 0
+    _check_versions(ruleset_version, deployment_version)
+
+    key = (query, category, subcategory, deployment_status, sort, limit, group, facet_filters,
+           path_prefix, ruleset_version, deployment_version)
+    filters = (category, subcategory, deployment_status, facet_filters, path_prefix,
+               ruleset_version, deployment_version)
+    entry = _result_cache.get(key)
+    if entry is None:
+        base_mask = _refinement_base(session, query, filters) if session else None
+        entry = _compute_results(ruleset, query, category, subcategory, deployment_status,
+                                 deployment_manager, sort, limit, group, facet_filters, path_prefix,
+                                 base_mask)
+        # Weight = rule references held (flat list + grouped copy)
+        _result_cache.put(key, entry, weight=2 * len(entry[0]) + 1)
+    if session:
+        _remember_answer(session, query, filters, entry[4])
+    return entry
+
+
+def _refinement_base(session, query, filters):
+    """Result mask of the newest earlier answer of the session that `query` refines."""
+    history = _refinement_sessions.get(session) or []
+    for previous_query, previous_filters, mask in reversed(history):
+        if previous_filters == filters and advanced_search.refines(query, previous_query):
+            return mask
+    return None
+
+
+def _remember_answer(session, query, filters, mask):
+    history = [item for item in _refinement_sessions.get(session) or []
+               if item[:2] != (query, filters)]
+    history.append((query, filters, mask))
+    _refinement_sessions.put(session, history[-REFINEMENT_HISTORY:])
+
+
+def suggest(prefix: str, limit: int = 10, kinds: Tuple[str, ...] = ()) -> List[Dict[str, Any]]:
+    """
+    Autocomplete suggestions for a typed prefix: search field names plus
+    titles, tags, authors, logsource values and detection fields of the
+    loaded rules, most frequent first. Cached until the ruleset changes.
+    """
+    prefix = prefix.strip().lower()
+    if not prefix:
+        return []
+    ruleset = get_ruleset()
+    key = (prefix, limit, kinds, ruleset.version)
+    cached = _suggest_cache.get(key)
+    if cached is not None:
+        return cached
+
+    search_index = ruleset.index
+    suggestions = search_index.suggest(prefix, limit, kinds)
+    if not kinds or 'field' in kinds:
+        # Every rule can be searched by field name, so they rank as frequent as it gets
+        total = len(search_index)
+        fields = [{'text': name, 'kind': 'field', 'count': total, 'query': suggestion_query('field', name)}
+                  for name in sorted(advanced_search.field_mappings) if name.startswith(prefix)]
+        suggestions = (fields + suggestions)[:limit]
+    _suggest_cache.put(key, suggestions)
+    return suggestions
+
+
+def tag_counts(mask: int | None = None) -> Dict[str, Any]:
+    """
+    Rules per ATT&CK tactic, technique (with sub-techniques) and cve/detection/car
+    tag; precomputed for the whole ruleset, counted over `mask` when given.
+    """
+    return get_search_index().tag_counts(mask)
+
+
+def component_mask(component: str) -> int:
+    """Bitset of the rules whose file path has `component` as one of its parts."""
+    return get_search_index().component_mask(component)
+
+
+def facet_counts(mask: int, deployment_manager=None) -> Dict[str, Dict[str, int]]:
+    """Per-facet counts for a result mask, including deployment state when known."""
+    deployed = deployed_mask(deployment_manager) if deployment_manager is not None else None
+    return get_search_index().facet_counts(mask, deployed)
+
+
+def parse_int_arg(args, name: str, default: int | None, minimum: int) -> int | None:
+    """
+    Read an integer request argument (query string or JSON body), `default`
+    when it is absent or empty.
+
+    Raises:
+        ValueError: If it is not an integer or is below `minimum`
+    """
+    value = args.get(name)
+    if value is None or str(value).strip() == '':
+        return default
+    try:
+        number = int(str(value).strip())
+    except ValueError:
+        number = None
+    if number is None or number < minimum:
+        raise ValueError(f'{name} must be an integer >= {minimum}')
+    return number
+
+
+def parse_facet_filters(args) -> Tuple[Tuple[str, str], ...]:
+    """
+    Pick facet filters out of request arguments. They are prefixed
+    (facet.level=high, facet.category=process_creation) so they do not
+    clash with the category/subcategory path filters.
+    """
+    return tuple(sorted((facet, str(args[f'facet.{facet}']).strip()) for facet in FACET_FIELDS
+                        if str(args.get(f'facet.{facet}', '')).strip()))
+
+
+def paginate_groups(grouped_rules, start: int, stop: int):
+    """
+    Slice grouped (position, rule) pairs in display order (groups, then rules
+    within a group) and renumber positions against the page.
+
+    Returns:
+        (page rules, page groups)
+    """
+    page = []
+    groups = {}
+    seen = 0
+    for group_title, rules_in_group in grouped_rules.items():
+        if seen >= stop:
+            break
+        kept = rules_in_group[max(start - seen, 0):max(stop - seen, 0)]
+        seen += len(rules_in_group)
+        if kept:
+            groups[group_title] = [(len(page) + offset, rule) for offset, (_, rule) in enumerate(kept)]
+            page.extend(rule for _, rule in kept)
+    return page, groups
+
+
+def encode_cursor(offset: int, versions: Tuple[int, int]) -> str:
+    """Opaque cursor for the next page, bound to the ruleset/deployment versions."""
+    raw = f"{offset}:{versions[0]}:{versions[1]}".encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[int, Tuple[int, int]]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        offset, ruleset_version, deployment_version = (
+            int(part) for part in base64.urlsafe_b64decode(padded).decode('ascii').split(':'))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('Invalid cursor')
+    if offset < 0:
+        raise ValueError('Invalid cursor')
+    return offset, (ruleset_version, deployment_version)
+
+
+def rule_summary(rule: Dict[str, Any]) -> Dict[str, Any]:
+    """Lightweight view of a rule without its raw YAML content."""
+    logsource = rule.get('logsource') or {}
+    return {
+        'title': rule.get('title', ''),
+        'file_path': rule.get('file_path', ''),
+        'id': rule.get('id', ''),
+        'level': rule.get('level', ''),
+        'status': rule.get('status', ''),
+        'author': rule.get('author', ''),
+        'modified': rule.get('modified', '') or rule.get('date', ''),
+        'tags': rule.get('tags', []),
+        'logsource': {key: logsource.get(key) for key in ('product', 'category', 'service')
+                      if logsource.get(key)},
+    }
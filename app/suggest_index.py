@@ -0,0 +1,143 @@
+"""
+Autocomplete index for the search box.
+Suggestion keys (titles and the words inside them, ATT&CK tags, authors,
+logsource values, detection field names) live in one sorted array, so the
+candidates for a prefix are a bisect range; each suggestion carries the
+number of rules it occurs in and the best ones are picked by that count.
+"""
+import bisect
+import heapq
+from typing import Any, Dict, Iterable, List, Tuple
+
+from .rule_record import rule_metadata
+
+# Suggestion kinds and the search field used to build their query text
+SUGGESTION_FIELDS = {
+    'title': 'title',
+    'tag': 'tags',
+    'author': 'author',
+    'product': 'product',
+    'category': 'category',
+    'service': 'service',
+    'detection_field': None,
+    'field': None,
+}
+
+
+def _quote(value: str) -> str:
+    return f'"{value}"' if any(char.isspace() for char in value) else value
+
+
+def suggestion_query(kind: str, value: str) -> str:
+    """Text to put in the search box for a suggestion."""
+    if kind == 'field':
+        return f'{value}:'
+    field = SUGGESTION_FIELDS.get(kind)
+    return f'{field}:{_quote(value)}' if field else _quote(value)
+
+
+def _rule_suggestions(rule: Dict[str, Any]) -> Iterable[Tuple[str, str]]:
+    """Distinct (kind, value) suggestions of a rule."""
+    values = set()
+    title = str(rule.get('title') or '').strip()
+    if title:
+        values.add(('title', title))
+    for tag in rule.get('tags', []) or []:
+        if str(tag).strip():
+            values.add(('tag', str(tag).strip()))
+    author = rule_metadata(rule, 'author')
+    if author:
+        values.add(('author', author))
+    logsource = rule.get('logsource')
+    if isinstance(logsource, dict):
+        for key in ('product', 'category', 'service'):
+            if logsource.get(key):
+                values.add((key, str(logsource[key]).strip()))
+    for name in rule.get('detection_fields', []) or []:
+        values.add(('detection_field', name))
+    return values
+
+
+def _search_keys(kind: str, value: str) -> List[str]:
+    """Lowercased strings a typed prefix is matched against."""
+    key = value.lower()
+    if kind != 'title':
+        return [key]
+    # Titles also match from the start of each word
+    keys = [key]
+    position = key.find(' ')
+    while position != -1:
+        keys.append(key[position + 1:])
+        position = key.find(' ', position + 1)
+    return [key for key in dict.fromkeys(keys) if key]
+
+
+class SuggestIndex:
+    """
+    Sorted (search key, kind, value) array plus per-suggestion rule counts.
+
+    Kept in sync with the rule set by the owning RuleIndex through add/remove.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._keys: List[Tuple[str, str, str]] = []
+        # Keys added since the last lookup; merged and sorted lazily so a
+        # full load does not pay for one sorted insert per key
+        self._pending: List[Tuple[str, str, str]] = []
+        # (kind, lowercased value) -> [display value, rule count]
+        self._entries: Dict[Tuple[str, str], List[Any]] = {}
+
+    def add(self, rule: Dict[str, Any]):
+        for kind, value in _rule_suggestions(rule):
+            entry = self._entries.get((kind, value.lower()))
+            if entry is not None:
+                entry[1] += 1
+                continue
+            self._entries[(kind, value.lower())] = [value, 1]
+            self._pending.extend((key, kind, value.lower()) for key in _search_keys(kind, value))
+
+    def _sorted_keys(self) -> List[Tuple[str, str, str]]:
+        if self._pending:
+            self._keys.extend(self._pending)
+            self._keys.sort()
+            self._pending = []
+        return self._keys
+
+    def remove(self, rule: Dict[str, Any]):
+        for kind, value in _rule_suggestions(rule):
+            entry = self._entries.get((kind, value.lower()))
+            if entry is None:
+                continue
+            entry[1] -= 1
+            if entry[1] > 0:
+                continue
+            del self._entries[(kind, value.lower())]
+            keys = self._sorted_keys()
+            for key in _search_keys(kind, value):
+                item = (key, kind, value.lower())
+                position = bisect.bisect_left(keys, item)
+                if position < len(keys) and keys[position] == item:
+                    del keys[position]
+
+    def suggest(self, prefix: str, limit: int = 10, kinds: Iterable[str] | None = None) -> List[Dict[str, Any]]:
+        """
+        Top `limit` suggestions starting with `prefix` (case-insensitive),
+        most frequent first, then shortest, then alphabetical.
+        """
+        prefix = prefix.lower()
+        kinds = set(kinds) if kinds else None
+        keys = self._sorted_keys()
+        start = bisect.bisect_left(keys, (prefix,))
+        end = bisect.bisect_left(keys, (prefix + '\uffff',))
+
+        matches = {}
+        for _, kind, value in keys[start:end]:
+            if kinds is None or kind in kinds:
+                matches[(kind, value)] = self._entries[(kind, value)]
+        best = heapq.nsmallest(limit, matches.items(),
+                               key=lambda item: (-item[1][1], len(item[1][0]), item[1][0].lower(), item[0][0]))
+        return [{'text': display, 'kind': kind, 'count': count, 'query': suggestion_query(kind, display)}
+                for (kind, _), (display, count) in best]
@@ -0,0 +1,154 @@
+"""
+Hierarchical index over rule tags.
+Tags are normalized (attack.defense_evasion -> attack.defense-evasion) and
+kept in one sorted (tag, rule id) array. A tag is a dotted path, so a parent
+such as attack.t1059 or cve finds all of its descendants (attack.t1059.001,
+cve.2021-44228, ...) as a bisect range. Rule counts per tactic, technique
+and tag are maintained as rules are added and removed.
+"""
+import bisect
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+# Query fields answered from the tag index
+TAG_FIELDS = ('tag', 'technique', 'tactic')
+
+# Enterprise ATT&CK tactics in kill chain order
+ATTACK_TACTICS = (
+    'reconnaissance', 'resource-development', 'initial-access', 'execution', 'persistence',
+    'privilege-escalation', 'defense-evasion', 'credential-access', 'discovery',
+    'lateral-movement', 'collection', 'command-and-control', 'exfiltration', 'impact',
+)
+
+# Namespaces whose tags are counted one by one for the UI
+COUNTED_NAMESPACES = ('cve', 'detection', 'car')
+
+_TECHNIQUE_RE = re.compile(r't\d{4}(?:\.\d{3})?')
+
+
+def normalize_tag(tag: Any) -> str:
+    """Lowercase a tag and spell ATT&CK tactic names with dashes."""
+    tag = str(tag).strip().lower()
+    if tag.startswith('attack.') and not _TECHNIQUE_RE.fullmatch(tag[7:]):
+        tag = 'attack.' + tag[7:].replace('_', '-')
+    return tag
+
+
+def query_tag(field: str, value: str) -> str:
+    """Normalized tag a tag/technique/tactic query asks for."""
+    value = value.strip().lower()
+    if field == 'tag':
+        return normalize_tag(value)
+    value = value[7:] if value.startswith('attack.') else value
+    if field == 'tactic':
+        value = value.replace(' ', '-')
+    return normalize_tag('attack.' + value)
+
+
+def _rule_tags(rule: Dict[str, Any]) -> Set[str]:
+    return {tag for tag in (normalize_tag(tag) for tag in rule.get('tags', []) or []) if tag}
+
+
+def _count_keys(tags: Iterable[str]) -> Set[Tuple[str, str]]:
+    """(kind, key) counters a rule with these tags contributes to, each once."""
+    keys = set()
+    for tag in tags:
+        namespace, _, rest = tag.partition('.')
+        if namespace == 'attack':
+            if _TECHNIQUE_RE.fullmatch(rest):
+                keys.add(('technique', rest.split('.', 1)[0]))
+                if '.' in rest:
+                    keys.add(('subtechnique', rest))
+            elif rest in ATTACK_TACTICS:
+                keys.add(('tactic', rest))
+        elif namespace in COUNTED_NAMESPACES and rest:
+            keys.add((namespace, rest))
+    return keys
+
+
+def _counts_view(counter: Counter) -> Dict[str, Any]:
+    """Counters as the JSON shape served to the UI."""
+    techniques = {}
+    for (kind, key), count in sorted(counter.items()):
+        if kind == 'technique' and count:
+            techniques[key] = {'count': count, 'subtechniques': {}}
+    for (kind, key), count in sorted(counter.items()):
+        if kind == 'subtechnique' and count:
+            parent = techniques.setdefault(key.split('.', 1)[0], {'count': 0, 'subtechniques': {}})
+            parent['subtechniques'][key] = count
+    view = {
+        'tactics': {tactic: counter[('tactic', tactic)] for tactic in ATTACK_TACTICS
+                    if counter[('tactic', tactic)]},
+        'techniques': techniques,
+    }
+    for namespace in COUNTED_NAMESPACES:
+        view[namespace] = {key: count for (kind, key), count in sorted(counter.items())
+                           if kind == namespace and count}
+    return view
+
+
+class TagIndex:
+    """
+    Sorted (normalized tag, rule id) array plus per tactic/technique counts.
+
+    Rule ids are assigned by the owning RuleIndex; this class only keeps its
+    structures in sync through add/remove.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._keys: List[Tuple[str, int]] = []
+        # Entries added since the last lookup; merged and sorted lazily so a
+        # full load does not pay for one sorted insert per tag
+        self._pending: List[Tuple[str, int]] = []
+        self._counts: Counter = Counter()
+
+    def add(self, rule_id: int, rule: Dict[str, Any]):
+        tags = _rule_tags(rule)
+        self._pending.extend((tag, rule_id) for tag in tags)
+        self._counts.update(_count_keys(tags))
+
+    def _sorted_keys(self) -> List[Tuple[str, int]]:
+        if self._pending:
+            self._keys.extend(self._pending)
+            self._keys.sort()
+            self._pending = []
+        return self._keys
+
+    def remove(self, rule_id: int, rule: Dict[str, Any]):
+        tags = _rule_tags(rule)
+        keys = self._sorted_keys()
+        for tag in tags:
+            position = bisect.bisect_left(keys, (tag, rule_id))
+            if position < len(keys) and keys[position] == (tag, rule_id):
+                del keys[position]
+        self._counts.subtract(_count_keys(tags))
+
+    def ids(self, tag: str) -> List[int]:
+        """
+        Ids of the rules tagged `tag` or any tag below it
+        (attack.t1059 -> attack.t1059, attack.t1059.001, ...). May repeat ids.
+        """
+        keys = self._sorted_keys()
+        ids = []
+        # The tag itself, then its dotted descendants
+        for low, high in ((tag, tag + '\x00'), (tag + '.', tag + '.\uffff')):
+            start = bisect.bisect_left(keys, (low,))
+            end = bisect.bisect_left(keys, (high,))
+            ids.extend(rule_id for _, rule_id in keys[start:end])
+        return ids
+
+    def counts(self) -> Dict[str, Any]:
+        """Rules per tactic, technique (with sub-techniques) and cve/detection/car tag."""
+        return _counts_view(self._counts)
+
+    @staticmethod
+    def counts_for(rules: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Same as counts() for an arbitrary set of rules (e.g. search results)."""
+        counter = Counter()
+        for rule in rules:
+            counter.update(_count_keys(_rule_tags(rule)))
+        return _counts_view(counter)
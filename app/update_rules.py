@@ -110,13 +110,8 @@ def update_sigma_database(rules_dir):
         
         logger.info(f"Total copy time: {time.time() - step_start:.2f}s")
         
-        # Clear cache after update
-        try:
-            from .rule_cache import clear_cache
-            clear_cache()
-            logger.info("Cache cleared after update")
-        except Exception as e:
-            logger.warning(f"Failed to clear cache: {e}")
+        # The rule cache is kept: the reload compares each file with its cached
+        # entry and only parses the rules this update actually changed
         
         total_time = time.time() - total_start
         logger.info(f"[DONE] Sigma rules update completed in {total_time:.2f}s")
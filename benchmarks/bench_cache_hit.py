@@ -0,0 +1,143 @@
+"""
+Cache-hit startup benchmark for rule loading.
+
+Builds the rule cache for a rules directory (a SigmaHQ checkout with
+--rules-dir, otherwise a generated synthetic corpus), then times a cache hit
+with the previous change detection (os.walk + os.stat of every file, MD5
+over the joined strings, unpickling the whole rule list) and with
+app.rule_cache.load_rules_incremental (single os.scandir pass, unchanged
+directories skipped by mtime, rules mapped from the columnar snapshot).
+Exits with status 1 when the new cache hit is slower than --min-speedup
+times the old one.
+
+With --drop-caches the page cache is dropped before every run (Linux, as
+root), so each run starts from a cold page cache; otherwise runs are warm.
+
+Usage:
+    python benchmarks/bench_cache_hit.py [--rules-dir PATH] [--count 3000] [--runs 5] [--drop-caches]
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_cold_start import make_corpus
+
+import app.rule_cache as rule_cache
+from app.parallel_loader import load_rules_parallel
+
+
+def legacy_directory_hash(rules_dir):
+    """get_directory_hash as it was: a full os.walk with one os.stat per file."""
+    hash_data = []
+    for root, dirs, files in os.walk(rules_dir):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for file in files:
+            if file.endswith(('.yml', '.yaml')):
+                file_path = os.path.join(root, file)
+                try:
+                    stat = os.stat(file_path)
+                    hash_data.append(f"{file_path}:{stat.st_size}:{stat.st_mtime}")
+                except OSError:
+                    continue
+    return hashlib.md5(('|'.join(sorted(hash_data))).encode()).hexdigest()
+
+
+def legacy_cache_hit(rules_dir, cache_file, stored_hash):
+    if legacy_directory_hash(rules_dir) != stored_hash:
+        raise RuntimeError('legacy cache unexpectedly invalid')
+    with open(cache_file, 'rb') as f:
+        return pickle.load(f)
+
+
+def drop_page_cache():
+    try:
+        os.sync()
+        with open('/proc/sys/vm/drop_caches', 'w') as f:
+            f.write('3\n')
+        return True
+    except OSError:
+        return False
+
+
+def best_of(runs, drop_caches, function, *args):
+    timings = []
+    result = None
+    for _ in range(runs):
+        if drop_caches:
+            drop_page_cache()
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rules-dir', help='Rules directory to load (default: generated corpus)')
+    parser.add_argument('--count', type=int, default=3000, help='Rules in the generated corpus')
+    parser.add_argument('--runs', type=int, default=5, help='Timed runs per loader (best is reported)')
+    parser.add_argument('--drop-caches', action='store_true', help='Drop the page cache before every run')
+    parser.add_argument('--min-speedup', type=float, default=1.0,
+                        help='Required speedup of the new cache hit over the old one')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='sigma-bench-')
+    rules_dir = args.rules_dir
+    if not rules_dir:
+        rules_dir = os.path.join(work_dir, 'rules')
+        make_corpus(rules_dir, args.count)
+        # Age the corpus so directory listings are old enough to be cached
+        past = time.time() - 3600
+        for root, _, files in os.walk(rules_dir):
+            for name in files:
+                os.utime(os.path.join(root, name), (past, past))
+            os.utime(root, (past, past))
+    rules_dir = os.path.abspath(rules_dir)
+
+    rule_cache.CACHE_DIR = os.path.join(work_dir, 'cache')
+    rule_cache.CACHE_FILE = os.path.join(rule_cache.CACHE_DIR, 'rules_cache.pkl')
+    rule_cache.CACHE_HASH_FILE = os.path.join(rule_cache.CACHE_DIR, 'rules_hash.txt')
+    try:
+        if args.drop_caches and not drop_page_cache():
+            print('cannot drop the page cache (needs root on Linux); timing warm runs')
+            args.drop_caches = False
+
+        # Old cache: whole rule list plus one tree hash
+        rules = load_rules_parallel(rules_dir)
+        legacy_file = os.path.join(work_dir, 'legacy_cache.pkl')
+        with open(legacy_file, 'wb') as f:
+            pickle.dump(rules, f, protocol=pickle.HIGHEST_PROTOCOL)
+        stored_hash = legacy_directory_hash(rules_dir)
+
+        # New cache: manifest and directory listings
+        rule_cache.load_rules_incremental(rules_dir)
+
+        print(f'{len(rules)} rules, {args.runs} runs, {"cold" if args.drop_caches else "warm"} page cache')
+        legacy_time, legacy_rules = best_of(args.runs, args.drop_caches, legacy_cache_hit,
+                                            rules_dir, legacy_file, stored_hash)
+        new_time, new_rules = best_of(args.runs, args.drop_caches, rule_cache.load_rules_incremental, rules_dir)
+        print(f'legacy (os.walk + stat + tree MD5): {legacy_time * 1000:8.1f} ms  ({len(legacy_rules)} rules)')
+        print(f'manifest + mmap snapshot:           {new_time * 1000:8.1f} ms  ({len(new_rules)} rules)')
+
+        speedup = legacy_time / new_time if new_time else float('inf')
+        print(f'speedup: {speedup:.2f}x (min {args.min_speedup})')
+        if len(new_rules) != len(legacy_rules):
+            print('FAIL: cache hits disagree on the number of rules')
+            return 1
+        if speedup < args.min_speedup:
+            print('FAIL: cache-hit startup got slower')
+            return 1
+        return 0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Cold-start benchmark for rule loading.
+
+Parses a rules directory (a SigmaHQ checkout with --rules-dir, otherwise a
+generated synthetic corpus) with the previous loader (4 threads,
+yaml.safe_load) and with app.parallel_loader (process pool, libyaml loader
+when available) and reports the speedup. Exits with status 1 when the new
+loader is slower than --min-speedup times the old one.
+
+For a cold page cache, drop caches between runs (Linux, as root):
+    sync && echo 3 > /proc/sys/vm/drop_caches
+
+Usage:
+    python benchmarks/bench_cold_start.py [--rules-dir PATH] [--count 3000] [--min-speedup 1.0]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.parallel_loader import YAML_LOADER, collect_rule_files, load_rules_parallel, plan_batches
+from app.rule_record import build_rule_record
+
+RULE_TEMPLATE = """title: Synthetic Rule {i}
+id: 00000000-0000-0000-0000-{i:012d}
+status: test
+description: Detects synthetic activity number {i} for loader benchmarking
+references:
+    - https://example.com/{i}
+author: Benchmark
+date: 2023-01-{day:02d}
+modified: 2024-06-{day:02d}
+tags:
+    - attack.execution
+    - attack.t{technique}
+logsource:
+    category: process_creation
+    product: windows
+detection:
+    selection:
+        Image|endswith:
+            - '\\\\tool{i}.exe'
+            - '\\\\helper{i}.exe'
+        CommandLine|contains|all:
+            - ' -enc '
+            - ' -nop '
+    filter:
+        User: SYSTEM
+    condition: selection and not filter
+falsepositives:
+    - Unknown
+level: medium
+"""
+
+
+def make_corpus(directory, count):
+    for i in range(count):
+        folder = os.path.join(directory, 'windows', f'category_{i % 20}')
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f'rule_{i}.yml'), 'w', encoding='utf-8') as f:
+            f.write(RULE_TEMPLATE.format(i=i, day=i % 28 + 1, technique=1000 + i % 500))
+
+
+def load_legacy(rules_dir):
+    """The loader as it was: 4 threads, pure-Python yaml.safe_load."""
+    def load(file_path):
+        if os.path.getsize(file_path) > 1024 * 1024:
+            return None
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            raw_content = f.read()
+        try:
+            data = yaml.safe_load(raw_content)
+        except yaml.YAMLError:
+            return None
+        if not data or not isinstance(data, dict) or not any(key in data for key in ['title', 'detection']):
+            return None
+        return build_rule_record(data, raw_content, os.path.relpath(file_path, rules_dir).replace(os.sep, '/'))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        return [rule for rule in executor.map(load, collect_rule_files([rules_dir])) if rule]
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rules-dir', help='Rules directory to load (default: generated corpus)')
+    parser.add_argument('--count', type=int, default=3000, help='Rules in the generated corpus')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--min-speedup', type=float, default=1.0,
+                        help='Required speedup of the new loader over the old one')
+    args = parser.parse_args()
+
+    temp_dir = None
+    rules_dir = args.rules_dir
+    if not rules_dir:
+        temp_dir = tempfile.mkdtemp(prefix='sigma-bench-')
+        rules_dir = temp_dir
+        make_corpus(rules_dir, args.count)
+    try:
+        file_count = len(collect_rule_files([rules_dir]))
+        workers, chunk_size = plan_batches(file_count, args.workers)
+        print(f'{file_count} rule files, {os.cpu_count()} CPUs -> {workers} workers x {chunk_size}-file batches, '
+              f'{YAML_LOADER.__name__}')
+
+        legacy_time, legacy_rules = timed(load_legacy, rules_dir)
+        new_time, new_rules = timed(load_rules_parallel, rules_dir, max_workers=args.workers)
+        print(f'legacy (4 threads, SafeLoader): {legacy_time:7.2f} s  ({len(legacy_rules)} rules)')
+        print(f'process pool ({YAML_LOADER.__name__}): {new_time:7.2f} s  ({len(new_rules)} rules)')
+
+        speedup = legacy_time / new_time if new_time else float('inf')
+        print(f'speedup: {speedup:.2f}x (min {args.min_speedup})')
+        if len(new_rules) != len(legacy_rules):
+            print('FAIL: loaders disagree on the number of rules')
+            return 1
+        if speedup < args.min_speedup:
+            print('FAIL: rule loading got slower')
+            return 1
+        return 0
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
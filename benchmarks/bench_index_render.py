@@ -0,0 +1,104 @@
+"""
+Render-time benchmark for the index page.
+
+Renders templates/index.html for growing synthetic result sets and checks
+that the time per rendered rule stays flat, i.e. rendering is linear in
+the number of rules. Exits with status 1 on a regression.
+
+Usage:
+    python benchmarks/bench_index_render.py [--sizes 1000,4000] [--max-ratio 2.0]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from app.routes.main import create_main_blueprint
+from app.rule_processor import group_and_sort_rules
+from app.search_service import rule_summary
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRODUCTS = ['windows', 'linux', 'macos', 'aws', 'azure', 'gcp', '']
+TACTICS = ['attack.execution', 'attack.persistence', 'attack.defense_evasion', 'attack.discovery']
+
+
+def make_rules(count):
+    rules = []
+    for i in range(count):
+        product = PRODUCTS[i % len(PRODUCTS)]
+        rules.append({
+            'title': f'Synthetic Rule {i}',
+            'description': f'Synthetic description {i}',
+            'tags': [TACTICS[i % len(TACTICS)], f'attack.t{1000 + i % 500}'],
+            'file_path': f'rules/{product or "other"}/category_{i % 20}/rule_{i}.yml',
+            'logsource': {'product': product, 'category': f'category_{i % 20}'},
+            'content': f'title: Synthetic Rule {i}\nlevel: medium\n',
+            'level': 'medium',
+        })
+    return rules
+
+
+def make_app():
+    app = Flask(__name__, template_folder=os.path.join(ROOT, 'templates'),
+                static_folder=os.path.join(ROOT, 'static'))
+    app.register_blueprint(create_main_blueprint([]))
+    # Queries are empty here, so highlighting is a no-op
+    app.jinja_env.filters['highlight'] = lambda text, query: text
+    return app
+
+
+def render_time(app, rules, repeat):
+    grouped = group_and_sort_rules(rules, positions=True)
+    template = app.jinja_env.get_template('index.html')
+    context = {
+        'results': rules,
+        'rule_summaries': [rule_summary(rule) for rule in rules],
+        'query': '',
+        'grouped_rules': grouped,
+        'selected_category': '',
+        'selected_subcategory': '',
+        'selected_deployment_status': '',
+        'selected_sort': '',
+        'total_results': len(rules),
+        'pagination': None,
+        'result_description': '',
+    }
+    best = float('inf')
+    with app.test_request_context('/'):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            template.render(**context)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,4000', help='Comma separated rule counts')
+    parser.add_argument('--repeat', type=int, default=3, help='Renders per size (best is kept)')
+    parser.add_argument('--max-ratio', type=float, default=2.0,
+                        help='Allowed growth of the per-rule render time between the smallest and largest size')
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+    app = make_app()
+    per_rule = {}
+    for size in sizes:
+        elapsed = render_time(app, make_rules(size), args.repeat)
+        per_rule[size] = elapsed / size
+        print(f'{size:>7} rules: {elapsed * 1000:8.1f} ms  ({per_rule[size] * 1e6:.1f} us/rule)')
+
+    ratio = per_rule[sizes[-1]] / per_rule[sizes[0]]
+    print(f'per-rule time ratio {sizes[-1]}/{sizes[0]}: {ratio:.2f} (max {args.max_ratio})')
+    if ratio > args.max_ratio:
+        print('FAIL: index page rendering is growing faster than linear')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
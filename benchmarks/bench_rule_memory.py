@@ -0,0 +1,148 @@
+"""
+Memory benchmark for loaded rule records.
+
+Loads a rules directory (a SigmaHQ checkout with --rules-dir, otherwise a
+generated synthetic corpus) and reports the bytes per rule retained after
+loading, measured with tracemalloc, for:
+  - legacy:   plain dict records with list fields, as the loaders built them
+  - compact:  app.rule_record.RuleRecord (slots, interned strings, shared tuples)
+  - snapshot: rules opened from the mmap snapshot, fields decoded (bodies stay
+              in the map)
+Each representation is measured in a fresh process so interning tables and
+caches from one do not flatter another. Bytes are reported for the records
+alone and for the loaded app state, records plus the RuleIndex built over
+them, which is most of a process's rule memory. Exits with status 1 when
+compact records are not smaller than legacy ones.
+
+Usage:
+    python benchmarks/bench_rule_memory.py [--rules-dir PATH] [--count 3000]
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_cold_start import make_corpus
+
+from app.lucene_converter import detection_field_names, detection_items
+from app.parallel_loader import collect_rule_files, parse_yaml
+from app.rule_record import _as_list, _as_text, build_rule_record
+from app.rule_snapshot import RuleSnapshot, write_snapshot
+from app.search_index import RuleIndex
+
+MODES = ('legacy', 'compact', 'snapshot')
+
+
+def legacy_record(data, raw_content, file_path):
+    """build_rule_record as it was: one dict per rule, list fields, no interning."""
+    return {
+        'title': data.get('title', ''),
+        'description': data.get('description', ''),
+        'tags': data.get('tags', []) if isinstance(data.get('tags'), list) else [],
+        'file_path': file_path,
+        'logsource': data.get('logsource', {}) if isinstance(data.get('logsource'), dict) else {},
+        'content': raw_content,
+        'author': _as_text(data.get('author')),
+        'date': _as_text(data.get('date')),
+        'modified': _as_text(data.get('modified')),
+        'id': _as_text(data.get('id')),
+        'status': _as_text(data.get('status')),
+        'level': _as_text(data.get('level')),
+        'references': _as_list(data.get('references')),
+        'falsepositives': _as_list(data.get('falsepositives')),
+        'detection_fields': detection_field_names(data.get('detection')),
+        'detection_items': detection_items(data.get('detection')),
+    }
+
+
+def load(rules_dir, build):
+    rules = []
+    for file_path in collect_rule_files([rules_dir]):
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            raw_content = f.read()
+        data = parse_yaml(raw_content)
+        if isinstance(data, dict):
+            rules.append(build(data, raw_content, os.path.relpath(file_path, rules_dir).replace(os.sep, '/')))
+    return rules
+
+
+def measure(mode, rules_dir, snapshot_path):
+    """Bytes retained per rule: records, records without bodies, records plus the search index."""
+    if mode == 'snapshot':
+        write_snapshot(snapshot_path, load(rules_dir, build_rule_record))
+    gc.collect()
+    tracemalloc.start()
+    if mode == 'snapshot':
+        rules = RuleSnapshot(snapshot_path).rules()
+        for rule in rules:
+            rule['title']
+        body_bytes = 0
+    else:
+        rules = load(rules_dir, legacy_record if mode == 'legacy' else build_rule_record)
+        body_bytes = sum(sys.getsizeof(rule['content']) for rule in rules)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    index = RuleIndex()
+    index.rebuild(rules)
+    gc.collect()
+    loaded, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'rules': len(rules), 'per_rule': retained / len(rules),
+            'per_rule_without_bodies': (retained - body_bytes) / len(rules),
+            'per_rule_with_index': loaded / len(rules)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rules-dir', help='Rules directory to load (default: generated corpus)')
+    parser.add_argument('--count', type=int, default=3000, help='Rules in the generated corpus')
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--snapshot', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(measure(args.mode, args.rules_dir, args.snapshot)))
+        return 0
+
+    work_dir = tempfile.mkdtemp(prefix='sigma-bench-')
+    rules_dir = args.rules_dir
+    if not rules_dir:
+        rules_dir = os.path.join(work_dir, 'rules')
+        make_corpus(rules_dir, args.count)
+    try:
+        results = {}
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--mode', mode, '--rules-dir', rules_dir,
+                 '--snapshot', os.path.join(work_dir, 'rules.snapshot')],
+                check=True, capture_output=True, text=True).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+
+        print(f"{results['legacy']['rules']} rules, bytes per rule (tracemalloc)")
+        for mode in MODES:
+            result = results[mode]
+            print(f"{mode:9s} {result['per_rule']:9.0f} total  {result['per_rule_without_bodies']:9.0f} without bodies"
+                  f"  {result['per_rule_with_index']:9.0f} with index")
+        legacy, compact = results['legacy'], results['compact']
+        saved = 1 - compact['per_rule_without_bodies'] / legacy['per_rule_without_bodies']
+        print(f'compact records save {saved:.0%} of the per-rule record overhead')
+        for mode in ('compact', 'snapshot'):
+            saved = 1 - results[mode]['per_rule_with_index'] / legacy['per_rule_with_index']
+            print(f'{mode} rules save {saved:.0%} of the loaded rules + index')
+        if compact['per_rule'] >= legacy['per_rule']:
+            print('FAIL: compact records are not smaller')
+            return 1
+        return 0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
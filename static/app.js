@@ -1,3 +1,25 @@
+// Rule bodies are not embedded in the page; fetch them on demand and keep
+// the ones already opened
+const ruleBodyCache = new Map();
+
+async function loadRuleBody(filePath) {
+    if (ruleBodyCache.has(filePath)) {
+        return ruleBodyCache.get(filePath);
+    }
+    const response = await fetch('/rule_yaml?' + new URLSearchParams({
+        file_path: filePath
+    }));
+    
+    if (!response.ok) {
+        const errorText = await response.text();
+        throw new Error(`HTTP ${response.status}: ${errorText}`);
+    }
+    
+    const content = await response.text();
+    ruleBodyCache.set(filePath, content);
+    return content;
+}
+
 // Modal functionality
 async function showModal(ruleIndex) {
     const modal = document.getElementById('sigma-modal');
@@ -25,17 +47,7 @@ async function showModal(ruleIndex) {
     modalText.innerHTML = '<div class="loading">Loading rule content...</div>';
     
     try {
-        const response = await fetch('/rule_yaml?' + new URLSearchParams({
-            file_path: rule.file_path
-        }));
-        
-        if (!response.ok) {
-            const errorText = await response.text();
-            throw new Error(`HTTP ${response.status}: ${errorText}`);
-        }
-        
-        const content = await response.text();
-        modalText.textContent = content;
+        modalText.textContent = await loadRuleBody(rule.file_path);
     } catch (error) {
         console.error('Error loading rule:', error);
         modalText.innerHTML = `
@@ -1676,10 +1688,7 @@ function backToSigmaView() {
         modalText.innerHTML = '<div class="loading">Loading rule content...</div>';
         
         // Load the original rule content
-        fetch('/rule_yaml?' + new URLSearchParams({
-            file_path: rule.file_path
-        }))
-        .then(response => response.text())
+        loadRuleBody(rule.file_path)
         .then(content => {
             modalText.textContent = content;
         })
@@ -2146,6 +2155,113 @@ document.addEventListener('keydown', function(e) {
     }
 });
 
+// Search-as-you-type: debounced live results under the main search box.
+// Requests carry a session id so the server can refine the previous answer
+// instead of searching every rule again, and stale requests are aborted.
+const LIVE_SEARCH_DELAY = 250;
+const LIVE_SEARCH_MIN_LENGTH = 2;
+const LIVE_SEARCH_LIMIT = 8;
+const liveSearchSession = Math.random().toString(36).slice(2) + Date.now().toString(36);
+let liveSearchTimer = null;
+let liveSearchController = null;
+
+document.addEventListener('DOMContentLoaded', function() {
+    const searchForm = document.getElementById('search-form');
+    const searchInput = searchForm ? searchForm.querySelector('.search-input') : null;
+    if (!searchInput) return;
+    
+    const panel = document.createElement('div');
+    panel.id = 'live-search-results';
+    panel.className = 'live-search-results';
+    panel.style.display = 'none';
+    searchForm.insertAdjacentElement('afterend', panel);
+    
+    searchInput.addEventListener('input', function() {
+        clearTimeout(liveSearchTimer);
+        liveSearchTimer = setTimeout(() => runLiveSearch(searchInput.value.trim(), panel), LIVE_SEARCH_DELAY);
+    });
+    searchInput.addEventListener('keydown', function(e) {
+        if (e.key === 'Escape') {
+            hideLiveSearch(panel);
+        }
+    });
+    searchForm.addEventListener('submit', function() {
+        clearTimeout(liveSearchTimer);
+        hideLiveSearch(panel);
+    });
+    document.addEventListener('click', function(e) {
+        if (!panel.contains(e.target) && e.target !== searchInput) {
+            hideLiveSearch(panel);
+        }
+    });
+});
+
+function hideLiveSearch(panel) {
+    if (liveSearchController) {
+        liveSearchController.abort();
+        liveSearchController = null;
+    }
+    panel.style.display = 'none';
+}
+
+async function runLiveSearch(query, panel) {
+    // Only the latest keystroke matters
+    if (liveSearchController) {
+        liveSearchController.abort();
+    }
+    if (query.length < LIVE_SEARCH_MIN_LENGTH) {
+        hideLiveSearch(panel);
+        return;
+    }
+    
+    const controller = new AbortController();
+    liveSearchController = controller;
+    const params = new URLSearchParams({
+        query: query,
+        limit: LIVE_SEARCH_LIMIT,
+        session: liveSearchSession,
+        category: document.getElementById('category-hidden')?.value || '',
+        subcategory: document.getElementById('subcategory-hidden')?.value || '',
+        deployment_status: document.getElementById('deployment-hidden')?.value || ''
+    });
+    
+    try {
+        const response = await fetch('/api/search?' + params, { signal: controller.signal });
+        const data = await response.json();
+        if (controller !== liveSearchController) return;
+        if (!data.success) {
+            hideLiveSearch(panel);
+            return;
+        }
+        renderLiveSearch(panel, data);
+    } catch (error) {
+        if (error.name !== 'AbortError') {
+            console.error('Live search failed:', error);
+        }
+    }
+}
+
+function renderLiveSearch(panel, data) {
+    const header = `<div class="live-search-header">${data.total} matching rule${data.total === 1 ? '' : 's'}` +
+        (data.total > data.results.length ? ' &middot; press Enter to see all' : '') + '</div>';
+    const items = data.results.map((rule, idx) => `
+        <div class="live-search-item" data-result-index="${idx}">
+            <div class="live-search-title">${escapeHtml(rule.title || rule.file_path.split('/').pop())}</div>
+            <div class="live-search-path">${escapeHtml(rule.file_path)}</div>
+        </div>`).join('');
+    panel.innerHTML = header + items;
+    panel.style.display = 'block';
+    
+    panel.querySelectorAll('.live-search-item').forEach(item => {
+        item.addEventListener('click', function() {
+            // The modal only needs the title and path; bodies load on demand
+            rules.push(data.results[parseInt(item.dataset.resultIndex)]);
+            hideLiveSearch(panel);
+            showModal(rules.length - 1);
+        });
+    });
+}
+
 // YAML Auto-formatting for Sigma rules
 document.addEventListener('DOMContentLoaded', function() {
     const textarea = document.getElementById('rule-content');